@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import time
+
+from asyncua import Server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plc_farm import PLCFarm
+from tag_database import REGISTER_TAGS
+
+async def add_nodes_one_by_one(plc, server, idx, name):
+    # Address space as it was built before the tag database: one AddNodes and one Write per node
+    myobj = await server.get_objects_node().add_object(idx, name)
+    for key, value in list(plc.digital_inputs.items()) + list(plc.analog_inputs.items()) + \
+            list(plc.digital_outputs.items()):
+        myvar = await myobj.add_variable(idx, key, value)
+        await myvar.set_writable()
+    for key, values in plc.alarms.items():
+        myalarm = await myobj.add_object(idx, key)
+        for newkey, value in values.items():
+            myvar = await myalarm.add_variable(idx, newkey, value)
+            await myvar.set_writable()
+
+
+async def server_for():
+    server = Server()
+    await server.init()
+    return server, await server.register_namespace("http://PLC-simulator/opc")
+
+
+async def run(count):
+    server, idx = await server_for()
+    farm = PLCFarm(count)
+    start = time.perf_counter()
+    for i, plc in enumerate(farm.plcs):
+        await add_nodes_one_by_one(plc, server, idx, f"myPLC_{i}")
+    one_by_one = time.perf_counter() - start
+
+    server, idx = await server_for()
+    farm = PLCFarm(count)
+    farm.server = server
+    # Includes the AlarmCondition set-up of the farm, the one-by-one path has none
+    start = time.perf_counter()
+    await farm.add_plc_objects(idx)
+    bulk = time.perf_counter() - start
+
+    tags = count * len(REGISTER_TAGS)
+    print(f"{count:>5} PLCs {tags:>7} tags   one by one {one_by_one:7.2f} s   bulk {bulk:7.2f} s"
+          f"   {one_by_one / bulk:5.1f}x")
+
+
+async def main():
+    for count in (1, 10, 100, 300):
+        await run(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
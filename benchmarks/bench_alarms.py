@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from alarm_table import AlarmTable
+from registers import DIGITAL_INPUTS, RegisterBank
+
+REPEAT = 20
+ALARM_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "alarms.json")
+
+
+def dict_alarms(digital_inputs, analog_inputs, alarms):
+    # Per-tank alarm block as it was written before the alarm table
+    alarms["A0"]["Active"] = digital_inputs["DI8"]
+    alarms["A1"]["Active"] = digital_inputs["DI5"]
+    alarms["A2"]["Active"] = analog_inputs["AI0"] > 80
+    alarms["A3"]["Active"] = analog_inputs["AI0"] < 10
+    alarms["A4"]["Active"] = digital_inputs["DI9"]
+    alarms["A5"]["Active"] = digital_inputs["DI3"]
+    if digital_inputs["DI4"]:
+        for values in alarms.values():
+            values["UnAck"] = False
+            values["Status"] = False
+    for values in alarms.values():
+        if values["Active"]:
+            values["UnAck"] = True
+            values["Status"] = True
+    return any(alarm["Active"] for alarm in alarms.values())
+
+
+def run(tanks):
+    rng = np.random.default_rng(0)
+    bank = RegisterBank(tanks)
+    bank.digital_inputs[:] = rng.random(bank.digital_inputs.shape) < 0.1
+    bank.analog_inputs[:] = rng.uniform(0, 100, bank.analog_inputs.shape)
+
+    tanks_dicts = [({name: bool(value) for name, value in zip(DIGITAL_INPUTS, bank.digital_inputs[i])},
+                    {"AI0": float(bank.analog_inputs[i, 0])},
+                    {f"A{n}": {"Active": False, "UnAck": False, "Status": False} for n in range(6)})
+                   for i in range(tanks)]
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for digital_inputs, analog_inputs, alarms in tanks_dicts:
+            dict_alarms(digital_inputs, analog_inputs, alarms)
+    loop = (time.perf_counter() - start) / REPEAT
+
+    table = AlarmTable()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        table.scan(bank.digital_inputs, bank.analog_inputs, bank.alarms)
+    vectorized = (time.perf_counter() - start) / REPEAT
+
+    # Same rules with deadbands and on/off delays from the shipped alarm file
+    table = AlarmTable.from_file(ALARM_FILE)
+    start = time.perf_counter()
+    for scan in range(REPEAT):
+        table.scan(bank.digital_inputs, bank.analog_inputs, bank.alarms, scan * 0.2)
+    conditioned = (time.perf_counter() - start) / REPEAT
+
+    print(f"{tanks:>7} tanks   dict loop {loop * 1e6:10.1f} us/scan   vectorized {vectorized * 1e6:8.1f} us/scan"
+          f"   with deadband/delays {conditioned * 1e6:8.1f} us/scan")
+
+
+if __name__ == "__main__":
+    for tanks in (1, 100, 1000, 10000):
+        run(tanks)
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from asyncua import Client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plc_simulator import PLCSimulator
+
+ENDPOINT = "opc.tcp://localhost:48031/PLC-simulator/opc"
+TRIALS = 20
+
+
+async def wait_value(node, expected):
+    while await node.read_value() != expected:
+        pass
+
+
+async def latency(client_node, value, output_node, expected):
+    start = time.perf_counter()
+    await client_node.write_value(value)
+    await wait_value(output_node, expected)
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(event_driven):
+    plc = PLCSimulator(endpoint=ENDPOINT, event_driven=event_driven)
+    # AI0 starts at 0 which raises A3 and holds the sequence; keep it quiet here
+    plc.alarm_table.set_limit("A3", -1)
+    await plc.set_opcua_server()
+    scan_task = asyncio.create_task(plc.execute_control_logic())
+
+    client = Client(ENDPOINT)
+    await client.connect()
+    try:
+        idx = await client.get_namespace_index("http://PLC-simulator/opc")
+        myobj = await client.nodes.root.get_child(["0:Objects", f"{idx}:myPLC"])
+        start_button = await myobj.get_child(f"{idx}:DI0")
+        emergency_button = await myobj.get_child(f"{idx}:DI3")
+        in_valve = await myobj.get_child(f"{idx}:DQ0")
+
+        start_times, emergency_times = [], []
+        for _ in range(TRIALS):
+            # START: INIT -> STARTING opens the In Valve
+            start_times.append(await latency(start_button, True, in_valve, True))
+            await start_button.write_value(False)
+            # EMERGENCY: back to INIT, In Valve closed
+            emergency_times.append(await latency(emergency_button, True, in_valve, False))
+            await emergency_button.write_value(False)
+    finally:
+        await client.disconnect()
+        scan_task.cancel()
+        try:
+            await scan_task
+        except asyncio.CancelledError:
+            pass
+
+    mode = "event-driven" if event_driven else "polled"
+    for name, times in (("START", start_times), ("EMERGENCY", emergency_times)):
+        print(f"{mode:<13} {name:<10} p50 {statistics.median(times):7.2f} ms   max {max(times):7.2f} ms")
+
+
+async def main():
+    await run(event_driven=False)
+    await run(event_driven=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
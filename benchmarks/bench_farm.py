@@ -0,0 +1,50 @@
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+from asyncua import Server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plc_farm import PLCFarm
+
+SCANS = 10
+
+
+async def run(count):
+    # The scan runs through the server's internal session, no endpoint needed
+    server = Server()
+    await server.init()
+    idx = await server.register_namespace("http://PLC-simulator/opc")
+
+    # Memory of the instances only, not of the server's standard address space
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    farm = PLCFarm(count)
+    farm.server = server
+    await farm.add_plc_objects(idx)
+    per_instance = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+
+    # First scan builds the cached read requests
+    await farm.scan()
+    start = time.perf_counter()
+    for _ in range(SCANS):
+        await farm.scan()
+    scan_time = (time.perf_counter() - start) / SCANS
+
+    # Tanks one core can scan within one cycle_time
+    per_core = int(count * farm.cycle_time / scan_time)
+    print(f"{count:>5} PLCs   scan {scan_time * 1000:8.2f} ms   {scan_time / count * 1e6:7.1f} us/PLC"
+          f"   ~{per_core:>6} PLCs/core @ {farm.cycle_time} s   {per_instance / 1024:7.1f} KiB/PLC")
+
+
+async def main():
+    for count in (1, 10, 100, 500):
+        await run(count)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from asyncua import Server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from historian import ROW_TAGS, Historian
+from plc_farm import PLCFarm
+from sim_clock import VirtualClock
+
+SCANS = 100
+TAGS = 10000
+
+
+async def scan_time(farm):
+    start = time.perf_counter()
+    await farm.scan()
+    await farm.clock.sleep(farm.cycle_time)
+    return time.perf_counter() - start
+
+
+async def main():
+    # ~10k tags at 5 Hz: one farm with the plant so levels and temperatures keep changing
+    count = TAGS // len(ROW_TAGS) + 1
+    server = Server()
+    await server.init()
+    idx = await server.register_namespace("http://PLC-simulator/opc")
+
+    with tempfile.TemporaryDirectory() as path:
+        historian = Historian(path)
+        farm = PLCFarm(count, clock=VirtualClock(), plant=True, historian=historian)
+        farm.server = server
+        await farm.add_plc_objects(idx)
+        historian.attach(farm.bank, [f"myPLC_{i}" for i in range(count)])
+        # Tanks filling (STARTING) so the plant moves DI5/DI6 and AI0
+        for plc in farm.plcs:
+            await plc.tags.write_values([("DI0", True)])
+        await farm.scan()
+
+        # Alternate scans with and without recording so the drift of the farm state cancels out
+        with_history, without_history = 0.0, 0.0
+        for _ in range(SCANS):
+            farm.historian = None
+            without_history += await scan_time(farm)
+            farm.historian = historian
+            with_history += await scan_time(farm)
+        with_history, without_history = with_history / SCANS, without_history / SCANS
+
+        record_start = time.perf_counter()
+        for _ in range(SCANS):
+            historian.record(farm.clock.now())
+        record = (time.perf_counter() - record_start) / SCANS
+        await historian.close()
+
+        query_start = time.perf_counter()
+        times, _ = historian.query("myPLC_0.AI0")
+        query = time.perf_counter() - query_start
+
+        print(f"{len(historian.tags)} tags, {historian.recorded} samples recorded,"
+              f" {historian.skipped} unchanged skipped, {len(historian.segments)} segments")
+        print(f"scan without historian {without_history * 1000:8.2f} ms")
+        print(f"scan with historian    {with_history * 1000:8.2f} ms"
+              f"   overhead {(with_history / without_history - 1) * 100:5.1f} %")
+        print(f"record() alone         {record * 1e6:8.1f} us/scan"
+              f"   {record / without_history * 100:5.2f} % of the scan")
+        print(f"query myPLC_0.AI0      {query * 1000:8.2f} ms for {len(times)} samples")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from asyncua import ua
+from asyncua.server.history import HistoryDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from history_storage import BoundedHistory, SQLiteHistory
+
+TAGS = 300
+HOURS = 6
+CHANGE_PERIOD = 10  # seconds between two changes of a tag
+
+
+async def fill(storage, node_ids, now):
+    await storage.init()
+    for node_id in node_ids:
+        await storage.new_historized_node(node_id, timedelta(hours=24), 0)
+    samples = HOURS * 3600 // CHANGE_PERIOD
+    for sample in range(samples):
+        timestamp = now - timedelta(seconds=(samples - sample) * CHANGE_PERIOD)
+        for node_id in node_ids:
+            await storage.save_node_value(node_id, ua.DataValue(ua.Variant(float(sample)), SourceTimestamp=timestamp,
+                                                                ServerTimestamp=timestamp))
+
+
+async def run(name, storage):
+    node_ids = [ua.NodeId(f"Tag{i}", 2) for i in range(TAGS)]
+    now = datetime.utcnow()
+    await fill(storage, node_ids, now)
+
+    # One-hour trend window in the middle of the history, every tag
+    start = now - timedelta(hours=HOURS / 2)
+    end = start + timedelta(hours=1)
+    begin = time.perf_counter()
+    values = 0
+    for node_id in node_ids:
+        results, _ = await storage.read_node_history(node_id, start, end, 0)
+        values += len(results)
+    elapsed = time.perf_counter() - begin
+    await storage.stop()
+    print(f"{name:<16} 1 h window x {TAGS} tags: {elapsed * 1000:8.1f} ms   {values} values")
+
+
+async def main():
+    await run("HistoryDict", HistoryDict())
+    await run("BoundedHistory", BoundedHistory())
+    with tempfile.TemporaryDirectory() as path:
+        await run("SQLiteHistory", SQLiteHistory(os.path.join(path, "history.db")))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
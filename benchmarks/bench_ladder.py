@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from ladder import LadderProgram
+from plc_farm import PLCFarm
+
+SCANS = 200
+PROGRAM = os.path.join(ROOT, "config", "PLC_SY.xml")
+
+
+def random_inputs(farm, rng):
+    # Sparse button presses and floater changes, temperature around the heating setpoint and the alarm limits
+    bank = farm.bank
+    bank.digital_inputs[:] = rng.random(bank.digital_inputs.shape) < 0.15
+    bank.analog_inputs[:] = rng.uniform(0, 100, bank.analog_inputs.shape)
+    farm.alarm_table.scan(bank.digital_inputs, bank.analog_inputs, bank.alarms)
+
+
+def run(count):
+    rng = np.random.default_rng(0)
+    farm = PLCFarm(count)
+    program = LadderProgram.from_file(PROGRAM)
+    interpreted = compiled = 0.0
+    for _ in range(SCANS):
+        random_inputs(farm, rng)
+        start = time.perf_counter()
+        for plc in farm.plcs:
+            plc.evaluate_logic()
+        interpreted += time.perf_counter() - start
+        expected = farm.bank.digital_outputs.copy()
+
+        start = time.perf_counter()
+        program.scan(farm.bank.digital_inputs, farm.bank.analog_inputs, farm.bank.digital_outputs, farm.bank.alarms)
+        compiled += time.perf_counter() - start
+        # Both keep their own sequence state and must agree on every output of every scan
+        if not np.array_equal(expected, farm.bank.digital_outputs):
+            raise SystemExit(f"{count} PLCs: {program.name} and evaluate_logic() disagree")
+
+    print(f"{count:>6} PLCs   dict logic {interpreted / SCANS * 1e6:10.1f} us/scan"
+          f"   compiled {program.name} {compiled / SCANS * 1e6:8.1f} us/scan   outputs identical")
+
+
+if __name__ == "__main__":
+    for count in (1, 10, 100, 1000):
+        run(count)
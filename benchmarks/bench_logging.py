@@ -0,0 +1,67 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from log_pipeline import setup_logging
+
+RECORDS = 2000
+# Per write() of the simulated slow disk
+DISK_LATENCY = 0.002
+
+
+class SlowFile:
+    """ File object whose writes take DISK_LATENCY, as on a slow or busy disk """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        time.sleep(DISK_LATENCY)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def slow_open(open_stream):
+    def _open(self):
+        return SlowFile(open_stream(self))
+    return _open
+
+
+def measure(label):
+    # Latency of each log call as seen by the scan, one overrun warning per call
+    latencies = np.zeros(RECORDS)
+    for i in range(RECORDS):
+        start = time.perf_counter()
+        logging.warning(f"Farm scan overrun: {200 + i % 50:.1f} ms")
+        logging.info("Scan diagnostics", extra={"scan": i})
+        latencies[i] = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, (50, 99)) * 1e6
+    print(f"{label:<34} p50 {p50:9.1f} us   p99 {p99:9.1f} us   max {latencies.max() * 1e6:9.1f} us per scan")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        logging.FileHandler._open = slow_open(logging.FileHandler._open)
+        root = logging.getLogger()
+
+        logging.basicConfig(filename=os.path.join(directory, "sync.log"), level=logging.INFO,
+                            format='%(asctime)s [%(levelname)s] %(message)s')
+        measure("basicConfig file (slow disk)")
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+
+        # Repeats kept, only the queue is measured
+        listener = setup_logging(os.path.join(directory, "queued.log"), burst=RECORDS)
+        measure("queue + JSON batches (slow disk)")
+        listener.stop()
+        with open(os.path.join(directory, "queued.log")) as f:
+            print(f"{'':<34} {sum(1 for _ in f)} JSON lines written by the listener")
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plc_simulator import PLCSimulator
+from registers import Register
+from tag_database import TAG_DEFAULTS, TagDatabase
+
+ENDPOINT = "opc.tcp://localhost:48030/PLC-simulator/opc"
+SCANS = 20
+
+
+def scale_tags(plc, factor):
+    # Grow the I/O registers by `factor` keeping the original names in front,
+    # alarms stay at A0..A5 since they are bits of the alarm masks
+    def grow(register, prefix):
+        names = [f"{prefix}{i}" for i in range(len(register) * factor)]
+        values = np.zeros(len(names), dtype=register.values.dtype)
+        return Register(names, values)
+
+    plc.digital_inputs = grow(plc.digital_inputs, "DI")
+    plc.analog_inputs = grow(plc.analog_inputs, "AI")
+    plc.digital_outputs = grow(plc.digital_outputs, "DQ")
+    # Added tags typed like the originals
+    tags = dict(TAG_DEFAULTS)
+    for register, variant_type in ((plc.digital_inputs, "Boolean"), (plc.analog_inputs, "Double"),
+                                   (plc.digital_outputs, "Boolean")):
+        for name in register:
+            tags.setdefault(name, (variant_type, "rw", None, None))
+    plc.tag_database = TagDatabase(tags)
+
+
+async def browse_scan(plc):
+    # Scan I/O as it was done before the tag registry: one browse per tag
+    for name in list(plc.digital_inputs) + list(plc.analog_inputs):
+        myvar = await plc.myobj.get_child(f"{plc.idx}:{name}")
+        await myvar.read_value()
+    for name, value in plc.digital_outputs.items():
+        myvar = await plc.myobj.get_child(f"{plc.idx}:{name}")
+        await myvar.write_value(value)
+    for key, values in plc.alarms.items():
+        myalarm = await plc.myobj.get_child(f"{plc.idx}:{key}")
+        for newkey, value in values.items():
+            myvar = await myalarm.get_child(f"{plc.idx}:{newkey}")
+            await myvar.write_value(value)
+
+
+async def cached_scan(plc):
+    # Cached node handles, still one service call per tag
+    for name in plc.input_tags:
+        await plc.tags[name].read_value()
+    for name, value in plc.digital_outputs.items():
+        await plc.tags[name].write_value(value)
+    for key, values in plc.alarms.items():
+        for newkey, value in values.items():
+            await plc.tags[f"{key}.{newkey}"].write_value(value)
+
+
+async def batched_scan(plc):
+    await plc.update_inputs()
+    await plc.write_outputs()
+    await plc.set_alarms()
+
+
+async def time_scans(scan, plc):
+    start = time.perf_counter()
+    for _ in range(SCANS):
+        await scan(plc)
+    return (time.perf_counter() - start) / SCANS * 1000
+
+
+async def run(factor):
+    plc = PLCSimulator(endpoint=ENDPOINT)
+    scale_tags(plc, factor)
+    await plc.set_opcua_server()
+    try:
+        tags = len(plc.tags)
+        before = await time_scans(browse_scan, plc)
+        cached = await time_scans(cached_scan, plc)
+        batched = await time_scans(batched_scan, plc)
+    finally:
+        await plc.stop()
+    print(f"x{factor:<4} {tags:>6} tags   browse {before:9.2f}   cached {cached:9.2f}   batched {batched:9.2f} ms/scan")
+
+
+async def main():
+    for factor in (1, 10, 100):
+        await run(factor)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
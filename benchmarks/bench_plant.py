@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plant_model import TankPlant
+from registers import RegisterBank
+
+REPEAT = 20
+CYCLE_TIME = 0.2
+
+
+def run(tanks):
+    rng = np.random.default_rng(0)
+    bank = RegisterBank(tanks)
+    bank.digital_outputs[:] = rng.random(bank.digital_outputs.shape) < 0.5
+    plant = TankPlant(tanks)
+
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        plant.step(bank.digital_outputs, CYCLE_TIME)
+        plant.write_inputs(bank.digital_inputs, bank.analog_inputs)
+    elapsed = (time.perf_counter() - start) / REPEAT
+
+    print(f"{tanks:>7} tanks   {elapsed * 1e6:10.1f} us/scan   {elapsed / tanks * 1e9:8.1f} ns/tank")
+
+
+if __name__ == "__main__":
+    for tanks in (1, 100, 1000, 10000, 100000):
+        run(tanks)
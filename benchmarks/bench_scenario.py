@@ -0,0 +1,83 @@
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plc_launcher import endpoint_for, free_port
+from plc_simulator import PLCSimulator
+from scenario import INPUT_TAGS, read_events, write_events
+from sim_clock import VirtualClock
+
+EVENTS = 1_000_000
+REPLAYED = 50_000
+# Events per 200 ms scan
+PER_SCAN = 10
+
+
+def scripted(count):
+    # Button pulses and floater changes, a temperature ramp on AI0
+    rng = np.random.default_rng(0)
+    tags = rng.integers(0, len(INPUT_TAGS), count)
+    for i, tag in enumerate(tags.tolist()):
+        tag = INPUT_TAGS[tag]
+        value = 20.0 + (i % 600) / 10 if tag == "AI0" else float(i % 3 == 0)
+        yield i * 0.2 / PER_SCAN, tag, value
+
+
+def write_csv(path, events):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("time", "tag", "value"))
+        writer.writerows((f"{t:.3f}", tag, value) for t, tag, value in events)
+
+
+def stream(path):
+    # Events/s and peak Python memory (a second pass, tracing slows it down) of reading a whole scenario
+    start = time.perf_counter()
+    count = sum(1 for _ in read_events(path))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in read_events(path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, count / elapsed, peak
+
+
+async def replay(path):
+    plc = PLCSimulator(endpoint=endpoint_for(free_port()), clock=VirtualClock())
+    await plc.set_opcua_server()
+    try:
+        start = time.perf_counter()
+        player = await plc.replay(path, os.path.join(os.path.dirname(path), "record.csv"))
+        elapsed = time.perf_counter() - start
+    finally:
+        await plc.stop()
+    print(f"replay   {player.applied:>9} events {player.scans:>7} scans   {player.applied / elapsed:9.0f} events/s"
+          f"   {player.scans / elapsed:6.0f} scans/s")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "scenario.csv")
+        binary_path = os.path.join(directory, "scenario.scn")
+        write_csv(csv_path, scripted(EVENTS))
+        write_events(binary_path, scripted(EVENTS))
+        for name, path in (("CSV", csv_path), ("binary", binary_path)):
+            count, rate, peak = stream(path)
+            print(f"{name:<8} {count:>9} events {os.path.getsize(path) / 1e6:6.1f} MB   {rate:9.0f} events/s"
+                  f"   peak memory {peak / 1e6:5.1f} MB")
+        replayed = os.path.join(directory, "replayed.scn")
+        write_events(replayed, scripted(REPLAYED))
+        asyncio.run(replay(replayed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from ladder import LadderProgram
+from plant_model import TankPlant
+from plc_client import PLCClient
+from plc_launcher import endpoint_for, free_port
+from plc_simulator import PLCSimulator
+from sim_clock import VirtualClock
+
+ROUNDS = 1000
+PROGRAM = os.path.join(ROOT, "config", "PLC_SY.xml")
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1e6
+    return f"p50 {np.percentile(samples, 50):8.1f} us   p99 {np.percentile(samples, 99):8.1f} us"
+
+
+async def run(name, plc, client):
+    # Mid-sequence state: START pressed, a few scans into the prefill, one output forced
+    plc.digital_inputs["DI0"] = True
+    await plc.tags.write_values([("DI0", True)])
+    await plc.step(20)
+    await plc.force("DQ3", True)
+    blob = plc.snapshot()
+
+    snapshots, restores, calls = [], [], []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        plc.snapshot()
+        snapshots.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await plc.restore(blob)
+        restores.append(time.perf_counter() - start)
+    for _ in range(ROUNDS // 10):
+        start = time.perf_counter()
+        await client.restore(blob)
+        calls.append(time.perf_counter() - start)
+    assert plc.snapshot() == blob
+    print(f"{name} ({len(blob)} bytes)")
+    print(f"  snapshot()                {percentiles(snapshots)}")
+    print(f"  restore() incl. nodes     {percentiles(restores)}")
+    print(f"  Restore method (client)   {percentiles(calls)}")
+
+
+async def main():
+    for name, options in (("GRAFCET", {}),
+                          ("ladder + tank", {"ladder": LadderProgram.from_file(PROGRAM), "plant": TankPlant(1)})):
+        plc = PLCSimulator(endpoint=endpoint_for(free_port()), clock=VirtualClock(), **options)
+        await plc.set_opcua_server()
+        client = PLCClient(plc.endpoint, 10)
+        await client.init()
+        try:
+            await run(name, plc, client)
+        finally:
+            await client.disconnect()
+            await plc.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
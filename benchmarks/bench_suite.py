@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from asyncua import Server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from historian import ROW_TAGS
+from plc_client import PLCClient
+from plc_farm import PLCFarm
+from plc_launcher import endpoint_for, free_port
+from plc_simulator import PLCSimulator
+from sim_clock import VirtualClock
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+FARM_SIZES = (1, 10, 100, 300)
+# Every metric is measured REPEATS times, each long enough to average out timer noise: rates keep the best repeat,
+# as other load on the machine only ever slows a run down, latency percentiles the median one
+REPEATS = 7
+# Scans are run in batches of SCANS until a repeat took SCAN_DURATION seconds of CPU time: the headless farm is
+# CPU bound, and CPU time leaves out the time other processes had the CPU
+SCANS = 20
+SCAN_DURATION = 1.0
+LATENCY_TRIALS = 100
+CLIENT_COUNTS = (1, 10, 100)
+LOAD_DURATION = 2.0
+# Relative change of a metric reported as a regression
+TOLERANCE = 0.2
+
+
+def serve(endpoint):
+    # Local simulator stand-in in its own process, so client load does not share its event loop
+    plc = PLCSimulator(endpoint=endpoint, event_driven=True)
+    asyncio.run(plc.main())
+
+
+async def connect(endpoint, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        client = PLCClient(url=endpoint, timeout=10)
+        try:
+            await client.init()
+            return client
+        except (OSError, asyncio.TimeoutError):
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def summarize(samples):
+    # {metric: value} of {metric: [one value per repeat]}, and the spread (max - min) / median of each metric
+    values = {metric: float(np.median(repeats) if metric.endswith("_ms") else np.max(repeats))
+              for metric, repeats in samples.items()}
+    spread = {metric: float(np.ptp(repeats) / np.median(repeats)) for metric, repeats in samples.items()}
+    return values, spread
+
+
+async def scan_throughput():
+    # Scans per second of a headless farm in virtual time, tag count grows with the PLC count
+    results = {}
+    for count in FARM_SIZES:
+        server = Server()
+        await server.init()
+        idx = await server.register_namespace("http://PLC-simulator/opc")
+        farm = PLCFarm(count, clock=VirtualClock())
+        farm.server = server
+        await farm.add_plc_objects(idx)
+        # Warm-up, the first scans allocate the images and fill the caches
+        await farm.step(SCANS)
+        repeats = []
+        for _ in range(REPEATS):
+            gc.collect()
+            scans = 0
+            start = time.process_time()
+            while time.process_time() - start < SCAN_DURATION:
+                await farm.step(SCANS)
+                scans += SCANS
+            repeats.append(scans / (time.process_time() - start))
+        results[f"scans_per_s@{count * len(ROW_TAGS)}_tags"] = repeats
+    return results
+
+
+async def output_latency(endpoint):
+    # Client write of START/STOP until the In Valve change is notified back to the client
+    client = await connect(endpoint)
+    results = {"output_latency_p50_ms": [], "output_latency_p99_ms": []}
+
+    async def trial():
+        samples = []
+        for button, expected in (("DI0", True), ("DI2", False)):
+            start = time.perf_counter()
+            await client.set_object_value(button, True)
+            await client.wait_for("DQ0", expected)
+            samples.append((time.perf_counter() - start) * 1000)
+            await client.set_object_value(button, False)
+        return samples
+
+    try:
+        # Warm-up, the first writes resolve and cache the nodes
+        for _ in range(LATENCY_TRIALS // 10):
+            await trial()
+        for _ in range(REPEATS):
+            samples = [sample for _ in range(LATENCY_TRIALS) for sample in await trial()]
+            p50, p99 = np.percentile(samples, (50, 99))
+            results["output_latency_p50_ms"].append(p50)
+            results["output_latency_p99_ms"].append(p99)
+    finally:
+        await client.disconnect()
+    return results
+
+
+async def client_load(endpoint):
+    # Total get_object_value calls per second with N clients reading as fast as they can
+    results = {}
+    for count in CLIENT_COUNTS:
+        clients = [await connect(endpoint) for _ in range(count)]
+
+        async def hammer(client, deadline):
+            reads = 0
+            while time.perf_counter() < deadline:
+                await client.get_object_value("DQ0")
+                reads += 1
+            return reads
+
+        # Warm-up, the first read of every client resolves the node
+        for client in clients:
+            await client.get_object_value("DQ0")
+        repeats = []
+        for _ in range(REPEATS):
+            deadline = time.perf_counter() + LOAD_DURATION
+            reads = await asyncio.gather(*(hammer(client, deadline) for client in clients))
+            repeats.append(sum(reads) / LOAD_DURATION)
+        results[f"reads_per_s@{count}_clients"] = repeats
+        for client in clients:
+            await client.disconnect()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ (metric, baseline, current, change) of every metric that got worse by more than `tolerance` """
+    regressions = []
+    for metric, value in results.items():
+        if metric not in baseline:
+            continue
+        change = (value - baseline[metric]) / baseline[metric]
+        # Latencies must not grow, rates must not drop
+        worse = change > tolerance if metric.endswith("_ms") else change < -tolerance
+        if worse:
+            regressions.append((metric, baseline[metric], value, change))
+    return regressions
+
+
+async def run_all():
+    results = await scan_throughput()
+    endpoint = endpoint_for(free_port())
+    server = multiprocessing.Process(target=serve, args=(endpoint,), daemon=True)
+    server.start()
+    try:
+        results.update(await output_latency(endpoint))
+        results.update(await client_load(endpoint))
+    finally:
+        server.terminate()
+        server.join()
+    return summarize(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan throughput, output latency and client load benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file of this run")
+    parser.add_argument("--baseline", default=BASELINE, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="relative change reported as regression")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    results, spread = asyncio.run(run_all())
+    report = {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+              "repeats": REPEATS, "metrics": results, "spread": spread}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for metric, value in results.items():
+        print(f"{metric:<36} {value:12.2f}   spread {spread[metric] * 100:5.1f} % over {REPEATS} repeats")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline stored in {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["metrics"]
+    regressions = compare(results, baseline, args.tolerance)
+    for metric, before, after, change in regressions:
+        print(f"REGRESSION {metric}: {before:.2f} -> {after:.2f} ({change * 100:+.1f} %)")
+    if not regressions:
+        print(f"No regression beyond {args.tolerance * 100:.0f} % against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
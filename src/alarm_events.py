@@ -0,0 +1,94 @@
+import copy
+from datetime import datetime
+from asyncua import ua
+from asyncua.common.methods import uamethod
+from registers import ALARMS
+
+# Event message and severity (1-1000) of each alarm
+ALARM_MESSAGES = {"A0": "Tank Level Too High",
+                  "A1": "Tank Level Too Low",
+                  "A2": "Fluid Temperature Too High",
+                  "A3": "Fluid Temperature Too Low",
+                  "A4": "Discharging Door Open",
+                  "A5": "Emergency Button Pressed"}
+ALARM_SEVERITIES = {"A0": 500, "A1": 500, "A2": 700, "A3": 500, "A4": 300, "A5": 900}
+
+
+class AlarmEvents:
+    """ AlarmConditionType events of every PLC of one server, emitted from the Server object on transitions only """
+
+    def __init__(self, server):
+        self.server = server
+        self.generator = None
+        # Condition (alarm object) NodeId -> (plc, alarm), and the last event of each condition
+        self.conditions = {}
+        self.events = {}
+
+    async def init(self):
+        self.generator = await self.server.get_event_generator(ua.ObjectIds.AlarmConditionType)
+        # asyncua types UtcTime fields by their DataType NodeId, which a Variant cannot encode
+        for name in ("ActiveState/TransitionTime", "AckedState/TransitionTime"):
+            self.generator.event.data_types[name] = ua.VariantType.DateTime
+        # ConditionRefresh replays the retained conditions to a new subscriber, bound by asyncua on request only
+        iserver = self.server.iserver
+        if ua.ObjectIds.RefreshStartEventType not in iserver.subscription_service.standard_events:
+            await iserver.setup_condition_methods()
+        # Clients call the type's Acknowledge with the ConditionId of the event as object
+        self.server.link_method(
+            self.server.get_node(ua.NodeId(ua.ObjectIds.AcknowledgeableConditionType_Acknowledge)), self.acknowledge)
+
+    def add(self, plc, alarm, node, name):
+        """ Register the alarm object `node` of `plc` as the condition of `alarm`, SourceName "<name>.<alarm>" """
+        # Own event object per condition, ConditionRefresh replays the last one of every retained condition
+        event = copy.copy(self.generator.event)
+        event.NodeId = node.nodeid
+        event.SourceNode = node.nodeid
+        event.SourceName = f"{name}.{alarm}"
+        event.ConditionName = alarm
+        event.Severity = ALARM_SEVERITIES[alarm]
+        event.EnabledState = ua.LocalizedText("Enabled")
+        setattr(event, "EnabledState/Id", True)
+        self.set_state(event, False, False, False)
+        self.conditions[node.nodeid] = (plc, alarm)
+        self.events[(plc, alarm)] = event
+
+    @staticmethod
+    def set_state(event, active, acked, retain):
+        now = datetime.utcnow()
+        if getattr(event, "ActiveState/Id") != active:
+            setattr(event, "ActiveState/TransitionTime", now)
+        if getattr(event, "AckedState/Id") != acked:
+            setattr(event, "AckedState/TransitionTime", now)
+        event.ActiveState = ua.LocalizedText("Active" if active else "Inactive")
+        setattr(event, "ActiveState/Id", active)
+        event.AckedState = ua.LocalizedText("Acknowledged" if acked else "Unacknowledged")
+        setattr(event, "AckedState/Id", acked)
+        event.Retain = retain
+
+    async def publish(self, plc, previous, masks):
+        """ One event per alarm whose Active/UnAck/Status bits differ between the (Active, UnAck, Status) masks """
+        changed = 0
+        for before, after in zip(previous, masks):
+            changed |= before ^ after
+        if not changed:
+            return
+        active, unack, status = masks
+        for bit, alarm in enumerate(ALARMS):
+            if changed >> bit & 1:
+                event = self.events[(plc, alarm)]
+                self.set_state(event, bool(active >> bit & 1), not unack >> bit & 1, bool(status >> bit & 1))
+                # The shared generator sends whichever event it holds, nothing awaits before that
+                self.generator.event = event
+                await self.generator.trigger(message=ALARM_MESSAGES[alarm])
+
+    @uamethod
+    async def acknowledge(self, parent, event_id, comment):
+        # Acknowledge(EventId, Comment) on a condition, lands in the masks and is published by the next scan
+        if parent not in self.conditions:
+            return ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown)
+        plc, alarm = self.conditions[parent]
+        event = self.events[(plc, alarm)]
+        if event.EventId is None or event_id != event.EventId.Value:
+            return ua.StatusCode(ua.StatusCodes.BadEventIdUnknown)
+        if not plc.acknowledge(alarm):
+            return ua.StatusCode(ua.StatusCodes.BadConditionBranchAlreadyAcked)
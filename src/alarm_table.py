@@ -0,0 +1,228 @@
+import json
+import operator
+import numpy as np
+from registers import ACTIVE, ALARMS, ANALOG_INPUTS, DIGITAL_INPUTS, STATUS, UNACK
+
+# Declarative alarm rules: alarm, input tag, comparison, limit
+ALARM_RULES = (("A0", "DI8", "==", True),  # Tank Level Too High
+               ("A1", "DI5", "==", True),  # Tank Level Too Low
+               ("A2", "AI0", ">", 80),     # Fluid Temperature Too High
+               ("A3", "AI0", "<", 10),     # Fluid Temperature Too Low
+               ("A4", "DI9", "==", True),  # Discharging Door Open
+               ("A5", "DI3", "==", True))  # Emergency Button Pressed
+
+# Press RESET for ack.
+RESET_INPUT = "DI4"
+
+COMPARISONS = {"==": operator.eq, "!=": operator.ne,
+               ">": operator.gt, ">=": operator.ge,
+               "<": operator.lt, "<=": operator.le}
+# Direction a limit moves by its deadband once the alarm is active: a high alarm clears below limit - deadband
+DEADBAND_SIGNS = {">": 1.0, ">=": 1.0, "<": -1.0, "<=": -1.0}
+
+# Per-alarm conditioning, all off by default: deadband in input units, delays in seconds of scan clock time,
+# shelved alarms never turn Active
+ALARM_OPTIONS = {"deadband": 0.0, "on_delay": 0.0, "off_delay": 0.0, "shelved": False}
+ALARM_SHIFTS = np.arange(len(ALARMS), dtype=np.uint32)
+ALARM_WEIGHTS = np.uint32(1) << ALARM_SHIFTS
+
+
+def load_alarm_config(path):
+    """ (rules, options, reset input) of a JSON or YAML alarm file
+
+    {"reset_input": "DI4",
+     "alarms": [{"alarm": "A2", "input": "AI0", "comparison": ">", "limit": 80,
+                 "deadband": 2.0, "on_delay": 1.0, "off_delay": 3.0, "shelved": false}, ...]}
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"{path}: YAML alarm files need PyYAML, use JSON otherwise") from None
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    rules = []
+    options = {}
+    for entry in config["alarms"]:
+        entry = dict(entry)
+        alarm = entry.pop("alarm")
+        if alarm in options:
+            raise ValueError(f"{path}: alarm {alarm} is defined twice")
+        try:
+            rules.append((alarm, entry.pop("input"), entry.pop("comparison"), entry.pop("limit")))
+        except KeyError as error:
+            raise ValueError(f"{path}: alarm {alarm} has no {error.args[0]}") from None
+        entry.pop("description", None)
+        unknown = set(entry) - set(ALARM_OPTIONS)
+        if unknown:
+            raise ValueError(f"{path}: alarm {alarm} has unknown settings {sorted(unknown)}")
+        options[alarm] = entry
+    return tuple(rules), options, config.get("reset_input", RESET_INPUT)
+
+
+class AlarmGroup:
+    """ Rules sharing one register and one comparison, evaluated as one array operation """
+
+    def __init__(self, register, comparison):
+        self.register = register
+        self.comparison = COMPARISONS[comparison]
+        self.sign = DEADBAND_SIGNS.get(comparison, 0.0)
+        self.columns = []
+        self.limits = []
+        self.alarms = []
+        self.deadbands = []
+
+    def compile(self, dtype):
+        self.columns = np.array(self.columns, dtype=np.intp)
+        self.limits = np.array(self.limits, dtype=dtype)
+        self.alarms = np.array(self.alarms, dtype=np.intp)
+        self.weights = ALARM_WEIGHTS[self.alarms]
+        self.deadbands = np.array(self.deadbands, dtype=np.float64)
+        self.has_deadband = bool(self.deadbands.any())
+
+    def hits(self, values, active=None):
+        # (rows, rules) comparisons, limits of the alarms already active shifted by their deadband
+        limits = self.limits
+        if self.has_deadband and active is not None:
+            limits = limits - self.sign * self.deadbands * active[:, self.alarms]
+        return self.comparison(values[:, self.columns], limits)
+
+    def evaluate(self, values):
+        # (rows, rules) hits folded into one alarm mask per row
+        return self.hits(values).astype(np.uint32) @ self.weights
+
+
+class AlarmTable:
+    """ ALARM_RULES compiled into a few vectorized comparisons over the register arrays """
+
+    def __init__(self, rules=ALARM_RULES, options=None, reset_input=RESET_INPUT):
+        self.rules = rules
+        self.groups = {}
+        # Where each alarm's limit lives, so limits can be tuned after compiling
+        self.limit_index = {}
+        options = options or {}
+        self.on_delays = np.zeros(len(ALARMS))
+        self.off_delays = np.zeros(len(ALARMS))
+        # Clock time until which an alarm is shelved, inf while shelved for good
+        self.shelved_until = np.full(len(ALARMS), -np.inf)
+        for alarm, tag, comparison, limit in rules:
+            if alarm not in ALARMS:
+                raise ValueError(f"Unknown alarm {alarm}")
+            # One rule per alarm: set_limit() and the deadband tune a single limit
+            if alarm in self.limit_index:
+                raise ValueError(f"Alarm {alarm} has more than one rule")
+            if comparison not in COMPARISONS:
+                raise ValueError(f"Alarm {alarm}: unknown comparison {comparison}")
+            if tag in DIGITAL_INPUTS:
+                register, column = "digital", DIGITAL_INPUTS.index(tag)
+            elif tag in ANALOG_INPUTS:
+                register, column = "analog", ANALOG_INPUTS.index(tag)
+            else:
+                raise ValueError(f"Alarm {alarm}: unknown input {tag}")
+            settings = dict(ALARM_OPTIONS, **options.get(alarm, {}))
+            if settings["deadband"] and (register == "digital" or comparison not in DEADBAND_SIGNS):
+                raise ValueError(f"Alarm {alarm}: a deadband needs an analog input and <, <=, > or >=")
+            index = ALARMS.index(alarm)
+            self.on_delays[index] = settings["on_delay"]
+            self.off_delays[index] = settings["off_delay"]
+            if settings["shelved"]:
+                self.shelved_until[index] = np.inf
+
+            group = self.groups.setdefault((register, comparison), AlarmGroup(register, comparison))
+            self.limit_index[alarm] = (group, len(group.columns))
+            group.columns.append(column)
+            group.limits.append(limit)
+            group.alarms.append(index)
+            group.deadbands.append(settings["deadband"])
+        for group in self.groups.values():
+            group.compile(bool if group.register == "digital" else np.float64)
+        self.reset_column = DIGITAL_INPUTS.index(reset_input)
+
+        # Deadbands and delays need each alarm's own state, plain rules fold straight into the masks
+        self.conditioned = bool(self.on_delays.any() or self.off_delays.any()
+                                or any(group.has_deadband for group in self.groups.values()))
+        # (rows, alarms) clock time since when the condition differs from Active, NaN when it agrees
+        self.since = None
+
+    @classmethod
+    def from_file(cls, path):
+        """ Table compiled from a JSON or YAML alarm file, see load_alarm_config """
+        return cls(*load_alarm_config(path))
+
+    def set_limit(self, alarm, limit):
+        group, position = self.limit_index[alarm]
+        group.limits[position] = limit
+
+    def shelve(self, alarm, until=np.inf):
+        # Suppress `alarm` up to clock time `until`, for every row of the table
+        self.shelved_until[ALARMS.index(alarm)] = until
+
+    def unshelve(self, alarm):
+        self.shelved_until[ALARMS.index(alarm)] = -np.inf
+
+    def reset(self):
+        # Forget the running on/off delays, as after a restart
+        self.since = None
+
+    def timers(self, row, now):
+        # Seconds the on/off delay of each alarm of `row` has been running at clock time `now`, NaN when idle
+        if self.since is None:
+            return np.full(len(ALARMS), np.nan)
+        return now - self.since[row]
+
+    def set_timers(self, row, elapsed, now, rows):
+        # Inverse of timers() at clock time `now`, `rows` the number of rows the table is scanned with
+        if self.since is None:
+            self.since = np.full((rows, len(ALARMS)), np.nan)
+        self.since[row] = now - elapsed
+
+    def condition(self, digital_inputs, analog_inputs, active):
+        """ (rows, alarms) raw conditions, the deadbands applied to the alarms `active` already """
+        raw = np.zeros((len(digital_inputs), len(ALARMS)), dtype=bool)
+        for group in self.groups.values():
+            raw[:, group.alarms] = group.hits(digital_inputs if group.register == "digital" else analog_inputs,
+                                              active)
+        return raw
+
+    def debounce(self, raw, active, now):
+        # Active follows the condition once it held for on_delay (or stayed off for off_delay) seconds
+        if self.since is None or self.since.shape != raw.shape:
+            self.since = np.full(raw.shape, np.nan)
+        differs = raw != active
+        since = np.where(differs, np.where(np.isnan(self.since), now, self.since), np.nan)
+        flip = differs & (now - since >= np.where(raw, self.on_delays, self.off_delays))
+        self.since = np.where(flip, np.nan, since)
+        return active ^ flip
+
+    def evaluate(self, digital_inputs, analog_inputs):
+        """ Active alarm mask of every row of the (rows, tags) input arrays """
+        active = np.zeros(len(digital_inputs), dtype=np.uint32)
+        for group in self.groups.values():
+            active |= group.evaluate(digital_inputs if group.register == "digital" else analog_inputs)
+        return active
+
+    def scan(self, digital_inputs, analog_inputs, alarms, now=0.0):
+        # alarms is the (rows, Active/UnAck/Status) mask array, updated in place, now the scan clock time
+        if self.conditioned:
+            previous = ((alarms[:, ACTIVE, None] >> ALARM_SHIFTS) & 1).astype(bool)
+            raw = self.condition(digital_inputs, analog_inputs, previous)
+            active = self.debounce(raw, previous, now).astype(np.uint32) @ ALARM_WEIGHTS
+        else:
+            active = self.evaluate(digital_inputs, analog_inputs)
+        shelved = now < self.shelved_until
+        if shelved.any():
+            # An unshelved alarm waits its full on_delay again
+            if self.since is not None:
+                self.since[:, shelved] = np.nan
+            active &= ~np.uint32(ALARM_WEIGHTS[shelved].sum())
+        reset = digital_inputs[:, self.reset_column]
+        alarms[reset, UNACK] = 0
+        alarms[reset, STATUS] = 0
+        rising = active & ~alarms[:, ACTIVE]
+        alarms[:, ACTIVE] = active
+        # A new alarm is unacknowledged until RESET or Acknowledge, an active alarm stays latched
+        alarms[:, UNACK] |= rising
+        alarms[:, STATUS] |= active
+        return active
@@ -0,0 +1,156 @@
+import numpy as np
+from asyncua import ua
+from asyncua.common.methods import uamethod
+from registers import ANALOG_INPUTS, DIGITAL_INPUTS, DIGITAL_OUTPUTS
+
+
+class ForceTable:
+    """ Forced DI/AI/DQ values of every PLC of a bank, overlaid on the registers at fixed points of the scan
+
+    Forced inputs replace the values read from the nodes before alarms and logic are evaluated, forced outputs
+    replace the result of the logic before the outputs are written.
+    """
+
+    def __init__(self, bank):
+        # tag -> (register array, forced mask, forced values, column), masks and values shaped like the bank
+        self.columns = {}
+        self.inputs = []
+        self.outputs = []
+        for names, array, group in ((DIGITAL_INPUTS, bank.digital_inputs, self.inputs),
+                                    (ANALOG_INPUTS, bank.analog_inputs, self.inputs),
+                                    (DIGITAL_OUTPUTS, bank.digital_outputs, self.outputs)):
+            entry = (array, np.zeros(array.shape, dtype=bool), np.zeros_like(array))
+            group.append(entry)
+            for column, name in enumerate(names):
+                self.columns[name] = entry + (column,)
+        # Forced (row, tag) pairs of each group, both scan hooks are no-ops while nothing is forced
+        self.forced_inputs = 0
+        self.forced_outputs = 0
+
+    def is_output(self, tag):
+        return tag in DIGITAL_OUTPUTS
+
+    def force(self, row, tag, value):
+        """ Hold `tag` of PLC `row` at `value`, returned as stored in the register (e.g. 1 -> True) """
+        if tag not in self.columns:
+            raise ValueError(f"{tag} cannot be forced, only {', '.join(self.columns)}")
+        array, mask, values, column = self.columns[tag]
+        if not mask[row, column]:
+            mask[row, column] = True
+            if self.is_output(tag):
+                self.forced_outputs += 1
+            else:
+                self.forced_inputs += 1
+        values[row, column] = value
+        # In the register right away, not only from the next scan on
+        array[row, column] = values[row, column]
+        return values[row, column].item()
+
+    def unforce(self, row, tag):
+        """ Give `tag` back to the inputs or the logic, False when it was not forced """
+        if tag not in self.columns:
+            raise ValueError(f"{tag} cannot be forced, only {', '.join(self.columns)}")
+        _, mask, _, column = self.columns[tag]
+        if not mask[row, column]:
+            return False
+        mask[row, column] = False
+        if self.is_output(tag):
+            self.forced_outputs -= 1
+        else:
+            self.forced_inputs -= 1
+        return True
+
+    def unforce_all(self, row):
+        for tag in self.forced(row):
+            self.unforce(row, tag)
+
+    def forced(self, row):
+        # {tag: value} of the forced tags of PLC `row`
+        return {tag: values[row, column].item() for tag, (_, mask, values, column) in self.columns.items()
+                if mask[row, column]}
+
+    def state(self, row):
+        # Forced mask and values of PLC `row`, one entry per tag in DI, AI, DQ order
+        return {"forced": np.array([mask[row, column] for _, mask, _, column in self.columns.values()]),
+                "forced_values": np.array([values[row, column] for _, _, values, column in self.columns.values()],
+                                          dtype=np.float64)}
+
+    def decode(self, state):
+        # (tag, forced, value as its register stores it) of every tag of a state() dict
+        return [(tag, bool(forced), values.dtype.type(value))
+                for (tag, (_, _, values, _)), forced, value in zip(self.columns.items(), state["forced"],
+                                                                   state["forced_values"])]
+
+    def set_state(self, row, forces):
+        for tag, forced, value in forces:
+            if forced:
+                self.force(row, tag, value)
+            else:
+                self.unforce(row, tag)
+
+    @staticmethod
+    def overlay(group, rows):
+        for array, mask, values in group:
+            np.copyto(array[rows], values[rows], where=mask[rows])
+
+    def apply_inputs(self, rows=slice(None)):
+        if self.forced_inputs:
+            self.overlay(self.inputs, rows)
+
+    def apply_outputs(self, rows=slice(None)):
+        if self.forced_outputs:
+            self.overlay(self.outputs, rows)
+
+
+class ForceMethods:
+    """ Force(tag, value), Unforce(tag) and UnforceAll() on every PLC object of one server
+
+    The method nodes are created once, under the first PLC object, and referenced by the others: the Call service
+    passes the PLC object as ObjectId.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        # PLC object NodeId -> PLCSimulator
+        self.plcs = {}
+        self.methods = None
+
+    async def add(self, plc, node):
+        self.plcs[node.nodeid] = plc
+        if self.methods is None:
+            tag = ua.VariantType.String
+            self.methods = [await node.add_method(plc.idx, "Force", self.force, [tag, ua.VariantType.Variant], []),
+                            await node.add_method(plc.idx, "Unforce", self.unforce, [tag], []),
+                            await node.add_method(plc.idx, "UnforceAll", self.unforce_all, [], [])]
+            return
+        await self.server.iserver.isession.add_references(
+            [ua.AddReferencesItem(SourceNodeId=node.nodeid, ReferenceTypeId=ua.NodeId(ua.ObjectIds.HasComponent),
+                                  IsForward=True, TargetNodeId=method.nodeid, TargetNodeClass=ua.NodeClass.Method)
+             for method in self.methods])
+
+    @uamethod
+    async def force(self, parent, tag, value):
+        plc = self.plcs.get(parent)
+        if plc is None:
+            return ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown)
+        try:
+            await plc.force(tag, value)
+        except (ValueError, TypeError):
+            return ua.StatusCode(ua.StatusCodes.BadInvalidArgument)
+
+    @uamethod
+    async def unforce(self, parent, tag):
+        plc = self.plcs.get(parent)
+        if plc is None:
+            return ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown)
+        try:
+            plc.unforce(tag)
+        except ValueError:
+            return ua.StatusCode(ua.StatusCodes.BadInvalidArgument)
+
+    @uamethod
+    async def unforce_all(self, parent):
+        plc = self.plcs.get(parent)
+        if plc is None:
+            return ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown)
+        plc.unforce_all()
@@ -0,0 +1,57 @@
+from enum import Enum
+
+
+class Step(Enum):
+    INIT = 0         # Waiting for START button
+    STARTING = 1     # Prefilling until low level floater
+    READY = 2        # Prefilled, waiting for RUN button
+    RUNNING = 3      # Filling until high level floater
+    HEATING = 4      # Heating until temperature setpoint
+    DISCHARGING = 5  # Discharging until low level floater
+
+
+# Outputs driven by the sequence and the ones set while each step is active
+SEQUENCE_OUTPUTS = ("DQ0", "DQ1", "DQ2")
+STEP_ACTIONS = {Step.INIT: (),
+                Step.STARTING: ("DQ0",),     # Open In Valve
+                Step.READY: (),
+                Step.RUNNING: ("DQ0",),      # Open In Valve
+                Step.HEATING: ("DQ2",),      # Start Heating System
+                Step.DISCHARGING: ("DQ1",)}  # Open Out Valve
+
+
+class Grafcet:
+    """ Step/transition state machine of the tank sequence, one evaluation per scan """
+
+    def __init__(self, heating_setpoint=45):
+        self.heating_setpoint = heating_setpoint
+        self.step = Step.INIT
+
+    def reset(self):
+        self.step = Step.INIT
+
+    def transition(self, digital_inputs, analog_inputs):
+        # Receptivity of the active step, True when the next step can be activated
+        if self.step is Step.INIT:
+            return digital_inputs["DI0"]  # START button pressed
+        if self.step is Step.STARTING:
+            return digital_inputs["DI6"]  # Tank level reached
+        if self.step is Step.READY:
+            return digital_inputs["DI1"]  # RUN button pressed
+        if self.step is Step.RUNNING:
+            return digital_inputs["DI7"]  # High level reached
+        if self.step is Step.HEATING:
+            return analog_inputs["AI0"] >= self.heating_setpoint  # Setpoint reached
+        return not digital_inputs["DI6"]  # DISCHARGING: level fell below the low level floater
+
+    def evaluate(self, digital_inputs, analog_inputs):
+        # Fire at most one transition, never waits for an input inside the scan
+        if self.transition(digital_inputs, analog_inputs):
+            self.step = Step((self.step.value + 1) % len(Step))
+        return self.step
+
+    def apply_actions(self, digital_outputs, hold=False):
+        # A held sequence keeps its step but drops all step actions
+        active = () if hold else STEP_ACTIONS[self.step]
+        for name in SEQUENCE_OUTPUTS:
+            digital_outputs[name] = name in active
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import time
+import numpy as np
+from registers import ALARMS, ALARM_FIELDS, ANALOG_INPUTS, DIGITAL_INPUTS, DIGITAL_OUTPUTS
+
+# Tags of one PLC in the order of a row of the process image
+ROW_TAGS = (DIGITAL_INPUTS + ANALOG_INPUTS + DIGITAL_OUTPUTS
+            + tuple(f"{alarm}.{field}" for field in ALARM_FIELDS for alarm in ALARMS))
+ALARM_SHIFTS = np.arange(len(ALARMS), dtype=np.uint32)
+
+
+def row_values(bank):
+    # (rows, ROW_TAGS) float image of the bank, alarm masks unpacked to one bit per tag
+    alarm_bits = (bank.alarms[:, :, None] >> ALARM_SHIFTS) & 1
+    return np.concatenate([bank.digital_inputs, bank.analog_inputs, bank.digital_outputs,
+                           alarm_bits.reshape(bank.count, -1)], axis=1)
+
+
+class Segment:
+    """ One flushed batch on disk: time/value columns grouped by tag, offsets[tag] is where a tag starts """
+
+    def __init__(self, path):
+        self.path = path
+        self.times = np.load(os.path.join(path, "time.npy"), mmap_mode="r")
+        self.values = np.load(os.path.join(path, "value.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        bounds = np.load(os.path.join(path, "bounds.npy"))
+        self.start, self.end = bounds
+
+    @staticmethod
+    def write(path, tag_count, tags, times, values):
+        # Stable sort by tag keeps every tag's samples in time order
+        order = np.argsort(tags, kind="stable")
+        tags = tags[order]
+        tmp = path + ".tmp"
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "time.npy"), times[order])
+        np.save(os.path.join(tmp, "value.npy"), values[order])
+        np.save(os.path.join(tmp, "offsets.npy"), np.searchsorted(tags, np.arange(tag_count + 1)))
+        np.save(os.path.join(tmp, "bounds.npy"), np.array([times.min(), times.max()]))
+        os.rename(tmp, path)
+        return Segment(path)
+
+    def query(self, tag, start, end):
+        first, last = self.offsets[tag], self.offsets[tag + 1]
+        times = self.times[first:last]
+        lo, hi = np.searchsorted(times, start, "left"), np.searchsorted(times, end, "right")
+        return np.array(times[lo:hi]), np.array(self.values[first + lo:first + hi])
+
+
+class Historian:
+    """ Change-only samples of the process image, kept in a ring buffer and flushed to columnar segments """
+
+    def __init__(self, path, capacity=1 << 20, flush_size=1 << 16, flush_interval=10.0):
+        self.path = path
+        # Ring buffer of (time, tag, value) samples, allocated once in attach
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.head = 0       # samples appended since start
+        self.flushed = 0    # samples handed to the writer
+        self.last_flush = None
+        # Unix time of clock time 0, fixed by the first record: samples are stamped in wall-clock seconds so the
+        # segments of earlier runs, reloaded by attach, share one time axis with this one
+        self.epoch = None
+
+        self.tags = []
+        self.tag_index = {}
+        self.segments = []
+        # Batches being written by the executor, still answered from memory
+        self.writing = {}
+        self.pending = set()
+
+        # Samples recorded/skipped as unchanged since start
+        self.recorded = 0
+        self.skipped = 0
+
+    def attach(self, bank, names):
+        """ Record the rows of `bank`, PLC `names[row]`, as tags "<name>.<tag>" """
+        self.bank = bank
+        self.tags = [f"{name}.{tag}" for name in names for tag in ROW_TAGS]
+        self.tag_index = {tag: i for i, tag in enumerate(self.tags)}
+        if self.capacity < len(self.tags) + self.flush_size:
+            raise ValueError(f"Historian capacity {self.capacity} too small for {len(self.tags)} tags")
+        self.times = np.zeros(self.capacity, dtype=np.float64)
+        self.tag_ids = np.zeros(self.capacity, dtype=np.uint32)
+        self.values = np.zeros(self.capacity, dtype=np.float64)
+        # NaN never compares equal, the first record stores the whole image
+        self.last = np.full(len(self.tags), np.nan)
+
+        os.makedirs(self.path, exist_ok=True)
+        tags_file = os.path.join(self.path, "tags.json")
+        if os.path.exists(tags_file):
+            with open(tags_file) as f:
+                if json.load(f) != self.tags:
+                    raise ValueError(f"{self.path} holds the history of another tag set")
+            self.segments = [Segment(os.path.join(self.path, entry)) for entry in sorted(os.listdir(self.path))
+                             if entry.startswith("segment_") and not entry.endswith(".tmp")]
+        else:
+            with open(tags_file, "w") as f:
+                json.dump(self.tags, f)
+
+    def record(self, now):
+        """ Append the samples changed since the last scan, at clock time `now`, flush in the background when due """
+        if self.epoch is None:
+            self.epoch = time.time() - now
+        values = row_values(self.bank).ravel()
+        changed = np.flatnonzero(values != self.last)
+        self.last = values
+        count = len(changed)
+        if self.head + count - self.flushed > self.capacity:
+            self.flush()
+
+        position = self.head % self.capacity
+        split = min(count, self.capacity - position)
+        for target, source in ((slice(position, position + split), slice(0, split)),
+                               (slice(0, count - split), slice(split, count))):
+            self.times[target] = self.epoch + now
+            self.tag_ids[target] = changed[source]
+            self.values[target] = values[changed[source]]
+        self.head += count
+        self.recorded += count
+        self.skipped += len(values) - count
+
+        if self.last_flush is None:
+            self.last_flush = now
+        if self.head - self.flushed >= self.flush_size or now - self.last_flush >= self.flush_interval:
+            self.flush()
+            self.last_flush = now
+
+    def unflushed(self):
+        # Copy of the ring buffer content not yet handed to the writer, in append order
+        positions = np.arange(self.flushed, self.head) % self.capacity
+        return self.tag_ids[positions], self.times[positions], self.values[positions]
+
+    def flush(self):
+        """ Hand the unflushed samples to a worker thread, the scan never waits for the disk """
+        if self.head == self.flushed:
+            return
+        batch = self.unflushed()
+        self.flushed = self.head
+        name = os.path.join(self.path, f"segment_{len(self.segments) + len(self.writing):08d}")
+        self.writing[name] = batch
+        future = asyncio.get_running_loop().run_in_executor(None, Segment.write, name, len(self.tags), *batch)
+        task = asyncio.ensure_future(self.finish(name, future))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def finish(self, name, future):
+        self.segments.append(await future)
+        self.segments.sort(key=lambda segment: segment.path)
+        del self.writing[name]
+
+    async def close(self):
+        self.flush()
+        if self.pending:
+            await asyncio.gather(*self.pending)
+
+    def query(self, tag, start=-np.inf, end=np.inf):
+        """ (times, values) of the samples of `tag` within [start, end], change-only, times in Unix seconds """
+        index = self.tag_index[tag]
+        parts = [segment.query(index, start, end) for segment in self.segments
+                 if segment.end >= start and segment.start <= end]
+        for tags, times, values in list(self.writing.values()) + [self.unflushed()]:
+            hit = (tags == index) & (times >= start) & (times <= end)
+            parts.append((times[hit], values[hit]))
+        if not parts:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate([times for times, _ in parts]), np.concatenate([values for _, values in parts])
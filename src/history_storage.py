@@ -0,0 +1,231 @@
+import asyncio
+import bisect
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+
+import aiosqlite
+from asyncua import ua
+from asyncua.common.utils import Buffer
+from asyncua.server.history import HistoryStorageInterface
+from asyncua.ua.ua_binary import variant_from_binary, variant_to_binary
+
+EPOCH = datetime(1970, 1, 1)
+
+# Scalars SQLite stores natively, rebuilt without UA binary decoding; everything else is kept as a binary Variant
+NATIVE_TYPES = {variant_type.value: variant_type for variant_type in (
+    ua.VariantType.Boolean, ua.VariantType.SByte, ua.VariantType.Byte, ua.VariantType.Int16, ua.VariantType.UInt16,
+    ua.VariantType.Int32, ua.VariantType.UInt32, ua.VariantType.Int64, ua.VariantType.UInt64,
+    ua.VariantType.Float, ua.VariantType.Double, ua.VariantType.String)}
+
+
+def source_time(datavalue):
+    return datavalue.SourceTimestamp or datavalue.ServerTimestamp or datetime.utcnow()
+
+
+def history_bounds(start, end):
+    # (low, high, newest first) of a HistoryRead window, an unset StartTime reads backwards from EndTime
+    unset = (None, ua.get_win_epoch())
+    reverse = start in unset
+    low = ua.get_win_epoch() if start in unset else start
+    high = datetime.max if end in unset else end
+    if low > high:
+        low, high, reverse = high, low, True
+    return low, high, reverse
+
+
+def limit_results(results, nb_values, max_size):
+    # NumValuesPerNode first, then the response size, the next read resumes at the continuation point
+    if nb_values:
+        results = results[:nb_values]
+    if len(results) > max_size:
+        return results[:max_size], source_time(results[max_size])
+    return results, None
+
+
+class NodeHistory:
+    """ Time-sorted values of one node, old values dropped from the front """
+
+    def __init__(self, period, count):
+        self.period = period
+        self.count = count
+        self.times = []
+        self.values = []
+        # Index of the oldest kept value, the lists are compacted once half of them is dropped
+        self.first = 0
+
+    def __len__(self):
+        return len(self.times) - self.first
+
+    def append(self, time, datavalue):
+        if not self.times or time >= self.times[-1]:
+            self.times.append(time)
+            self.values.append(datavalue)
+        else:
+            # Late source timestamp, keep the index sorted
+            position = bisect.bisect_right(self.times, time, self.first)
+            self.times.insert(position, time)
+            self.values.insert(position, datavalue)
+
+    def trim(self, now):
+        if self.period:
+            self.first = max(self.first, bisect.bisect_left(self.times, now - self.period, self.first))
+        if self.count and len(self) > self.count:
+            self.first = len(self.times) - self.count
+        if self.first > 1024 and self.first * 2 > len(self.times):
+            del self.times[:self.first]
+            del self.values[:self.first]
+            self.first = 0
+
+    def read(self, low, high, reverse):
+        lo = bisect.bisect_left(self.times, low, self.first)
+        hi = bisect.bisect_right(self.times, high, lo)
+        values = self.values[lo:hi]
+        if reverse:
+            values.reverse()
+        return values
+
+
+class BoundedHistory(HistoryStorageInterface):
+    """ In-memory history, bounded per node by age and count, time-indexed for range reads """
+
+    def __init__(self, period=timedelta(hours=24), count=100000, max_history_data_response_size=10000):
+        super().__init__(max_history_data_response_size)
+        # Retention used when a node is historized without its own period/count
+        self.period = period
+        self.count = count
+        self.nodes = {}
+
+    async def init(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def new_historized_node(self, node_id, period, count=0):
+        self.nodes[node_id] = NodeHistory(period or self.period, count or self.count)
+
+    async def save_node_value(self, node_id, datavalue):
+        history = self.nodes[node_id]
+        history.append(source_time(datavalue), datavalue)
+        history.trim(datetime.utcnow())
+
+    async def read_node_history(self, node_id, start, end, nb_values):
+        if node_id not in self.nodes:
+            logging.warning(f"History read of {node_id}, which is not historized")
+            return [], None
+        results = self.nodes[node_id].read(*history_bounds(start, end))
+        return limit_results(results, nb_values, self.max_history_data_response_size)
+
+
+class SQLiteHistory(HistoryStorageInterface):
+    """ History in one SQLite table keyed on (node, time), inserts batched into few transactions """
+
+    def __init__(self, path="history.db", period=timedelta(days=7), count=0, batch_size=1000,
+                 flush_interval=1.0, retention_interval=60.0, max_history_data_response_size=10000):
+        super().__init__(max_history_data_response_size)
+        self.path = path
+        self.period = period
+        self.count = count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_interval = retention_interval
+        self.retention = {}
+        # Rows waiting for the next batched insert
+        self.pending = []
+        self.db = None
+        self.task = None
+
+    async def init(self):
+        self.db = await aiosqlite.connect(self.path)
+        await self.db.execute("PRAGMA journal_mode=WAL")
+        # Clustered on (node, source_time): a time range of one node is one contiguous b-tree scan,
+        # a second value with the same source timestamp replaces the first
+        await self.db.execute("CREATE TABLE IF NOT EXISTS history (node TEXT NOT NULL, source_time REAL NOT NULL,"
+                              " server_time REAL, status INTEGER, variant_type INTEGER, value,"
+                              " PRIMARY KEY (node, source_time)) WITHOUT ROWID")
+        await self.db.commit()
+        self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        # Background flush, retention applied every retention_interval
+        elapsed = 0.0
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            elapsed += self.flush_interval
+            if elapsed >= self.retention_interval:
+                elapsed = 0.0
+                await self.apply_retention()
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        await self.flush()
+        await self.db.close()
+
+    async def new_historized_node(self, node_id, period, count=0):
+        self.retention[node_id.to_string()] = (period or self.period, count or self.count)
+
+    async def save_node_value(self, node_id, datavalue):
+        server_time = datavalue.ServerTimestamp
+        variant = datavalue.Value
+        if variant.VariantType.value in NATIVE_TYPES and not variant.is_array:
+            variant_type, value = variant.VariantType.value, variant.Value
+        else:
+            variant_type, value = None, variant_to_binary(variant)
+        self.pending.append((node_id.to_string(), (source_time(datavalue) - EPOCH).total_seconds(),
+                             (server_time - EPOCH).total_seconds() if server_time else None,
+                             datavalue.StatusCode.value, variant_type, value))
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        await self.db.executemany("INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?)", rows)
+        await self.db.commit()
+
+    async def apply_retention(self):
+        now = (datetime.utcnow() - EPOCH).total_seconds()
+        for node, (period, count) in self.retention.items():
+            if period:
+                await self.db.execute("DELETE FROM history WHERE node = ? AND source_time < ?",
+                                      (node, now - period.total_seconds()))
+            if count:
+                await self.db.execute("DELETE FROM history WHERE node = ? AND source_time < (SELECT source_time"
+                                      " FROM history WHERE node = ? ORDER BY source_time DESC LIMIT 1 OFFSET ?)",
+                                      (node, node, count - 1))
+        await self.db.commit()
+
+    @staticmethod
+    def variant(variant_type, value):
+        if variant_type is None:
+            return variant_from_binary(Buffer(value))
+        if variant_type == ua.VariantType.Boolean.value:
+            value = bool(value)
+        return ua.Variant(value, NATIVE_TYPES[variant_type])
+
+    async def read_node_history(self, node_id, start, end, nb_values):
+        # Rows still pending must be visible to the reader
+        await self.flush()
+        low, high, reverse = history_bounds(start, end)
+        limit = min(nb_values or self.max_history_data_response_size + 1, self.max_history_data_response_size + 1)
+        try:
+            async with self.db.execute(
+                    "SELECT source_time, server_time, status, variant_type, value FROM history"
+                    " WHERE node = ? AND source_time BETWEEN ? AND ?"
+                    f" ORDER BY source_time {'DESC' if reverse else 'ASC'} LIMIT ?",
+                    (node_id.to_string(), (low - EPOCH).total_seconds(), (high - EPOCH).total_seconds(),
+                     limit)) as cursor:
+                rows = await cursor.fetchall()
+        except sqlite3.Error as error:
+            logging.error(f"History read of {node_id} failed: {error}")
+            return [], None
+        results = [ua.DataValue(self.variant(variant_type, value),
+                                SourceTimestamp=EPOCH + timedelta(seconds=source),
+                                ServerTimestamp=EPOCH + timedelta(seconds=server) if server is not None else None,
+                                StatusCode_=ua.StatusCode(status))
+                   for source, server, status, variant_type, value in rows]
+        return limit_results(results, nb_values, self.max_history_data_response_size)
@@ -0,0 +1,292 @@
+""" Function-block (ladder) programs compiled into a topologically sorted evaluation plan
+
+LOGO!Soft Comfort saves programs (PLC_SY.lld) as an encrypted Java stream, so the compiler reads a netlist instead,
+an XML file such as config/PLC_SY.xml (a hand transcription of evaluate_logic() in plc_simulator.py, not generated
+from the .lld):
+
+    <program name="PLC_SY">
+      <flag name="X0" init="1" ref="X0_NEXT"/>        one-scan memory, reads its ref of the previous scan
+      <block name="STOP" type="OR">                   output signal STOP
+        <in ref="DI2"/><in ref="DI3"/>
+      </block>
+      <block name="HOT" type="CMP" op=">=" value="45"><in ref="AI0"/></block>
+      <block name="K0" type="AND"><in ref="X0"/><in ref="T0" negate="1"/></block>
+      <output name="DQ0" ref="FILL"/>                 coil, written after the plan ran
+    </program>
+
+Signals are the digital inputs (DI0-DI9), the Active bit of each alarm (A0-A5), the flags, the block outputs and
+the constants TRUE/FALSE. Flag and block names are identifiers ([A-Za-z_][A-Za-z0-9_]*). CMP compares an analog
+input (AI0) with a constant. Blocks:
+
+    AND, OR, NAND, NOR, XOR, NOT   any number of inputs, each may be negated
+    CMP                            op (==, !=, <, <=, >, >=) and value
+    SR                             latching relay, inputs S and R (reset wins)
+    TON, TOF                       on-delay/off-delay of one input by `delay` seconds of scan clock time
+
+Blocks are sorted topologically, feedback goes through flags only, and the sorted network is compiled into one
+Python function over bitsets: every signal is an int holding one bit per row (PLC) of the register bank, so a gate
+is a single integer operation whether the bank holds one PLC or thousands.
+"""
+import re
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+from alarm_table import ALARM_SHIFTS, COMPARISONS
+from registers import ACTIVE, ALARMS, ANALOG_INPUTS, DIGITAL_INPUTS, DIGITAL_OUTPUTS
+
+# First bytes of a Java serialization stream, what LOGO!Soft Comfort writes
+JAVA_STREAM_MAGIC = b"\xac\xed\x00\x05"
+
+CONSTANTS = ("FALSE", "TRUE")
+# Gate -> (bitset operator, negate the result)
+GATES = {"AND": (" & ", False), "NAND": (" & ", True), "NOT": (" & ", True),
+         "OR": (" | ", False), "NOR": (" | ", True), "XOR": (" ^ ", False)}
+BLOCK_INPUTS = {"SR": ("S", "R")}
+# Flag and block names, checked before anything of the file reaches the generated code
+NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+KINDS = tuple(GATES) + ("CMP", "SR", "TON", "TOF")
+# Up to 62 rows a bitset fits an int64, packed and unpacked with one array operation
+WORD_ROWS = 62
+ROW_WEIGHTS = np.int64(1) << np.arange(WORD_ROWS, dtype=np.int64)
+
+
+def pack(columns):
+    # (rows, n) bools -> n ints, bit r of int i is columns[r, i]
+    if len(columns) == 1:
+        return columns[0].tolist()
+    if len(columns) <= WORD_ROWS:
+        return (ROW_WEIGHTS[:len(columns)] @ columns).tolist()
+    packed = np.packbits(columns, axis=0, bitorder="little")
+    width = len(packed)
+    data = np.ascontiguousarray(packed.T).tobytes()
+    return [int.from_bytes(data[i * width:(i + 1) * width], "little") for i in range(columns.shape[1])]
+
+
+def unpack(values, rows):
+    # n ints -> (rows, n) bools
+    if rows == 1:
+        return np.array([values], dtype=bool)
+    if rows <= WORD_ROWS:
+        return (np.array(values, dtype=np.int64) >> np.arange(rows, dtype=np.int64)[:, None]) & 1 == 1
+    width = (rows + 7) // 8
+    data = np.frombuffer(b"".join(value.to_bytes(width, "little") for value in values), dtype=np.uint8)
+    bits = np.unpackbits(data.reshape(len(values), width), axis=1, count=rows, bitorder="little")
+    return bits.T.view(bool)
+
+
+def load_program(path):
+    """ (name, flags, blocks, outputs) of a netlist export, raises ValueError on anything it cannot compile """
+    with open(path, "rb") as f:
+        if f.read(len(JAVA_STREAM_MAGIC)) == JAVA_STREAM_MAGIC:
+            raise ValueError(f"{path} is a LOGO!Soft Comfort program, export its netlist as XML (see ladder.py)")
+    root = ElementTree.parse(path).getroot()
+    flags = [(flag.get("name"), flag.get("init", "0") == "1", flag.get("ref")) for flag in root.iter("flag")]
+    blocks = []
+    for block in root.iter("block"):
+        inputs = [(port.get("ref"), port.get("negate", "0") == "1", port.get("port")) for port in block.iter("in")]
+        blocks.append({"name": block.get("name"), "type": block.get("type"), "inputs": inputs,
+                       "op": block.get("op"), "value": float(block.get("value", 0)),
+                       "delay": float(block.get("delay", 0))})
+    outputs = [(output.get("name"), output.get("ref")) for output in root.iter("output")]
+    return root.get("name", path), flags, blocks, outputs
+
+
+class LadderProgram:
+    """ A netlist compiled into one bitset function, run once per scan over the register bank """
+
+    def __init__(self, name, flags, blocks, outputs):
+        self.name = name
+        for signal in [flag for flag, _, _ in flags] + [block["name"] for block in blocks]:
+            if not isinstance(signal, str) or not NAME.fullmatch(signal):
+                raise ValueError(f"{name}: {signal!r} is not a valid flag or block name")
+        self.sources = list(CONSTANTS) + list(DIGITAL_INPUTS) + list(ALARMS) + [flag for flag, _, _ in flags]
+        signals = self.sources + [block["name"] for block in blocks]
+        duplicates = {signal for signal in signals if signals.count(signal) > 1}
+        if duplicates:
+            raise ValueError(f"{name}: signals defined twice {sorted(duplicates)}")
+        # Variable of every signal in the generated code
+        self.variable = {signal: f"s{i}" for i, signal in enumerate(signals)}
+
+        for block in blocks:
+            kind = block["type"]
+            if kind not in KINDS:
+                raise ValueError(f"{name}: block {block['name']} has unknown type {kind}")
+            if not block["inputs"]:
+                raise ValueError(f"{name}: block {block['name']} has no input")
+            if kind == "CMP" and block["op"] not in COMPARISONS:
+                raise ValueError(f"{name}: block {block['name']} has unknown comparison {block['op']}")
+            if kind in BLOCK_INPUTS and sorted(port for _, _, port in block["inputs"]) != sorted(BLOCK_INPUTS[kind]):
+                raise ValueError(f"{name}: block {block['name']} needs the inputs {BLOCK_INPUTS[kind]}")
+            for ref, _, _ in block["inputs"]:
+                known = ref in ANALOG_INPUTS if kind == "CMP" else ref in self.variable
+                if not known:
+                    raise ValueError(f"{name}: block {block['name']} reads unknown signal {ref}")
+        for signal, ref in [(flag, ref) for flag, _, ref in flags] + outputs:
+            if ref not in self.variable:
+                raise ValueError(f"{name}: {signal} reads unknown signal {ref}")
+        for output, _ in outputs:
+            if output not in DIGITAL_OUTPUTS:
+                raise ValueError(f"{name}: unknown output {output}")
+
+        self.blocks = self.sort(blocks)
+        self.flag_init = np.array([init for _, init, _ in flags], dtype=bool)
+        columns = [DIGITAL_OUTPUTS.index(output) for output, _ in outputs]
+        # A contiguous run of outputs is written through a slice, much cheaper than fancy indexing
+        contiguous = columns == list(range(columns[0], columns[0] + len(columns))) if columns else False
+        self.output_columns = slice(columns[0], columns[-1] + 1) if contiguous else np.array(columns, dtype=np.intp)
+        self.comparisons = [(COMPARISONS[block["op"]], ANALOG_INPUTS.index(block["inputs"][0][0]), block["value"])
+                            for block in self.blocks if block["type"] == "CMP"]
+        self.latch_count = sum(block["type"] == "SR" for block in self.blocks)
+        self.delays = np.array([block["delay"] for block in self.blocks if block["type"] in ("TON", "TOF")])
+        self.source = self.generate(flags, outputs)
+        namespace = {}
+        exec(compile(self.source, f"<ladder {name}>", "exec"), namespace)
+        self.evaluate = namespace["evaluate"]
+
+        # Flags and latches as bitsets over the bank rows, timer starts as (rows, timers), set on the first scan
+        self.rows = 0
+        # (first row, row count, row mask, clock time) of the running scan
+        self.window = None
+        self.flags = None
+        self.latches = None
+        self.since = None
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(*load_program(path))
+
+    def sort(self, blocks):
+        # Kahn's algorithm in file order; flags and inputs are sources, so a loop not through a flag is an error
+        producers = {block["name"] for block in blocks}
+        depends = {block["name"]: {ref for ref, _, _ in block["inputs"] if ref in producers} for block in blocks}
+        order = []
+        done = set()
+        ready = [block for block in blocks if not depends[block["name"]]]
+        while ready:
+            order.extend(ready)
+            done.update(block["name"] for block in ready)
+            ready = [block for block in blocks if block["name"] not in done and depends[block["name"]] <= done]
+        if len(done) < len(blocks):
+            raise ValueError(f"{self.name}: feedback loop through {sorted(producers - done)},"
+                             " feed it back through a flag")
+        return order
+
+    def generate(self, flags, outputs):
+        """ Source of evaluate(sources, compared, latches, timer, mask), the blocks as bitset expressions in order """
+        def term(ref, negate):
+            return f"(mask ^ {self.variable[ref]})" if negate else self.variable[ref]
+
+        lines = ["def evaluate(sources, compared, latches, timer, mask):",
+                 f"    {', '.join(self.variable[signal] for signal in self.sources)}, = sources"]
+        comparison = latch = delay = 0
+        for block in self.blocks:
+            kind, target = block["type"], self.variable[block["name"]]
+            if kind == "CMP":
+                expression = f"compared[{comparison}]"
+                comparison += 1
+            elif kind == "SR":
+                ports = {port: term(ref, negate) for ref, negate, port in block["inputs"]}
+                # Latching relay, reset wins over set
+                lines.append(f"    latches[{latch}] = (latches[{latch}] | {ports['S']}) & (mask ^ {ports['R']})")
+                expression = f"latches[{latch}]"
+                latch += 1
+            elif kind in GATES:
+                operator, negate = GATES[kind]
+                expression = operator.join(term(ref, negate) for ref, negate, _ in block["inputs"])
+                if negate:
+                    expression = f"mask ^ ({expression})"
+            else:
+                ref, negate, _ = block["inputs"][0]
+                expression = f"timer({delay}, {term(ref, negate)}, {kind == 'TON'})"
+                delay += 1
+            lines.append(f"    {target} = {expression}  # {block['name']!r}")
+        lines.append(f"    return ({''.join(self.variable[ref] + ', ' for _, ref in outputs)}),"
+                     f" ({''.join(self.variable[ref] + ', ' for _, _, ref in flags)})")
+        return "\n".join(lines) + "\n"
+
+    def allocate(self, rows):
+        self.rows = rows
+        self.flags = pack(np.tile(self.flag_init, (rows, 1)))
+        self.latches = [0] * self.latch_count
+        self.since = np.full((rows, len(self.delays)), np.nan)
+
+    def reset(self, row):
+        # Flags back to their initial values, latches and timers cleared
+        if self.flags is None:
+            return
+        bit = 1 << row
+        self.flags = [flag & ~bit | (bit if init else 0) for flag, init in zip(self.flags, self.flag_init)]
+        self.latches = [latch & ~bit for latch in self.latches]
+        self.since[row] = np.nan
+
+    def state(self, row, now):
+        """ Flags, latches and elapsed timer seconds (NaN when idle) of `row` at clock time `now` """
+        if self.flags is None:
+            return {"ladder_flags": np.array(self.flag_init, dtype=bool),
+                    "ladder_latches": np.zeros(self.latch_count, dtype=bool),
+                    "ladder_timers": np.full(len(self.delays), np.nan)}
+        return {"ladder_flags": np.array([flag >> row & 1 for flag in self.flags], dtype=bool),
+                "ladder_latches": np.array([latch >> row & 1 for latch in self.latches], dtype=bool),
+                "ladder_timers": now - self.since[row]}
+
+    def set_state(self, row, state, now, rows):
+        # Inverse of state(), `rows` the number of rows the program is scanned with
+        if self.flags is None or self.rows != rows:
+            self.allocate(rows)
+        bit = 1 << row
+        self.flags = [flag & ~bit | (bit if value else 0) for flag, value in zip(self.flags, state["ladder_flags"])]
+        self.latches = [latch & ~bit | (bit if value else 0)
+                        for latch, value in zip(self.latches, state["ladder_latches"])]
+        self.since[row] = now - state["ladder_timers"]
+
+    def timer(self, index, level, on_delay):
+        # TON is True once its input held for delay seconds, TOF stays True for delay seconds after it fell
+        first, count, mask, now = self.window
+        since = self.since[first:first + count, index]
+        held = unpack([level if on_delay else mask ^ level], count)[:, 0]
+        since[:] = np.where(held, np.where(np.isnan(since), now, since), np.nan)
+        done = pack((held & (now - since >= self.delays[index]))[:, None])[0]
+        return done if on_delay else mask ^ done
+
+    def scan(self, digital_inputs, analog_inputs, digital_outputs, alarms, now=0.0, rows=slice(None)):
+        """ Run the program on `rows` (a contiguous slice) of the (rows, tags) register arrays, outputs in place """
+        if self.flags is None or self.rows != len(digital_inputs):
+            self.allocate(len(digital_inputs))
+        first, last, _ = rows.indices(len(digital_inputs))
+        count = last - first
+        mask = (1 << count) - 1
+        self.window = first, count, mask, now
+
+        # CMP blocks only read analog inputs, all of them are evaluated up front
+        if count == 1:
+            # A single PLC skips the array packing, its bitsets are plain bools
+            active = int(alarms[first, ACTIVE])
+            sources = [0, 1] + digital_inputs[first].tolist() + [active >> bit & 1 for bit in range(len(ALARMS))]
+            values = analog_inputs[first].tolist()
+            compared = [comparison(values[column], limit) for comparison, column, limit in self.comparisons]
+        else:
+            inputs = np.concatenate([digital_inputs[rows], (alarms[rows, ACTIVE, None] >> ALARM_SHIFTS) & 1], axis=1)
+            sources = [0, mask] + pack(inputs.astype(bool))
+            analog = analog_inputs[rows]
+            compared = pack(np.stack([comparison(analog[:, column], limit)
+                                      for comparison, column, limit in self.comparisons], axis=1)
+                            if self.comparisons else np.zeros((count, 0), dtype=bool))
+        whole = count == self.rows
+        if whole:
+            sources += self.flags
+            latches = list(self.latches)
+        else:
+            sources += [flag >> first & mask for flag in self.flags]
+            latches = [latch >> first & mask for latch in self.latches]
+        output_values, flag_values = self.evaluate(sources, compared, latches, self.timer, mask)
+
+        if whole:
+            self.flags, self.latches = list(flag_values), latches
+        else:
+            # Merge the bits of the evaluated rows back into the bank-wide bitsets
+            keep = ~(mask << first)
+            self.flags = [flag & keep | value << first for flag, value in zip(self.flags, flag_values)]
+            self.latches = [latch & keep | value << first for latch, value in zip(self.latches, latches)]
+        if count == 1:
+            digital_outputs[first, self.output_columns] = output_values
+        else:
+            digital_outputs[rows, self.output_columns] = unpack(output_values, count)
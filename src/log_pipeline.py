@@ -0,0 +1,138 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+from datetime import datetime, timezone
+
+# Attributes of every LogRecord, anything else came in through `extra=` and goes into the JSON record
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# Numbers are ignored when telling repeats apart: "Farm scan overrun: 212.4 ms" repeats "Farm scan overrun: 230.1 ms"
+NUMBERS = re.compile(r"\d+(\.\d+)?")
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line: time, level, logger, message and the extra fields of the record """
+
+    def format(self, record):
+        entry = {"time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                 "level": record.levelname,
+                 "logger": record.name,
+                 "message": record.getMessage()}
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RepeatFilter(logging.Filter):
+    """ At most `burst` records of one message pattern per `interval` seconds, the next one counts those dropped """
+
+    def __init__(self, interval=10.0, burst=5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        # (logger, level, pattern) -> [window start, records let through, records dropped]
+        self.windows = {}
+
+    def filter(self, record):
+        key = (record.name, record.levelno, NUMBERS.sub("#", str(record.msg)))
+        window = self.windows.get(key)
+        if window is None or record.created - window[0] >= self.interval:
+            if window is not None and window[2]:
+                record.suppressed = window[2]
+            window = self.windows[key] = [record.created, 0, 0]
+        if window[1] >= self.burst:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """ Only enqueues, a full queue drops the record rather than block the scan """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.pid = os.getpid()
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Keep the traceback apart from the message, exc_info does not survive the queue
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchedFileHandler(logging.handlers.RotatingFileHandler):
+    """ Size-rotated file written by the listener thread, flushed once per batch instead of once per record """
+
+    def flush(self):
+        # StreamHandler.emit flushes after every record, the listener calls flush_batch instead
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+
+class BatchQueueListener(logging.handlers.QueueListener):
+    """ Writes the queued records on its own thread, flushing whenever the queue is drained """
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush_batch()
+
+    def stop(self):
+        # Also registered with atexit, a second call has nothing left to write
+        if self._thread is None:
+            return
+        super().stop()
+        for handler in self.handlers:
+            handler.close()
+
+
+def setup_logging(path="plc_simulator.log", level=logging.INFO, max_bytes=10 << 20, backup_count=5,
+                  queue_size=10000, interval=10.0, burst=5):
+    """ Route the root logger through a queue to a JSON, size-rotated file written by a background thread
+
+    Once per process: later calls return the running listener. A handler inherited from a parent process
+    (multiprocessing fork) lost its listener thread and is replaced.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, NonBlockingQueueHandler):
+            if handler.pid == os.getpid():
+                return handler.listener
+            root.removeHandler(handler)
+
+    log_queue = queue.Queue(queue_size)
+    file_handler = BatchedFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    file_handler.setFormatter(JsonFormatter())
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RepeatFilter(interval, burst))
+    queue_handler.listener = BatchQueueListener(log_queue, file_handler, respect_handler_level=True)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    queue_handler.listener.start()
+    # Records still queued at exit are written before the file is closed
+    atexit.register(queue_handler.listener.stop)
+    return queue_handler.listener
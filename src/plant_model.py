@@ -0,0 +1,100 @@
+import numpy as np
+from registers import ANALOG_INPUTS, DIGITAL_INPUTS, DIGITAL_OUTPUTS
+
+# Floater marks as a fraction of the tank capacity, a floater is True at or above its mark, the lower level floater
+# is the tank-low contact and is True below it (alarm A1)
+FLOATERS = (("DI5", 0.05, True),   # LOWER LEVEL FLOATER
+            ("DI6", 0.20, False),  # LOW LEVEL FLOATER
+            ("DI7", 0.80, False),  # HIGH LEVEL FLOATER
+            ("DI8", 0.95, False))  # HIGHER LEVEL FLOATER
+
+INPUT_VALVE, OUTPUT_VALVE, HEATING, GATE = (DIGITAL_OUTPUTS.index(name) for name in ("DQ0", "DQ1", "DQ2", "DQ3"))
+TEMPERATURE = ANALOG_INPUTS.index("AI0")
+
+
+class TankPlant:
+    """ Volume and temperature of `count` tanks, integrated from the valve outputs with array math """
+
+    def __init__(self, count=1, capacity=1000.0, inflow=20.0, outflow=25.0, gate_outflow=50.0,
+                 heating_power=2000.0, cooling=0.001, ambient=20.0, inlet_temperature=15.0, initial_level=0.1):
+        self.count = count
+        self.capacity = capacity            # liters
+        self.inflow = inflow                # liters/s through the In Valve (DQ0)
+        self.outflow = outflow              # liters/s through the Out Valve (DQ1)
+        self.gate_outflow = gate_outflow    # liters/s through the discharging gate (DQ3)
+        self.heating_power = heating_power  # degC * liters/s of the heating system (DQ2)
+        self.cooling = cooling              # 1/s heat loss towards ambient
+        self.ambient = ambient              # degC
+        self.inlet_temperature = inlet_temperature  # degC of the incoming fluid
+        # liters left in a reset tank, between the lower and low floaters: the heel discharging leaves behind, an
+        # empty tank would be Tank Level Too Low
+        self.initial_volume = initial_level * capacity
+
+        self.volume = np.full(count, self.initial_volume)
+        self.temperature = np.full(count, ambient)
+        # Clock time of the last integration, None until the first scan
+        self.time = None
+
+        self.floater_columns = np.array([DIGITAL_INPUTS.index(name) for name, _, _ in FLOATERS], dtype=np.intp)
+        self.floater_levels = np.array([level for _, level, _ in FLOATERS]) * capacity
+        self.floater_below = np.array([below for _, _, below in FLOATERS])
+        # Sensor image, the plant's view of DI5-DI8 and AI0
+        self.floaters = np.zeros((count, len(FLOATERS)), dtype=bool)
+        self.sense()
+
+    def advance(self, digital_outputs, now):
+        # Integrate up to clock time `now`, the first call only sets the time origin
+        if self.time is not None:
+            self.step(digital_outputs, now - self.time)
+        self.time = now
+
+    def reset(self, row):
+        # Heel at ambient temperature
+        self.volume[row] = self.initial_volume
+        self.temperature[row] = self.ambient
+        self.sense()
+
+    def state(self, row):
+        # Volume and temperature of one tank
+        return np.array([self.volume[row], self.temperature[row]])
+
+    def set_state(self, row, state):
+        self.volume[row], self.temperature[row] = state
+        self.sense()
+
+    def step(self, digital_outputs, dt):
+        """ Integrate all tanks over dt seconds given the (count, DQ) output array """
+        if dt <= 0:
+            return
+        filling = digital_outputs[:, INPUT_VALVE] * self.inflow * dt
+        draining = (digital_outputs[:, OUTPUT_VALVE] * self.outflow
+                    + digital_outputs[:, GATE] * self.gate_outflow) * dt
+        draining = np.minimum(draining, self.volume)
+        filling = np.minimum(filling, self.capacity - self.volume + draining)
+        volume = self.volume - draining + filling
+
+        # Incoming fluid mixes with the content, heating works on whatever is in the tank
+        wet = volume > 0
+        mass = np.where(wet, volume, 1.0)
+        temperature = np.where(wet, (self.temperature * (volume - filling) + self.inlet_temperature * filling) / mass,
+                               self.ambient)
+        temperature += wet * digital_outputs[:, HEATING] * self.heating_power * dt / mass
+        temperature += (self.ambient - temperature) * min(self.cooling * dt, 1.0)
+
+        self.volume = volume
+        self.temperature = temperature
+        self.sense()
+
+    def sense(self):
+        self.floaters = (self.volume[:, None] >= self.floater_levels) != self.floater_below
+
+    def write_inputs(self, digital_inputs, analog_inputs):
+        # Overlay the sensors on (count, tags) input arrays
+        digital_inputs[:, self.floater_columns] = self.floaters
+        analog_inputs[:, TEMPERATURE] = self.temperature
+
+    def sensor_items(self, row):
+        # (tag, value) pairs of one tank, as published to the server
+        items = [(name, bool(value)) for (name, _, _), value in zip(FLOATERS, self.floaters[row])]
+        items.append(("AI0", float(self.temperature[row])))
+        return items
@@ -1,48 +1,174 @@
-from asyncua import Client
+from asyncua import Client, ua
 import asyncio
+import logging
 
 
 class PLCClient:
 
-    def __init__(self, url, timeout):
+    # Connected clients shared by url and PLC name, see pooled()
+    _pool = {}
+
+    def __init__(self, url, timeout, plc_name="myPLC"):
         #: OPC UA client
         self.url = url
         self.timeout = timeout
+        # myPLC_<i> when talking to one instance of a PLC farm
+        self.plc_name = plc_name
         self.client = Client(url, timeout)
+        # Resolved nodes by tag name ("DQ0", "A0.Status"), browsed once
+        self.nodes = {}
+        # VariantType of each written tag, read from its DataType once instead of guessed on every write
+        self.variant_types = {}
+
+        # Data-change subscription feeding wait_for, created on first use
+        self.publishing_interval = 10  # milliseconds
+        self.subscription = None
+        self.watched = {}
+        self.values = {}
+        self.value_changed = None
+
+    @classmethod
+    async def pooled(cls, url, timeout, plc_name="myPLC"):
+        """ Connected client shared by every caller asking for the same url and PLC """
+        key = (url, plc_name)
+        plc = cls._pool.get(key)
+        if plc is None:
+            plc = cls(url, timeout, plc_name)
+            await plc.init()
+            cls._pool[key] = plc
+        return plc
+
+    @classmethod
+    async def close_pool(cls):
+        for plc in cls._pool.values():
+            await plc.disconnect()
+        cls._pool.clear()
+
+    async def get_node(self, name):
+        node = self.nodes.get(name)
+        if node is None:
+            # "A0.Status" is the Status variable of the A0 alarm object
+            path = [f"{self.idx}:{part}" for part in name.split(".")]
+            node = await self.myobj.get_child(path)
+            self.nodes[name] = node
+        return node
+
+    async def get_nodes(self, names):
+        return [await self.get_node(name) for name in names]
+
+    async def variant(self, name, value):
+        # The int 80 written to the Double AI0 is sent as a Double, not refused as an Int64
+        variant_type = self.variant_types.get(name)
+        if variant_type is None:
+            node = await self.get_node(name)
+            variant_type = self.variant_types[name] = await node.read_data_type_as_variant_type()
+        return ua.Variant(value, variant_type)
 
     async def set_object_value(self, name, value):
-        myvar = await self.myobj.get_child(f"{self.idx}:{name}")
-        await myvar.write_value(value)
+        myvar = await self.get_node(name)
+        await myvar.write_value(await self.variant(name, value))
 
     async def get_object_value(self, name):
-        myvar = await self.myobj.get_child(f"{self.idx}:{name}")
+        myvar = await self.get_node(name)
         value = await myvar.read_value()
         return value
 
     async def get_alarm_status(self, name):
-        myalarm = await self.myobj.get_child(f"{self.idx}:{name}")
-        myvar = await myalarm.get_child(f"{self.idx}:Status")
+        myvar = await self.get_node(f"{name}.Status")
         value = await myvar.read_value()
         return value
+
+    async def get_many(self, names):
+        # One Read service call for all names, values in the same order
+        nodes = await self.get_nodes(names)
+        return await self.client.read_values(nodes)
+
+    async def set_many(self, values):
+        # One Write service call for a {name: value} mapping
+        nodes = await self.get_nodes(values.keys())
+        await self.client.write_values(nodes, [await self.variant(name, value) for name, value in values.items()])
     
-    async def set_object_pulse(self, name):
-        myvar = await self.myobj.get_child(f"{self.idx}:{name}")
+    def datachange_notification(self, node, val, data):
+        # Subscription handler: keep the last value and wake every waiter
+        self.values[self.watched[node.nodeid]] = val
+        self.value_changed.set()
+        self.value_changed = asyncio.Event()
+
+    async def watch(self, name):
+        if self.subscription is None:
+            self.value_changed = asyncio.Event()
+            self.subscription = await self.client.create_subscription(self.publishing_interval, self)
+        if name not in self.values and name not in self.watched.values():
+            node = await self.get_node(name)
+            self.watched[node.nodeid] = name
+            await self.subscription.subscribe_data_change(node)
+
+    async def refresh(self):
+        # Re-read every watched value, e.g. after the simulator was reset behind the subscription's back
+        if self.watched:
+            names = list(self.watched.values())
+            for name, value in zip(names, await self.get_many(names)):
+                self.values[name] = value
+
+    async def wait_for(self, name, predicate, timeout=2.0):
+        """ Wait until the simulator publishes a value of `name` matching predicate (or equal to it) """
+        if not callable(predicate):
+            expected = predicate
+            predicate = lambda value: value == expected
+        await self.watch(name)
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while True:
+            if name in self.values and predicate(self.values[name]):
+                return self.values[name]
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(
+                    f"{name} did not reach the expected value within {timeout} s, last value: {self.values.get(name)!r}")
+            try:
+                await asyncio.wait_for(self.value_changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def force(self, name, value):
+        # Hold an input or output at value in the simulator until unforced, outputs refuse plain writes
+        await self.myobj.call_method(f"{self.idx}:Force", name, value)
+
+    async def unforce(self, name):
+        await self.myobj.call_method(f"{self.idx}:Unforce", name)
+
+    async def unforce_all(self):
+        await self.myobj.call_method(f"{self.idx}:UnforceAll")
+
+    async def snapshot(self):
+        # Binary state of the PLC, for restore() on this or another simulator of the same layout
+        return await self.myobj.call_method(f"{self.idx}:Snapshot")
+
+    async def restore(self, blob):
+        await self.myobj.call_method(f"{self.idx}:Restore", ua.Variant(blob, ua.VariantType.ByteString))
+
+    async def set_object_pulse(self, name, duration=0.5):
+        # Hold the button long enough for at least one scan to see it
+        myvar = await self.get_node(name)
         async def shielded_sleep(duration):
             await asyncio.shield(asyncio.sleep(duration))
         
         await myvar.write_value(True)
-        await asyncio.sleep(0.5)
+        await asyncio.sleep(duration)
         await myvar.write_value(False)
         
     async def disconnect(self):
         await self.client.disconnect()
+        self.subscription = None
+        self.watched.clear()
+        self.values.clear()
 
     async def init(self):
         await self.client.connect()
         namespace = "http://PLC-simulator/opc"
         self.idx = await self.client.get_namespace_index(namespace)
-        print("nsidx", self.idx)
+        logging.debug(f"Connected to {self.url}, namespace index {self.idx}")
         self.myobj = await self.client.nodes.root.get_child(
-            ["0:Objects", f"{self.idx}:myPLC"]
+            ["0:Objects", f"{self.idx}:{self.plc_name}"]
         )
 
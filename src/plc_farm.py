@@ -0,0 +1,193 @@
+from asyncua import Server
+import argparse
+import asyncio
+import logging
+from plc_simulator import PLCSimulator
+from registers import RegisterBank
+from alarm_table import AlarmTable
+from alarm_events import AlarmEvents
+from forcing import ForceMethods, ForceTable
+from snapshot import SnapshotMethods
+from ladder import LadderProgram
+from tag_database import TagDatabase
+from sim_clock import WallClock
+from plant_model import TankPlant
+from historian import Historian
+from history_storage import BoundedHistory, SQLiteHistory
+from scan_diagnostics import ScanDiagnostics
+from tag_registry import TagRegistry
+
+
+class PLCFarm:
+    """ N independent simulated PLCs (myPLC_0..myPLC_N-1) on one server, one scan scheduler """
+
+    def __init__(self, count, endpoint="opc.tcp://localhost:48020/PLC-simulator/opc", clock=None, plant=False,
+                 historian=None, history=None, alarm_table=None, ladder=None, tag_database=None):
+        self.endpoint = endpoint
+        # Shared by all instances, a VirtualClock makes the whole farm run in simulated time
+        self.clock = clock if clock is not None else WallClock()
+        # One register row per instance, alarms of all instances evaluated in one pass
+        self.bank = RegisterBank(count)
+        self.alarm_table = alarm_table if alarm_table is not None else AlarmTable()
+        # One tank per instance, all tanks integrated in one array step per scan
+        self.plant = TankPlant(count) if plant else None
+        # Optional LadderProgram run once over the whole bank in place of each instance's GRAFCET
+        self.ladder = ladder
+        # Same tag types for every instance, their nodes created in one AddNodes call
+        self.tag_database = tag_database if tag_database is not None else TagDatabase()
+        # Forced inputs and outputs of all instances, overlaid on the whole bank once per scan
+        self.force_table = ForceTable(self.bank)
+        # Each instance keeps its own process image and GRAFCET state
+        self.plcs = [PLCSimulator(endpoint=endpoint, bank=self.bank, row=i, alarm_table=self.alarm_table,
+                                  clock=self.clock, plant=self.plant, ladder=ladder, tag_database=self.tag_database,
+                                  force_table=self.force_table)
+                     for i in range(count)]
+        # Held for the duration of a farm scan, reset() and restore() of an instance land between two scans
+        self.scan_lock = asyncio.Lock()
+        for plc in self.plcs:
+            plc.scan_lock = self.scan_lock
+        self.cycle_time = 0.2
+        # Optional Historian over the whole bank, one record per farm scan
+        self.historian = historian
+        # Optional asyncua history storage shared by all instances
+        self.history = history
+
+        # Timing of the whole farm scan, published under Objects/Diagnostics
+        self.diagnostics = ScanDiagnostics(self.cycle_time, self.clock)
+        self.tags = TagRegistry()
+
+    async def add_plc_objects(self, idx):
+        # One AlarmCondition event stream, one set of Force and Snapshot methods for all instances
+        alarm_events = AlarmEvents(self.server)
+        await alarm_events.init()
+        force_methods = ForceMethods(self.server)
+        snapshot_methods = SnapshotMethods(self.server)
+        items = [item for i, plc in enumerate(self.plcs) for item in plc.node_items(idx, f"myPLC_{i}")]
+        await TagDatabase.add_nodes(self.server, items)
+        for i, plc in enumerate(self.plcs):
+            await plc.add_plc_object(self.server, idx, f"myPLC_{i}", alarm_events, nodes_added=True,
+                                     force_methods=force_methods, snapshot_methods=snapshot_methods)
+
+    async def set_opcua_server(self):
+        self.server = Server()
+        if self.history is not None:
+            self.server.iserver.history_manager.set_storage(self.history)
+        await self.server.init()
+        self.server.set_endpoint(self.endpoint)
+
+        uri = "http://PLC-simulator/opc"
+        idx = await self.server.register_namespace(uri)
+        await self.add_plc_objects(idx)
+        self.tags.session = self.server.iserver.isession
+        await self.diagnostics.add_nodes(self.server.get_objects_node(), idx, self.tags)
+        if self.historian is not None:
+            self.historian.attach(self.bank, [f"myPLC_{i}" for i in range(len(self.plcs))])
+        if self.history is not None:
+            for plc in self.plcs:
+                await plc.historize()
+
+        await self.server.start()
+        print(f"****OPC farm up and running with {len(self.plcs)} PLCs*****")
+
+    async def scan(self):
+        # One cycle of every instance: inputs, alarms of the whole bank, then logic and outputs
+        self.diagnostics.begin()
+        if self.plant is not None:
+            self.plant.advance(self.bank.digital_outputs, self.clock.now())
+        for plc in self.plcs:
+            plc.image.begin_cycle()
+            plc.scan_count += 1
+            if self.plant is not None:
+                await plc.update_plant()
+            await plc.update_inputs()
+        self.force_table.apply_inputs()
+        self.diagnostics.mark("InputRead")
+        self.alarm_table.scan(self.bank.digital_inputs, self.bank.analog_inputs, self.bank.alarms, self.clock.now())
+        self.diagnostics.mark("AlarmEvaluation")
+        if self.ladder is not None:
+            self.ladder.scan(self.bank.digital_inputs, self.bank.analog_inputs, self.bank.digital_outputs,
+                             self.bank.alarms, self.clock.now())
+        else:
+            for plc in self.plcs:
+                plc.evaluate_logic()
+        self.force_table.apply_outputs()
+        self.diagnostics.mark("Grafcet")
+        for plc in self.plcs:
+            await plc.set_alarms()
+            await plc.write_outputs()
+        if self.historian is not None:
+            self.historian.record(self.clock.now())
+        self.diagnostics.mark("OutputWrite")
+        self.diagnostics.end()
+        await self.diagnostics.publish([plc.image for plc in self.plcs], "farm")
+
+    async def execute_control_logic(self):
+        try:
+            while True:
+                start = self.clock.now()
+                async with self.scan_lock:
+                    await self.scan()
+                # Keep the cadence: sleep only what is left of the cycle (all of it in virtual time)
+                remaining = self.cycle_time - (self.clock.now() - start)
+                if remaining < 0:
+                    logging.warning(f"Farm scan overrun: {self.diagnostics.last_scan_time * 1000:.1f} ms")
+                await self.clock.sleep(max(remaining, 0))
+        finally:
+            await self.stop()
+            print("Stopping server")
+
+    async def step(self, cycles=1):
+        """ Run `cycles` farm scans, advancing the clock by cycle_time after each one """
+        for _ in range(cycles):
+            async with self.scan_lock:
+                await self.scan()
+            await self.clock.sleep(self.cycle_time)
+
+    def stats(self):
+        p50, p99, _ = self.diagnostics.windows["ScanTime"].statistics()
+        return {"plcs": len(self.plcs),
+                "scans": self.diagnostics.scans,
+                "last_scan_ms": self.diagnostics.last_scan_time * 1000,
+                "p50_scan_ms": p50,
+                "p99_scan_ms": p99,
+                "max_scan_ms": self.diagnostics.max_scan_time * 1000,
+                "overruns": self.diagnostics.overruns}
+
+    async def stop(self):
+        if self.historian is not None:
+            await self.historian.close()
+        await self.server.stop()
+
+    async def main(self):
+        await self.set_opcua_server()
+        await self.execute_control_logic()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host N simulated PLCs in one OPC UA server")
+    parser.add_argument("--count", type=int, default=10, help="number of PLC instances")
+    parser.add_argument("--endpoint", default="opc.tcp://localhost:48020/PLC-simulator/opc")
+    parser.add_argument("--plant", action="store_true", help="simulate one tank per PLC")
+    parser.add_argument("--alarms", metavar="FILE",
+                        help="alarm rules with deadband, on/off delay and shelving from a JSON or YAML file")
+    parser.add_argument("--ladder", metavar="FILE",
+                        help="run the function-block program of a netlist export (config/PLC_SY.xml) as logic")
+    parser.add_argument("--tags", metavar="FILE",
+                        help="type, access level and engineering units of every tag from a JSON file")
+    parser.add_argument("--history", metavar="DIR", help="record the process image changes into DIR")
+    parser.add_argument("--history-store", metavar="memory|FILE.db",
+                        help="serve HistoryRead from a bounded in-memory store or a SQLite file")
+    args = parser.parse_args()
+
+    history = None
+    if args.history_store:
+        history = BoundedHistory() if args.history_store == "memory" else SQLiteHistory(args.history_store)
+    farm = PLCFarm(args.count, endpoint=args.endpoint, plant=args.plant,
+                   alarm_table=AlarmTable.from_file(args.alarms) if args.alarms else None,
+                   ladder=LadderProgram.from_file(args.ladder) if args.ladder else None,
+                   tag_database=TagDatabase.from_file(args.tags) if args.tags else None,
+                   historian=Historian(args.history) if args.history else None, history=history)
+    try:
+        asyncio.run(farm.main())
+    except KeyboardInterrupt:
+        print("*****Server stopped********")
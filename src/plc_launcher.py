@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import time
+from plc_farm import PLCFarm
+from log_pipeline import setup_logging
+
+
+def endpoint_for(port, host="localhost"):
+    return f"opc.tcp://{host}:{port}/PLC-simulator/opc"
+
+
+def free_port(host="localhost"):
+    # Ephemeral port picked by the OS, free at the time of the call
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def split_plcs(total, workers):
+    # Spread the PLCs as evenly as possible, first workers take the remainder
+    base, extra = divmod(total, workers)
+    return [base + (1 if i < extra else 0) for i in range(workers)]
+
+
+async def serve_farm(worker, endpoint, count, stats_queue, report_interval):
+    farm = PLCFarm(count, endpoint=endpoint)
+    await farm.set_opcua_server()
+
+    async def report():
+        while True:
+            await asyncio.sleep(report_interval)
+            stats = farm.stats()
+            stats.update({"worker": worker, "pid": os.getpid(), "endpoint": endpoint, "time": time.time()})
+            stats_queue.put(stats)
+
+    reporter = asyncio.create_task(report())
+    try:
+        await farm.execute_control_logic()
+    finally:
+        reporter.cancel()
+
+
+def run_worker(worker, endpoint, count, stats_queue, report_interval):
+    """ Entry point of one server process """
+    # Own queue and log file per worker, the launcher's handlers are not inherited by the scan loop
+    logging.getLogger().handlers.clear()
+    setup_logging(f"plc_farm_{worker}.log")
+    try:
+        asyncio.run(serve_farm(worker, endpoint, count, stats_queue, report_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+class PLCLauncher:
+    """ One PLCFarm server process per port, supervised and restarted if it dies """
+
+    def __init__(self, workers, plcs, base_port=48020, host="localhost", report_interval=5.0):
+        self.host = host
+        self.base_port = base_port
+        self.report_interval = report_interval
+        self.counts = split_plcs(plcs, workers)
+
+        self.stats_queue = multiprocessing.Queue()
+        self.processes = {}
+        self.restarts = {worker: 0 for worker in range(workers)}
+        # Last statistics received from each worker
+        self.stats = {}
+
+    def endpoint(self, worker):
+        return endpoint_for(self.base_port + worker, self.host)
+
+    def start_worker(self, worker):
+        process = multiprocessing.Process(target=run_worker, name=f"plc-farm-{worker}",
+                                          args=(worker, self.endpoint(worker), self.counts[worker],
+                                                self.stats_queue, self.report_interval))
+        process.start()
+        self.processes[worker] = process
+        logging.info(f"Worker {worker} started (pid {process.pid}) with {self.counts[worker]} PLCs on {self.endpoint(worker)}")
+
+    def start(self):
+        for worker in range(len(self.counts)):
+            self.start_worker(worker)
+
+    def check_workers(self):
+        for worker, process in self.processes.items():
+            if not process.is_alive():
+                self.restarts[worker] += 1
+                logging.warning(f"Worker {worker} exited with code {process.exitcode}, restarting")
+                self.stats.pop(worker, None)
+                self.start_worker(worker)
+
+    def collect_stats(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                stats = self.stats_queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return
+            self.stats[stats["worker"]] = stats
+
+    def summary(self):
+        reports = list(self.stats.values())
+        return {"workers": len(self.processes),
+                "alive": sum(process.is_alive() for process in self.processes.values()),
+                "reporting": len(reports),
+                "plcs": sum(self.counts),
+                "restarts": sum(self.restarts.values()),
+                "p99_scan_ms": max((stats["p99_scan_ms"] for stats in reports), default=0.0),
+                "max_scan_ms": max((stats["max_scan_ms"] for stats in reports), default=0.0),
+                "last_scan_ms": max((stats["last_scan_ms"] for stats in reports), default=0.0),
+                "overruns": sum(stats["overruns"] for stats in reports)}
+
+    def supervise(self):
+        while True:
+            self.collect_stats(self.report_interval)
+            self.check_workers()
+            summary = self.summary()
+            logging.info(f"Launcher summary: {summary}")
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shard simulated PLCs over several server processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of server processes")
+    parser.add_argument("--plcs", type=int, default=100, help="total number of PLC instances")
+    parser.add_argument("--base-port", type=int, default=48020, help="port of the first server, then +1 per worker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    # Workers inherit this configuration, keep the server internals quiet
+    logging.getLogger("asyncua").setLevel(logging.WARNING)
+    launcher = PLCLauncher(args.workers, args.plcs, base_port=args.base_port)
+    launcher.start()
+    try:
+        launcher.supervise()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        launcher.stop()
+        print("*****Launcher stopped********")
@@ -1,219 +1,415 @@
 
 from asyncua import Server, ua
+from asyncua.common.callback import CallbackType
+import argparse
 import asyncio
-import logging
+import itertools
+import sys
+import numpy as np
 from plc_client import PLCClient
+from tag_registry import TagRegistry
+from process_image import ProcessImage
+from grafcet import Grafcet, Step
+from registers import ACTIVE, ALARMS, ALARM_FIELDS, ANALOG_DEFAULTS, STATUS, UNACK, RegisterBank, alarm_bit
+from alarm_table import AlarmTable
+from alarm_events import AlarmEvents
+from forcing import ForceMethods, ForceTable
+from snapshot import SnapshotMethods, check_state, pack_state, unpack_state
+from scenario import ScenarioPlayer, diff_recordings, read_events
+from ladder import LadderProgram
+from tag_database import TagDatabase
+from sim_clock import VirtualClock, WallClock
+from plant_model import TankPlant
+from historian import Historian
+from history_storage import BoundedHistory, SQLiteHistory
+from scan_diagnostics import ScanDiagnostics
+from log_pipeline import setup_logging
 
 class PLCSimulator:
-    def __init__(self):
-          # Configure logging
-        logging.basicConfig(filename='plc_simulator.log', level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    def __init__(self, endpoint="opc.tcp://localhost:48020/PLC-simulator/opc", event_driven=False,
+                 bank=None, row=0, alarm_table=None, clock=None, plant=None,
+                 historian=None, history=None, ladder=None, tag_database=None, force_table=None):
+        # Logging goes through a queue to a background thread writing JSON lines, never to disk from the scan
+        setup_logging('plc_simulator.log')
 
         # self.plc_client = PLCClient("opc.tcp://localhost:7000/freeopcua/server/", timeout=10)
 
-        # Digital and alarm registers
-        self.digital_inputs = {"DI0": False,  # START BUTTON
-                               "DI1": False,  # RUN BUTTON
-                               "DI2": False,  # STOP BUTTON
-                               "DI3": False,  # EMERGENCY BUTTON
-                               "DI4": False,  # RESET BUTTON
-                               "DI5": False,  # LOWER LEVEL FLOATER
-                               "DI6": False,  # LOW LEVEL FLOATER
-                               "DI7": False,  # HIGH LEVEL FLOATER
-                               "DI8": False,  # HIGHER LEVEL FLOATER
-                               "DI9": False}  # DISCHARGING GATE SENSOR
-        
-        self.analog_inputs =  {"AI0": False}  # SENSOR TEMPERATURE
-
-        self.digital_outputs = {"DQ0": False,  # INPUT VALVE
-                                "DQ1": False,  # OUTPUT VALVE
-                                "DQ2": False,  # HEATING SYSTEM VALVE
-                                "DQ3": False}  # MOTOR-CONTROLLED DISCHARGING GATE
-        
-        self.alarms = {"A0": {"Active": False, "UnAck": False, "Status": False},  # Tank high level
-                       "A1": {"Active": False, "UnAck": False, "Status": False},  # Tank low level
-                       "A2": {"Active": False, "UnAck": False, "Status": False},  # High temp >80
-                       "A3": {"Active": False, "UnAck": False, "Status": False},  # Low temp <10
-                       "A4": {"Active": False, "UnAck": False, "Status": False},  # Discharging door open
-                       "A5": {"Active": False, "UnAck": False, "Status": False}}  # Emergency activated
+        # Digital, analog and alarm registers: typed arrays, one row of a RegisterBank
+        # (shared by all instances of a PLC farm). Alarms are bit-masks, bit n = An.
+        self.bank = bank if bank is not None else RegisterBank(1)
+        self.row = row
+        self.digital_inputs, self.analog_inputs, self.digital_outputs, self.alarm_masks = self.bank.registers(row)
 
+        # Alarm rules and GRAFCET sequence
+        self.alarm_table = alarm_table if alarm_table is not None else AlarmTable()
+        self.grafcet = Grafcet(heating_setpoint=45)
+        # Optional LadderProgram (src/ladder.py) running in place of the GRAFCET and output logic below
+        self.ladder = ladder
+        # Forced inputs and outputs (Force/Unforce methods), shared by all instances of a PLC farm
+        self.force_table = force_table if force_table is not None else ForceTable(self.bank)
 
-        
         # Time interval for cyclic execution (in seconds)
         self.cycle_time = 0.2
+        # WallClock, or a VirtualClock to run scans as fast as the CPU allows
+        self.clock = clock if clock is not None else WallClock()
+        self.scan_count = 0
+        # Per-phase timing, jitter and overruns, published under myPLC/Diagnostics
+        self.diagnostics = ScanDiagnostics(self.cycle_time, self.clock)
+
+        # Optional TankPlant driving DI5-DI8 and AI0 from the outputs, one tank per bank row
+        self.plant = plant
+        # Optional Historian recording the changes of the process image after every scan
+        self.historian = historian
+        # Optional asyncua history storage (BoundedHistory, SQLiteHistory) serving HistoryRead
+        self.history = history
+
+        # Event-driven mode: a client write to any DI/AI triggers a scan right away,
+        # the periodic scan is kept at a slower rate as a fallback
+        self.event_driven = event_driven
+        self.fallback_cycle_time = 1.0
+        self.input_changed = None
+        # Held for the duration of a scan, reset() waits for it to land between two scans
+        self.scan_lock = None
+
+        self.endpoint = endpoint
+        # Type, access level and engineering units of every tag, shared by all instances of a PLC farm
+        self.tag_database = tag_database if tag_database is not None else TagDatabase()
+        # AlarmCondition events of the server, shared by all instances of a PLC farm
+        self.alarm_events = None
+        # Node handles resolved once in set_opcua_server
+        self.tags = TagRegistry()
+        # Last published outputs/alarm fields, used to write deltas only
+        self.image = ProcessImage(self.tags)
         
+    @property
+    def alarms(self):
+        # Snapshot of the alarm bits, {"A0": {"Active": ..., "UnAck": ..., "Status": ...}, ...}
+        return {key: {field: alarm_bit(self.alarm_masks, key, field) for field in ALARM_FIELDS}
+                for key in ALARMS}
+
     async def update_inputs(self):
-        # Update digital input readings from the OPC UA server
-        for name in self.digital_inputs.keys():
-            myvar = await self.myobj.get_child(f"{self.idx}:{name}")
-            value = await myvar.read_value()
-            self.digital_inputs.update({name:value})
-        # Complete the code to update the analog input readings from the server
-        for name, value in self.analog_inputs.items():
-            myvar = await self.myobj.get_child(f"{self.idx}:{name}")
-            new_value = await myvar.read_value()
-            self.analog_inputs.update({name: new_value})
+        # Read the whole input image (DI + AI) in a single batched call
+        values = await self.tags.read_values(self.input_tags)
+        split = len(self.digital_inputs)
+        self.digital_inputs.values[:] = values[:split]
+        self.analog_inputs.values[:] = values[split:]
+
 
+    async def update_plant(self):
+        # Publish this tank's sensors, update_inputs then reads them back like any client write
+        await self.image.publish(self.plant.sensor_items(self.row))
 
     async def write_outputs(self):
-        # Complete the necessary code to write the output values into the OPC UA server
-      for name, value in self.digital_outputs.items():
-            myvar = await self.myobj.get_child(f"{self.idx}:{name}")
-            await myvar.write_value(value)
+        # Write the changed part of the output image in a single batched call
+        await self.image.publish(self.digital_outputs.items())
+
+    def alarm_items(self, masks):
+        # ("A0.Active", bit) pairs of every alarm field
+        return [(TagRegistry.alarm_tag(key, field), bool(mask >> bit & 1))
+                for bit, key in enumerate(ALARMS) for field, mask in zip(ALARM_FIELDS, masks)]
+
+    def register_items(self, masks):
+        # (tag, value) pairs of every register: DI, AI, DQ and alarm fields
+        return (list(self.digital_inputs.items()) + list(self.analog_inputs.items())
+                + list(self.digital_outputs.items()) + self.alarm_items(masks))
 
     async def set_alarms(self):
-        for key, values in self.alarms.items():
-            myalarm = await self.myobj.get_child(f"{self.idx}:{key}")
-            if values["Active"]:
-                values["UnAck"] = True
-                values["Status"] = True
-            for newkey, value in values.items():
-                myvar = await myalarm.get_child(f"{self.idx}:{newkey}")
-                await myvar.write_value(value)
-
-    async def reset_alarms(self):
-        for key in self.alarms.keys():
-            self.alarms[key].update({"UnAck":False})
-            self.alarms[key].update({"Status":False})
+        # Nothing to diff per field when no mask changed since the last publish
+        masks = tuple(int(mask) for mask in self.alarm_masks)
+        if masks == self.published_alarm_masks:
+            return
+        await self.image.publish(self.alarm_items(masks))
+        if self.alarm_events is not None:
+            await self.alarm_events.publish(self, self.published_alarm_masks, masks)
+        self.published_alarm_masks = masks
+
+    async def reset(self):
+        """ Back to the initial state between two scans: registers as at start-up, GRAFCET in INIT, nodes rewritten """
+        async with self.scan_lock:
+            self.digital_inputs.values[:] = False
+            self.analog_inputs.values[:] = ANALOG_DEFAULTS
+            self.digital_outputs.values[:] = False
+            self.alarm_masks[:] = 0
+            self.force_table.unforce_all(self.row)
+            self.alarm_table.reset()
+            self.grafcet.reset()
+            if self.ladder is not None:
+                self.ladder.reset(self.row)
+            if self.plant is not None:
+                self.plant.reset(self.row)
+            await self.rewrite_nodes()
+
+    async def rewrite_nodes(self):
+        # Every register node written from the arrays, the process image and alarm events following
+        masks = tuple(int(mask) for mask in self.alarm_masks)
+        items = self.register_items(masks)
+        await self.tags.write_values(items)
+        for name, value in items:
+            self.image.seed(name, value)
+        if self.alarm_events is not None:
+            await self.alarm_events.publish(self, self.published_alarm_masks, masks)
+        self.published_alarm_masks = masks
+        if self.input_changed is not None:
+            self.input_changed.clear()
+
+    def state(self, now):
+        # {name: 1-D array} of everything a scan depends on, timers as seconds elapsed at clock time `now`
+        sections = {"digital_inputs": self.digital_inputs.values, "analog_inputs": self.analog_inputs.values,
+                    "digital_outputs": self.digital_outputs.values, "alarms": self.alarm_masks,
+                    "alarm_timers": self.alarm_table.timers(self.row, now),
+                    "grafcet": np.array([self.grafcet.step.value])}
+        if self.ladder is not None:
+            sections.update(self.ladder.state(self.row, now))
+        if self.plant is not None:
+            sections["plant"] = self.plant.state(self.row)
+        sections.update(self.force_table.state(self.row))
+        return sections
+
+    def snapshot(self):
+        """ Registers, alarm delays, GRAFCET step or ladder bits, tank and forces as a compact binary blob """
+        return pack_state(self.state(self.clock.now()))
+
+    async def restore(self, blob):
+        """ Back to a snapshot() between two scans, all of it or nothing (ValueError), nodes rewritten """
+        # Everything is decoded and checked first, the lock only guards assignments that cannot fail
+        sections = unpack_state(blob)
+        check_state(sections, self.state(0.0))
+        try:
+            step = Step(int(sections["grafcet"][0]))
+        except ValueError:
+            raise ValueError(f"Snapshot GRAFCET step {sections['grafcet'][0]} is not a step") from None
+        forces = self.force_table.decode(sections)
+        async with self.scan_lock:
+            now = self.clock.now()
+            rows = len(self.bank.digital_inputs)
+            self.digital_inputs.values[:] = sections["digital_inputs"]
+            self.analog_inputs.values[:] = sections["analog_inputs"]
+            self.digital_outputs.values[:] = sections["digital_outputs"]
+            self.alarm_masks[:] = sections["alarms"]
+            self.alarm_table.set_timers(self.row, sections["alarm_timers"], now, rows)
+            self.grafcet.step = step
+            if self.ladder is not None:
+                self.ladder.set_state(self.row, sections, now, rows)
+            if self.plant is not None:
+                self.plant.set_state(self.row, sections["plant"])
+            self.force_table.set_state(self.row, forces)
+            await self.rewrite_nodes()
+
+    def acknowledge(self, alarm):
+        """ Acknowledge one alarm as RESET (DI4) does for all, False when it was acknowledged already """
+        bit = 1 << ALARMS.index(alarm)
+        if not self.alarm_masks[UNACK] & bit:
+            return False
+        self.alarm_masks[UNACK] = int(self.alarm_masks[UNACK]) & ~bit
+        if not self.alarm_masks[ACTIVE] & bit:
+            # Cleared and acknowledged, the latch drops as well
+            self.alarm_masks[STATUS] = int(self.alarm_masks[STATUS]) & ~bit
+        return True
+
+    async def force(self, tag, value):
+        """ Hold DI/AI/DQ `tag` at `value` until unforced, a forced output is published right away """
+        value = self.force_table.force(self.row, tag, value)
+        if self.force_table.is_output(tag):
+            await self.image.publish([(tag, value)])
+
+    def unforce(self, tag):
+        return self.force_table.unforce(self.row, tag)
+
+    def unforce_all(self):
+        self.force_table.unforce_all(self.row)
+
+    def evaluate_alarms(self):
+        # Vectorized rules on this PLC's row, RESET (DI4) clears the latches
+        self.alarm_table.scan(self.digital_inputs.values[None], self.analog_inputs.values[None],
+                              self.alarm_masks[None], self.clock.now())
+
+    async def scan(self):
+        """ One PLC cycle: read inputs, evaluate alarms and GRAFCET once, write outputs """
+        self.diagnostics.begin()
+        self.image.begin_cycle()
+        self.scan_count += 1
+        if self.plant is not None:
+            # Integrate the tank over the time since the last scan with the last outputs
+            self.plant.advance(self.bank.digital_outputs, self.clock.now())
+            await self.update_plant()
+        # Updating inputs from server
+        await self.update_inputs()
+        self.force_table.apply_inputs(slice(self.row, self.row + 1))
+        self.diagnostics.mark("InputRead")
+
+        # Implement alarm logic
+        self.evaluate_alarms()
+        self.diagnostics.mark("AlarmEvaluation")
+        self.evaluate_logic()
+        self.force_table.apply_outputs(slice(self.row, self.row + 1))
+        self.diagnostics.mark("Grafcet")
+
+        # Setting alarms and outputs on server
+        await self.set_alarms()
+        await self.write_outputs()
+        if self.historian is not None:
+            self.historian.record(self.clock.now())
+        self.diagnostics.mark("OutputWrite")
+        self.diagnostics.end()
+        await self.diagnostics.publish([self.image])
+
+    def evaluate_logic(self):
+        # GRAFCET and output logic after alarm evaluation, a PLC farm evaluates the alarms of all instances at once
+        if self.ladder is not None:
+            self.ladder.scan(self.bank.digital_inputs, self.bank.analog_inputs, self.bank.digital_outputs,
+                             self.bank.alarms, self.clock.now(), slice(self.row, self.row + 1))
+            return
+        alarm_active = bool(self.alarm_masks[ACTIVE])
+
+        # Implement GRAFCET logic
+        if self.digital_inputs["DI3"] or self.digital_inputs["DI2"]:
+            # EMERGENCY or STOP: leave the sequence and drop every step action
+            self.grafcet.reset()
+        elif not alarm_active:
+            # Normal operation, at most one transition per scan
+            step = self.grafcet.evaluate(self.digital_inputs, self.analog_inputs)
+            if step is Step.STARTING and self.digital_inputs["DI9"]:
+                self.digital_outputs["DQ3"] = False  # Close motor-controlled discharging door
+        # Any other active alarm holds the sequence in its step with actions off
+        self.grafcet.apply_actions(self.digital_outputs, hold=alarm_active)
+
+        # Implement output logic
+        if alarm_active:
+            self.digital_outputs["DQ3"] = True  # Open motor-controlled discharging door
+
+        # Check if lower tank level sensor indicates no more fluid
+        if self.digital_inputs["DI5"]:
+            self.digital_outputs["DQ3"] = False  # Close motor-controlled discharging door
+
+        # Reset the system after acknowledging alarms
+        if not alarm_active:
+            self.digital_outputs["DQ3"] = False  # Close motor-controlled discharging door
+
+    async def wait_next_scan(self):
+        if not self.event_driven:
+            # Sleeping for cycle time
+            await self.clock.sleep(self.cycle_time)
+            return
+        try:
+            await asyncio.wait_for(self.input_changed.wait(), self.fallback_cycle_time)
+        except asyncio.TimeoutError:
+            pass
+        # Cleared before the scan so a write landing during the scan triggers the next one
+        self.input_changed.clear()
+
+    async def on_client_write(self, event, dispatcher):
+        # PostWrite server callback, wakes the scan when a client changed an input
+        if not event.is_external:
+            return
+        for write_value in event.request_params.NodesToWrite:
+            if write_value.NodeId in self.input_nodeids:
+                self.input_changed.set()
+                return
+
+    async def step(self, cycles=1):
+        """ Run `cycles` scans, advancing the clock by cycle_time after each one """
+        for _ in range(cycles):
+            async with self.scan_lock:
+                await self.scan()
+            await self.clock.sleep(self.cycle_time)
+
+    async def replay(self, path, record=None, settle=0):
+        """ Drive the inputs from a scenario file (src/scenario.py) in place of the scan loop, returns the player """
+        player = ScenarioPlayer(self, read_events(path), record)
+        await player.play(settle)
+        return player
+
+    async def wait_scans(self, count=1):
+        """ Return once `count` more scans completed, for tests and tools driving a running simulator """
+        target = self.scan_count + count
+        while self.scan_count < target:
+            await asyncio.sleep(0.01)
 
-    
     async def execute_control_logic(self):
-        # Initialize variables as needed
-        self.temperature_high_limit = 80
-        self.temperature_low_limit = 10
-        self.heating_setpoint = 45
         try:
             while True:
-                # Updating inputs from server
-                await self.update_inputs()
-
-                # Implement alarm logic
-                self.alarms["A0"]["Active"] = self.digital_inputs["DI7"]  # Tank Level Too High
-                self.alarms["A1"]["Active"] = self.digital_inputs["DI5"]  # Tank Level Too Low
-                self.alarms["A2"]["Active"] = self.analog_inputs["AI0"] > self.temperature_high_limit # Fluid Temperature Too High
-                self.alarms["A3"]["Active"] = self.analog_inputs["AI0"] < self.temperature_low_limit  # Fluid Temperature Too Low
-                self.alarms["A4"]["Active"] = self.digital_inputs["DI9"]  # Discharging Door Open
-                self.alarms["A5"]["Active"] = self.digital_inputs["DI3"]  # Emergency Button Pressed
-
-
-                # Press RESET for ack.
-                if self.digital_inputs["DI4"]:
-                    await self.reset_alarms()
-                        
-                # Setting alarms on server
-                await self.set_alarms()
-
-                # Implement GRAFCET logic
-                if not any(alarm["Active"] for alarm in self.alarms.values()) or self.digital_inputs["DI2"]:
-                # Normal operation
-            # STARTING
-                    if self.digital_inputs["DI0"]: #START button pressed
-                        if self.digital_inputs["DI9"]:
-                            # Close the discharging door
-                            self.digital_outputs["DQ3"] = False  # Close motor-controlled discharging door
-
-                        # Initiate prefilling until DI6 sensor is activated
-                        while not self.digital_inputs["DI6"]:
-                            self.digital_outputs["DQ0"] = True  # Open In Valve
-                            # Updating inputs from server
-                            await self.update_inputs()
-
-                        # Stop prefilling once tank level is reached
-                        self.digital_outputs["DQ0"] = False  # Close In Valve
-
-                # RUNNING
-                    if self.digital_inputs["DI1"]:
-                        # Tank filling process
-                        self.digital_outputs["DQ0"] = True  # Open In Valve
-
-                        # Wait for high level to be reached
-                        while not self.digital_inputs["DI7"]:
-                            # Updating inputs from server
-                            await self.update_inputs()
-
-                        # Stop tank filling once high level is reached
-                        self.digital_outputs["DQ0"] = False  # Close In Valve
-
-                        # Fluid heating process directly after reaching high level
-                        self.digital_outputs["DQ2"] = True  # Start Heating System
-
-                # HEATING
-                    heating_setpoint = self.heating_setpoint  # Get the current setpoint
-
-                    while self.analog_inputs["AI0"] < heating_setpoint:
-                        # Updating inputs from server
-                        await self.update_inputs()
-
-                    # Stop heating once setpoint is reached
-                    self.digital_outputs["DQ2"] = False  # Stop Heating System
-
-                # DISCHARGING
-                    self.digital_outputs["DQ1"] = True  # Open Out Valve
-
-                    # Wait for low level to be reached
-                    while not self.digital_inputs["DI6"]:
-                        # Updating inputs from server
-                        await self.update_inputs()
-
-                    # Stop tank discharging once low level is reached
-                    self.digital_outputs["DQ1"] = False  # Close Out Valve
-
-
-                # Implement output logic
-                for alarm_values in self.alarms.values():
-                        if alarm_values["Active"]:
-                            self.digital_outputs["DQ3"] = True  # Open motor-controlled discharging door
-
-                    # Check if lower tank level sensor indicates no more fluid
-                if not self.digital_inputs["DI5"]:
-                        self.digital_outputs["DQ3"] = False  # Close motor-controlled discharging door
-
-                    # Reset the system after acknowledging alarms
-                if not any(alarm["Active"] for alarm in self.alarms.values()):
-                        self.digital_outputs["DQ3"] = False  # Close motor-controlled discharging door
-
-
-                # Setting outputs on server
-                await self.write_outputs()
-                # Sleeping for cycle time
-                await asyncio.sleep(self.cycle_time)
+                async with self.scan_lock:
+                    await self.scan()
+                await self.wait_next_scan()
         finally:
-            await self.server.stop()
+            await self.stop()
             print("Stopping server")
 
     
+    def node_items(self, idx, name):
+        # AddNodesItems of this PLC's object and tags, created with the current register values
+        return self.tag_database.node_items(idx, name, dict(self.register_items(self.alarm_masks)))
+
+    async def add_plc_object(self, server, idx, name, alarm_events=None, nodes_added=False, force_methods=None,
+                             snapshot_methods=None):
+        """ Create this PLC's object and variables on a (possibly shared) server
+
+        All nodes are created in one AddNodes call, or were already by the caller (a farm creates the nodes of
+        all instances at once) when nodes_added is set.
+        """
+        self.server = server
+        self.idx = idx
+        self.alarm_events = alarm_events
+        if not nodes_added:
+            await TagDatabase.add_nodes(server, self.node_items(idx, name))
+        self.myobj = server.get_node(TagDatabase.node_id(idx, name))
+
+        # Keep the created nodes so the scan never has to browse for them
+        self.tags.session = server.iserver.isession
+        for key, value in self.register_items(self.alarm_masks):
+            self.tags.add(key, server.get_node(TagDatabase.node_id(idx, name, key)),
+                          self.tag_database.variant_types[key])
+            if key not in self.digital_inputs and key not in self.analog_inputs:
+                self.image.seed(key, value)
+        if alarm_events is not None:
+            for key in ALARMS:
+                alarm_events.add(self, key, server.get_node(TagDatabase.node_id(idx, name, key)), name)
+        if force_methods is not None:
+            await force_methods.add(self, self.myobj)
+        if snapshot_methods is not None:
+            await snapshot_methods.add(self, self.myobj)
+        self.published_alarm_masks = tuple(int(mask) for mask in self.alarm_masks)
+        self.input_tags = list(self.digital_inputs) + list(self.analog_inputs)
+        self.input_nodeids = {node.nodeid for node in self.tags.get_nodes(self.input_tags)}
+
+    async def historize(self):
+        # DI/AI/DQ and alarm Status answer HistoryRead, retention is the storage's own
+        names = self.input_tags + list(self.digital_outputs) + [TagRegistry.alarm_tag(key, "Status") for key in ALARMS]
+        await self.server.historize_node_data_change(self.tags.get_nodes(names), period=None, count=0)
+
     async def set_opcua_server(self):
         self.server = Server()
+        if self.history is not None:
+            # Set before init, which initializes the storage
+            self.server.iserver.history_manager.set_storage(self.history)
         await self.server.init() 
         # self.server.set_endpoint("opc.tcp://localhost:7000/freeopcua/server/")
-        self.server.set_endpoint("opc.tcp://localhost:48020/PLC-simulator/opc")
+        self.server.set_endpoint(self.endpoint)
 
         # setup our own namespace, not really necessary but should as spec
         # uri = "http://examples.freeopcua.github.io"
         uri = "http://PLC-simulator/opc"
 
-        self.idx = await self.server.register_namespace(uri)
-
-        # get Objects node, this is where we should put our nodes
-        objects = self.server.get_objects_node()
-
-        # populating our address space
-        self.myobj = await objects.add_object(self.idx, "myPLC")
-        
-        for key, value in self.digital_inputs.items():
-            myvar = await self.myobj.add_variable(self.idx, key, value)
-            await myvar.set_writable()
-        for key, value in self.analog_inputs.items():
-            myvar = await self.myobj.add_variable(self.idx, key, value)
-            await myvar.set_writable()
-        for key, value in self.digital_outputs.items():
-            myvar = await self.myobj.add_variable(self.idx, key, value)
-            await myvar.set_writable()
-        for key, values in self.alarms.items():
-            myalarm = await self.myobj.add_object(self.idx, key)
-            for newkey, value in values.items():
-                myvar = await myalarm.add_variable(self.idx, newkey, value)
-                await myvar.set_writable()
+        idx = await self.server.register_namespace(uri)
+
+        # Alarm transitions as AlarmCondition events from the Server object, Acknowledge method linked
+        alarm_events = AlarmEvents(self.server)
+        await alarm_events.init()
+
+        # populating our address space, outputs are read-only for clients and forced through methods instead
+        await self.add_plc_object(self.server, idx, "myPLC", alarm_events, force_methods=ForceMethods(self.server),
+                                  snapshot_methods=SnapshotMethods(self.server))
+        await self.diagnostics.add_nodes(self.myobj, idx, self.tags)
+        # Created here so it belongs to the server's event loop
+        self.scan_lock = asyncio.Lock()
+        if self.historian is not None:
+            self.historian.attach(self.bank, ["myPLC"])
+        if self.history is not None:
+            await self.historize()
+        if self.event_driven:
+            # Created here so it belongs to the server's event loop
+            self.input_changed = asyncio.Event()
+            self.server.subscribe_server_callback(CallbackType.PostWrite, self.on_client_write)
 
         # starting!
         await self.server.start()
@@ -232,20 +428,65 @@ class PLCSimulator:
         print("****OPC up and running*****")
 
     async def stop(self):
+        if self.historian is not None:
+            await self.historian.close()
         await self.server.stop()
         
     
-    async def main(self):
+    async def main(self, scenario=None, record=None, golden=None):
         # Set OPC UA server
         await self.set_opcua_server()
 
+        if scenario is not None:
+            # Replay the scenario and 5 s more for its last events to settle, exit status 1 on a golden mismatch
+            try:
+                player = await self.replay(scenario, record, settle=int(5 / self.cycle_time))
+                print(f"Replayed {player.applied} events in {player.scans} scans")
+            finally:
+                await self.stop()
+            if golden is not None:
+                differences = list(itertools.islice(diff_recordings(record, golden), 10))
+                for line, recorded, expected in differences:
+                    print(f"line {line}: {recorded!r} != golden {expected!r}")
+                return 1 if differences else 0
+            return 0
+
         # Execute cycle program
         await self.execute_control_logic()
 
 if __name__ == "__main__":
-    plc = PLCSimulator()
+    parser = argparse.ArgumentParser(description="OPC UA PLC simulator")
+    parser.add_argument("--event-driven", action="store_true",
+                        help="scan on every input change, periodic scan only as fallback")
+    parser.add_argument("--plant", action="store_true",
+                        help="simulate the tank so DI5-DI8 and AI0 follow the valves and heating")
+    parser.add_argument("--alarms", metavar="FILE",
+                        help="alarm rules with deadband, on/off delay and shelving from a JSON or YAML file")
+    parser.add_argument("--ladder", metavar="FILE",
+                        help="run the function-block program of a netlist export (config/PLC_SY.xml) as logic")
+    parser.add_argument("--tags", metavar="FILE",
+                        help="type, access level and engineering units of every tag from a JSON file")
+    parser.add_argument("--history", metavar="DIR", help="record the process image changes into DIR")
+    parser.add_argument("--history-store", metavar="memory|FILE.db",
+                        help="serve HistoryRead from a bounded in-memory store or a SQLite file")
+    parser.add_argument("--scenario", metavar="FILE",
+                        help="replay the input events of a CSV or binary scenario in simulated time, then exit")
+    parser.add_argument("--record", metavar="FILE", default="scenario_record.csv",
+                        help="outputs and alarm changes of the --scenario run (default scenario_record.csv)")
+    parser.add_argument("--golden", metavar="FILE", help="compare the --scenario recording with a golden one")
+    args = parser.parse_args()
+
+    history = None
+    if args.history_store:
+        history = BoundedHistory() if args.history_store == "memory" else SQLiteHistory(args.history_store)
+    plc = PLCSimulator(event_driven=args.event_driven, plant=TankPlant() if args.plant else None,
+                       alarm_table=AlarmTable.from_file(args.alarms) if args.alarms else None,
+                       ladder=LadderProgram.from_file(args.ladder) if args.ladder else None,
+                       tag_database=TagDatabase.from_file(args.tags) if args.tags else None,
+                       historian=Historian(args.history) if args.history else None, history=history,
+                       clock=VirtualClock() if args.scenario else None)
     try:
-        asyncio.run(plc.main())
+        sys.exit(asyncio.run(plc.main(args.scenario, args.record, args.golden)))
     except KeyboardInterrupt:
          ascii_art = """
                  _ ._  _ , _ ._
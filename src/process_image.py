@@ -0,0 +1,40 @@
+
+class ProcessImage:
+    """ Last published value per tag; only deltas are written to the server """
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.published = {}
+
+        # Write counters of the current cycle and since start-up
+        self.cycle_writes = 0
+        self.cycle_skipped = 0
+        self.total_writes = 0
+        self.total_skipped = 0
+
+    def seed(self, name, value):
+        # Value the node was created with, so the first cycle does not rewrite it
+        self.published[name] = value
+
+    def begin_cycle(self):
+        self.cycle_writes = 0
+        self.cycle_skipped = 0
+
+    async def publish(self, items):
+        changed = []
+        skipped = 0
+        for name, value in items:
+            if name in self.published and self.published[name] == value:
+                skipped += 1
+            else:
+                changed.append((name, value))
+
+        await self.tags.write_values(changed)
+        for name, value in changed:
+            self.published[name] = value
+
+        self.cycle_writes += len(changed)
+        self.cycle_skipped += skipped
+        self.total_writes += len(changed)
+        self.total_skipped += skipped
+        return len(changed)
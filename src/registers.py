@@ -0,0 +1,84 @@
+from collections.abc import MutableMapping
+import numpy as np
+
+# Register layout, the position of a name is its column in the arrays
+DIGITAL_INPUTS = ("DI0",  # START BUTTON
+                  "DI1",  # RUN BUTTON
+                  "DI2",  # STOP BUTTON
+                  "DI3",  # EMERGENCY BUTTON
+                  "DI4",  # RESET BUTTON
+                  "DI5",  # LOWER LEVEL FLOATER
+                  "DI6",  # LOW LEVEL FLOATER
+                  "DI7",  # HIGH LEVEL FLOATER
+                  "DI8",  # HIGHER LEVEL FLOATER
+                  "DI9")  # DISCHARGING GATE SENSOR
+
+ANALOG_INPUTS = ("AI0",)  # SENSOR TEMPERATURE
+# Analog inputs at start-up and after a reset: ambient temperature, 0 degC would raise A3 (Fluid Temperature Too Low)
+ANALOG_DEFAULTS = (20.0,)
+
+DIGITAL_OUTPUTS = ("DQ0",  # INPUT VALVE
+                   "DQ1",  # OUTPUT VALVE
+                   "DQ2",  # HEATING SYSTEM VALVE
+                   "DQ3")  # MOTOR-CONTROLLED DISCHARGING GATE
+
+# Alarm n is bit n of the alarm masks
+ALARMS = ("A0",  # Tank high level
+          "A1",  # Tank low level
+          "A2",  # High temp >80
+          "A3",  # Low temp <10
+          "A4",  # Discharging door open
+          "A5")  # Emergency activated
+
+# Columns of the alarm mask array
+ALARM_FIELDS = ("Active", "UnAck", "Status")
+ACTIVE, UNACK, STATUS = range(len(ALARM_FIELDS))
+
+
+class Register(MutableMapping):
+    """ Named, dict-style view over a 1-D typed array """
+
+    def __init__(self, names, values):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.values = values
+
+    def __getitem__(self, name):
+        return self.values[self.index[name]].item()
+
+    def __setitem__(self, name, value):
+        self.values[self.index[name]] = value
+
+    def __delitem__(self, name):
+        raise TypeError("Register layout is fixed")
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class RegisterBank:
+    """ Process image of `count` PLCs, one row per PLC """
+
+    def __init__(self, count=1):
+        self.count = count
+        self.digital_inputs = np.zeros((count, len(DIGITAL_INPUTS)), dtype=bool)
+        self.analog_inputs = np.full((count, len(ANALOG_INPUTS)), ANALOG_DEFAULTS, dtype=np.float64)
+        self.digital_outputs = np.zeros((count, len(DIGITAL_OUTPUTS)), dtype=bool)
+        self.alarms = np.zeros((count, len(ALARM_FIELDS)), dtype=np.uint32)
+
+    def registers(self, row):
+        # Views share memory with the bank, writes through them land in the bank
+        return (Register(DIGITAL_INPUTS, self.digital_inputs[row]),
+                Register(ANALOG_INPUTS, self.analog_inputs[row]),
+                Register(DIGITAL_OUTPUTS, self.digital_outputs[row]),
+                self.alarms[row])
+
+
+def alarm_bit(masks, alarm, field):
+    return bool((int(masks[ALARM_FIELDS.index(field)]) >> ALARMS.index(alarm)) & 1)
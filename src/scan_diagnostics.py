@@ -0,0 +1,154 @@
+import logging
+import time
+import numpy as np
+from process_image import ProcessImage
+
+# Scan phases in execution order, Sleep is the idle time between two scans
+PHASES = ("InputRead", "AlarmEvaluation", "Grafcet", "OutputWrite", "Sleep")
+# Metrics published under the Diagnostics object, all in milliseconds
+METRICS = ("ScanTime", "Jitter") + PHASES
+STATISTICS = ("P50", "P99", "Max")
+COUNTERS = ("Scans", "Overruns")
+# Write counters of the process image (outputs, alarm fields and sensors) -> ProcessImage attribute
+WRITE_COUNTERS = {"CycleWrites": "cycle_writes", "CycleSkipped": "cycle_skipped",
+                  "TotalWrites": "total_writes", "TotalSkipped": "total_skipped"}
+
+
+class RollingWindow:
+    """ Last `size` samples in a ring, percentiles and histograms over the recent window only """
+
+    def __init__(self, size):
+        self.samples = np.zeros(size)
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def values(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def statistics(self):
+        # p50, p99, max
+        values = self.values()
+        if not len(values):
+            return 0.0, 0.0, 0.0
+        p50, p99 = np.percentile(values, (50, 99))
+        return float(p50), float(p99), float(values.max())
+
+    def histogram(self, bins=10):
+        return np.histogram(self.values(), bins)
+
+
+class ScanDiagnostics:
+    """ Per-phase scan timing, jitter against cycle_time and overruns, published as Diagnostics.* tags """
+
+    def __init__(self, cycle_time, clock, window=1500, publish_interval=1.0, log_interval=10.0):
+        self.cycle_time = cycle_time
+        # Jitter is measured on the scan clock, durations on the CPU's performance counter
+        self.clock = clock
+        self.windows = {metric: RollingWindow(window) for metric in METRICS}
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.publish_interval = publish_interval
+        self.log_interval = log_interval
+
+        self.scans = 0
+        self.overruns = 0
+        self.last_scan_time = 0.0
+        self.max_scan_time = 0.0
+        self.last_start = None
+        self.scan_start = None
+        self.scan_end = None
+        self.mark_time = None
+        self.last_publish = None
+        self.last_log = None
+        self.writes = dict.fromkeys(WRITE_COUNTERS.values(), 0)
+        # Own process image of the Diagnostics nodes, so their writes stay out of the write counters;
+        # it exists only once add_nodes ran, headless scans (benchmarks) only log
+        self.image = None
+
+    def begin(self):
+        now = self.clock.now()
+        if self.last_start is not None:
+            self.windows["Jitter"].add(abs(now - self.last_start - self.cycle_time) * 1000)
+        self.last_start = now
+        self.scan_start = self.mark_time = time.perf_counter()
+        if self.scan_end is not None:
+            self.windows["Sleep"].add((self.scan_start - self.scan_end) * 1000)
+
+    def mark(self, phase):
+        # Time since the previous mark goes to `phase`
+        now = time.perf_counter()
+        self.phase_times[phase] += now - self.mark_time
+        self.mark_time = now
+
+    def end(self):
+        self.scan_end = time.perf_counter()
+        self.last_scan_time = self.scan_end - self.scan_start
+        self.max_scan_time = max(self.max_scan_time, self.last_scan_time)
+        self.windows["ScanTime"].add(self.last_scan_time * 1000)
+        for phase in PHASES[:-1]:
+            self.windows[phase].add(self.phase_times[phase] * 1000)
+            self.phase_times[phase] = 0.0
+        self.scans += 1
+        if self.last_scan_time > self.cycle_time:
+            self.overruns += 1
+
+    def count_writes(self, images):
+        # Summed over the process images of the scan, one per instance of a farm
+        for attribute in WRITE_COUNTERS.values():
+            self.writes[attribute] = sum(getattr(image, attribute) for image in images)
+
+    def items(self):
+        # (tag, value) pairs of the Diagnostics object
+        items = []
+        for metric in METRICS:
+            for statistic, value in zip(STATISTICS, self.windows[metric].statistics()):
+                items.append((f"Diagnostics.{metric}.{statistic}", value))
+        items.append(("Diagnostics.Scans", self.scans))
+        items.append(("Diagnostics.Overruns", self.overruns))
+        for counter, attribute in WRITE_COUNTERS.items():
+            items.append((f"Diagnostics.{counter}", self.writes[attribute]))
+        return items
+
+    def summary(self):
+        summary = {"scans": self.scans, "overruns": self.overruns, **self.writes}
+        for metric in METRICS:
+            summary[metric] = dict(zip(("p50_ms", "p99_ms", "max_ms"),
+                                       (round(value, 3) for value in self.windows[metric].statistics())))
+        return summary
+
+    def due(self):
+        """ (publish, log) flags, each at most once per interval of scan clock time """
+        now = self.clock.now()
+        publish = self.last_publish is None or now - self.last_publish >= self.publish_interval
+        log = self.last_log is None or now - self.last_log >= self.log_interval
+        if publish:
+            self.last_publish = now
+        if log:
+            self.last_log = now
+        return publish, log
+
+    async def add_nodes(self, parent, idx, tags):
+        """ Create the Diagnostics object under `parent` and register its variables in `tags` """
+        # Read-only variables, written by the scan only
+        self.image = ProcessImage(tags)
+        diagnostics = await parent.add_object(idx, "Diagnostics")
+        for metric in METRICS:
+            node = await diagnostics.add_object(idx, metric)
+            for statistic in STATISTICS:
+                tags.add(f"Diagnostics.{metric}.{statistic}", await node.add_variable(idx, statistic, 0.0))
+                self.image.seed(f"Diagnostics.{metric}.{statistic}", 0.0)
+        for counter in COUNTERS + tuple(WRITE_COUNTERS):
+            tags.add(f"Diagnostics.{counter}", await diagnostics.add_variable(idx, counter, 0))
+            self.image.seed(f"Diagnostics.{counter}", 0)
+
+    async def publish(self, images, name="PLC"):
+        # Diagnostics nodes every publish_interval, a structured log record every log_interval
+        self.count_writes(images)
+        publish, log = self.due()
+        if publish and self.image is not None:
+            await self.image.publish(self.items())
+        if log:
+            # Fields of the JSON record (log_pipeline.JsonFormatter), not a JSON string inside the message
+            logging.info("Scan diagnostics", extra={"plc": name, **self.summary()})
@@ -0,0 +1,161 @@
+import contextlib
+import csv
+import itertools
+import numpy as np
+from registers import ANALOG_INPUTS, DIGITAL_INPUTS
+from tag_database import REGISTER_TAGS, VARIANT_TYPES
+
+# Binary scenario: "PLCSCN" and a format version, then 18-byte records, the tag as its index in REGISTER_TAGS
+MAGIC = b"PLCSCN\x01\x00"
+EVENT = np.dtype([("time", "<f8"), ("tag", "<u2"), ("value", "<f8")])
+# Records read or written at a time, the memory a scenario takes whatever its length
+CHUNK = 1 << 16
+CSV_HEADER = ["time", "tag", "value"]
+CSV_VALUES = {"true": 1.0, "false": 0.0}
+# Tags a scenario drives, everything else belongs to the scan
+INPUT_TAGS = DIGITAL_INPUTS + ANALOG_INPUTS
+# Clock times are sums of cycle_time, an event stamped on a scan boundary is due even a few ulps before it
+TIME_TOLERANCE = 1e-6
+# Tag of each binary tag index, looked up for a whole chunk at once
+TAG_NAMES = np.array(REGISTER_TAGS, dtype=object)
+
+
+def read_events(path):
+    """ (time, tag, value) events of a scenario file, streamed: binary (write_events) or CSV
+
+    time,tag,value
+    0.0,DI0,1
+    0.4,DI0,0
+    12.5,AI0,46.5
+    """
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return read_binary(path) if binary else read_csv(path)
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        rows = csv.reader(f)
+        if next(rows, None) != CSV_HEADER:
+            raise ValueError(f"{path}: a CSV scenario starts with a time,tag,value header")
+        for line, row in enumerate(rows, 2):
+            if not row:
+                continue
+            try:
+                time, tag, value = row
+                yield float(time), tag, float(CSV_VALUES.get(value.strip().lower(), value))
+            except ValueError:
+                raise ValueError(f"{path}:{line}: expected time,tag,value, got {','.join(row)!r}") from None
+
+
+def read_binary(path):
+    with open(path, "rb") as f:
+        f.seek(len(MAGIC))
+        while True:
+            data = f.read(CHUNK * EVENT.itemsize)
+            if not data:
+                return
+            if len(data) % EVENT.itemsize:
+                raise ValueError(f"{path}: truncated scenario")
+            records = np.frombuffer(data, EVENT)
+            if len(records) and records["tag"].max() >= len(REGISTER_TAGS):
+                raise ValueError(f"{path}: tag index {records['tag'].max()} is not a register")
+            yield from zip(records["time"].tolist(), TAG_NAMES[records["tag"]].tolist(), records["value"].tolist())
+
+
+def write_events(path, events):
+    """ Binary scenario of (time, tag, value) events, e.g. write_events("run.scn", read_events("run.csv")) """
+    index = {tag: i for i, tag in enumerate(REGISTER_TAGS)}
+    events = iter(events)
+    count = 0
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for batch in iter(lambda: list(itertools.islice(events, CHUNK)), []):
+            records = np.empty(len(batch), EVENT)
+            times, tags, values = zip(*batch)
+            try:
+                records["tag"] = [index[tag] for tag in tags]
+            except KeyError as error:
+                raise ValueError(f"{error.args[0]} is not a register") from None
+            records["time"] = times
+            records["value"] = values
+            f.write(records.tobytes())
+            count += len(batch)
+    return count
+
+
+def diff_recordings(path, golden):
+    """ (line, recorded, golden) of every line where two recordings differ, streamed, none when the runs match """
+    with open(path) as recorded, open(golden) as expected:
+        for line, (ours, theirs) in enumerate(itertools.zip_longest(recorded, expected), 1):
+            if ours != theirs:
+                yield line, ours and ours.rstrip("\n"), theirs and theirs.rstrip("\n")
+
+
+class ScenarioPlayer:
+    """ Feeds the events of a scenario to a PLC, each at the first scan starting at or after its time
+
+    Events due at the same scan are written to the input nodes in one call, the last one per tag wins. After every
+    scan the outputs and alarm fields that changed go to the `record` CSV (time,tag,value, time from the start of
+    the scenario), which diff_recordings() compares with a golden run.
+    """
+
+    def __init__(self, plc, events, record=None):
+        self.plc = plc
+        self.events = iter(events)
+        self.record = record
+        # Python type of each input as declared in the tag database
+        self.types = {tag: VARIANT_TYPES[plc.tag_database.tags[tag][0]] for tag in INPUT_TAGS}
+        self.applied = 0
+        self.scans = 0
+        # Time of the last event applied, events come in time order
+        self.last = -np.inf
+        self.recorded = {}
+
+    def due(self, pending, now):
+        # {tag: value} of the events due at scenario time `now`, and the first event not due yet
+        items = {}
+        while pending is not None and pending[0] <= now + TIME_TOLERANCE:
+            time, tag, value = pending
+            if time < self.last:
+                raise ValueError(f"Scenario event {tag} at {time} s is earlier than the one before it")
+            if tag not in self.types:
+                raise ValueError(f"{tag} is not an input, a scenario drives {', '.join(INPUT_TAGS)}")
+            items[tag] = self.types[tag](value)
+            self.last = time
+            self.applied += 1
+            pending = next(self.events, None)
+        return items, pending
+
+    def write_changes(self, writer, now):
+        masks = tuple(int(mask) for mask in self.plc.alarm_masks)
+        for tag, value in list(self.plc.digital_outputs.items()) + self.plc.alarm_items(masks):
+            if self.recorded.get(tag) != value:
+                self.recorded[tag] = value
+                writer.writerow((f"{now:.3f}", tag, int(value)))
+
+    async def play(self, settle=0):
+        """ Scan until the last event was applied, then `settle` more scans, returns the number of scans """
+        plc = self.plc
+        start = plc.clock.now()
+        pending = next(self.events, None)
+        with contextlib.ExitStack() as stack:
+            writer = None
+            if self.record is not None:
+                writer = csv.writer(stack.enter_context(open(self.record, "w", newline="")))
+                writer.writerow(CSV_HEADER)
+            while True:
+                now = plc.clock.now() - start
+                items, pending = self.due(pending, now)
+                if items:
+                    await plc.tags.write_values(list(items.items()))
+                async with plc.scan_lock:
+                    await plc.scan()
+                self.scans += 1
+                if writer is not None:
+                    self.write_changes(writer, now)
+                if pending is None:
+                    if settle <= 0:
+                        return self.scans
+                    settle -= 1
+                await plc.clock.sleep(plc.cycle_time)
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+
+class WallClock:
+    """ Real time, the scan sleeps for real """
+
+    def now(self):
+        return time.monotonic()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """ Simulated time, advanced by the scan scheduler instead of waited for """
+
+    def __init__(self, start=0.0):
+        # Integer nanoseconds, so long runs do not drift and replay bit for bit
+        self.ns = round(start * 1e9)
+
+    def now(self):
+        return self.ns / 1e9
+
+    def advance(self, seconds):
+        self.ns += round(seconds * 1e9)
+
+    async def sleep(self, seconds):
+        self.advance(seconds)
+        # Still yield so the server can serve clients between scans
+        await asyncio.sleep(0)
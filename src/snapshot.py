@@ -0,0 +1,91 @@
+import struct
+import numpy as np
+from asyncua import ua
+from asyncua.common.methods import uamethod
+
+# "PLCSNAP" and a format version, then one section per state array: name, dtype, length and the raw values
+MAGIC = b"PLCSNAP"
+VERSION = 1
+HEADER = struct.Struct("<7sB")
+SECTION = struct.Struct("<16s3sI")
+
+
+def pack_state(sections):
+    """ Binary blob of {name: 1-D array}, a few hundred bytes for one PLC """
+    parts = [HEADER.pack(MAGIC, VERSION)]
+    for name, values in sections.items():
+        values = np.ascontiguousarray(values)
+        parts.append(SECTION.pack(name.encode(), values.dtype.str.encode(), len(values)))
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def unpack_state(blob):
+    """ {name: 1-D array} of a pack_state blob, ValueError when it is not one """
+    try:
+        magic, version = HEADER.unpack_from(blob)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} PLC snapshot")
+        sections = {}
+        offset = HEADER.size
+        while offset < len(blob):
+            name, dtype, count = SECTION.unpack_from(blob, offset)
+            dtype = np.dtype(dtype.decode())
+            offset += SECTION.size
+            sections[name.rstrip(b"\0").decode()] = np.frombuffer(blob, dtype, count, offset).copy()
+            offset += dtype.itemsize * count
+    except (struct.error, TypeError, UnicodeDecodeError) as error:
+        raise ValueError(f"Corrupt PLC snapshot: {error}") from None
+    return sections
+
+
+def check_state(sections, expected):
+    # Same arrays as this PLC's own state, nothing is applied from a snapshot of another layout
+    if sections.keys() != expected.keys():
+        raise ValueError(f"Snapshot holds {sorted(sections)}, this PLC {sorted(expected)}")
+    for name, values in expected.items():
+        if sections[name].dtype != values.dtype or sections[name].shape != values.shape:
+            raise ValueError(f"Snapshot {name} is {sections[name].dtype}{sections[name].shape}, "
+                             f"this PLC {values.dtype}{values.shape}")
+
+
+class SnapshotMethods:
+    """ Snapshot() and Restore(snapshot) on every PLC object of one server
+
+    Like ForceMethods, the method nodes are created once, under the first PLC object, and referenced by the others.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        # PLC object NodeId -> PLCSimulator
+        self.plcs = {}
+        self.methods = None
+
+    async def add(self, plc, node):
+        self.plcs[node.nodeid] = plc
+        if self.methods is None:
+            blob = ua.VariantType.ByteString
+            self.methods = [await node.add_method(plc.idx, "Snapshot", self.snapshot, [], [blob]),
+                            await node.add_method(plc.idx, "Restore", self.restore, [blob], [])]
+            return
+        await self.server.iserver.isession.add_references(
+            [ua.AddReferencesItem(SourceNodeId=node.nodeid, ReferenceTypeId=ua.NodeId(ua.ObjectIds.HasComponent),
+                                  IsForward=True, TargetNodeId=method.nodeid, TargetNodeClass=ua.NodeClass.Method)
+             for method in self.methods])
+
+    @uamethod
+    async def snapshot(self, parent):
+        plc = self.plcs.get(parent)
+        if plc is None:
+            return ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown)
+        return plc.snapshot()
+
+    @uamethod
+    async def restore(self, parent, blob):
+        plc = self.plcs.get(parent)
+        if plc is None:
+            return ua.StatusCode(ua.StatusCodes.BadNodeIdUnknown)
+        try:
+            await plc.restore(blob)
+        except ValueError:
+            return ua.StatusCode(ua.StatusCodes.BadInvalidArgument)
@@ -0,0 +1,152 @@
+import json
+from asyncua import ua
+from registers import ALARM_FIELDS, ALARMS, ANALOG_INPUTS, DIGITAL_INPUTS, DIGITAL_OUTPUTS
+
+# Python type of the values of each VariantType a tag may be declared with
+VARIANT_TYPES = {"Boolean": bool, "SByte": int, "Byte": int, "Int16": int, "UInt16": int, "Int32": int,
+                 "UInt32": int, "Int64": int, "UInt64": int, "Float": float, "Double": float, "String": str}
+ACCESS_LEVELS = {"r": ua.AccessLevel.CurrentRead.mask,
+                 "rw": ua.AccessLevel.CurrentRead.mask | ua.AccessLevel.CurrentWrite.mask}
+# UNECE common code and symbol of the engineering units a tag may declare (EUInformation, OPC UA Part 8)
+UNITS = {"degC": ("CEL", "°C"), "degF": ("FAH", "°F"), "K": ("KEL", "K"), "%": ("P1", "%"), "bar": ("BAR", "bar"),
+         "l": ("LTR", "l"), "l/s": ("G51", "l/s"), "m": ("MTR", "m"), "s": ("SEC", "s")}
+UNECE_URI = "http://www.opcfoundation.org/UA/units/un/cefact"
+
+OBJECTS_FOLDER = ua.NodeId(ua.ObjectIds.ObjectsFolder)
+ORGANIZES = ua.NodeId(ua.ObjectIds.Organizes)
+HAS_COMPONENT = ua.NodeId(ua.ObjectIds.HasComponent)
+HAS_PROPERTY = ua.NodeId(ua.ObjectIds.HasProperty)
+BASE_OBJECT_TYPE = ua.NodeId(ua.ObjectIds.BaseObjectType)
+BASE_DATA_VARIABLE_TYPE = ua.NodeId(ua.ObjectIds.BaseDataVariableType)
+BASE_ANALOG_TYPE = ua.NodeId(ua.ObjectIds.BaseAnalogType)
+PROPERTY_TYPE = ua.NodeId(ua.ObjectIds.PropertyType)
+
+# Every register is a tag, alarm fields as "A0.Active"
+ALARM_TAGS = tuple(f"{alarm}.{field}" for alarm in ALARMS for field in ALARM_FIELDS)
+REGISTER_TAGS = DIGITAL_INPUTS + ANALOG_INPUTS + DIGITAL_OUTPUTS + ALARM_TAGS
+# name -> (type, access, unit, description) of the register tags
+TAG_DEFAULTS = dict.fromkeys(REGISTER_TAGS, ("Boolean", "rw", None, None))
+TAG_DEFAULTS.update(dict.fromkeys(ANALOG_INPUTS, ("Double", "rw", None, None)))
+# Outputs belong to the scan, clients force them instead (src/forcing.py)
+TAG_DEFAULTS.update(dict.fromkeys(DIGITAL_OUTPUTS, ("Boolean", "r", None, None)))
+# Alarm fields are computed by the alarm table every scan, RESET (DI4) or Acknowledge clears them
+TAG_DEFAULTS.update(dict.fromkeys(ALARM_TAGS, ("Boolean", "r", None, None)))
+TAG_DEFAULTS["AI0"] = ("Double", "rw", "degC", None)  # SENSOR TEMPERATURE
+# Types a register can be declared with: the bank holds DI, DQ and alarm fields as booleans, AI as float64
+REGISTER_TYPES = dict.fromkeys(REGISTER_TAGS, ("Boolean",))
+REGISTER_TYPES.update(dict.fromkeys(ANALOG_INPUTS, ("Float", "Double")))
+
+
+def load_tag_config(path):
+    """ {name: (type, access, unit, description)} of a JSON tag file
+
+    {"tags": [{"name": "AI0", "type": "Double", "access": "rw", "unit": "degC", "description": "..."}, ...]}
+    """
+    with open(path) as f:
+        config = json.load(f)
+    tags = {}
+    for entry in config["tags"]:
+        name = entry.get("name")
+        if name not in TAG_DEFAULTS:
+            raise ValueError(f"{path}: {name!r} is not a register of the PLC")
+        unknown = set(entry) - {"name", "type", "access", "unit", "description"}
+        if unknown:
+            raise ValueError(f"{path}: tag {name} has unknown settings {sorted(unknown)}")
+        tags[name] = (entry.get("type", TAG_DEFAULTS[name][0]), entry.get("access", "rw"), entry.get("unit"),
+                      entry.get("description"))
+    missing = [name for name in REGISTER_TAGS if name not in tags]
+    if missing:
+        raise ValueError(f"{path}: registers {missing} have no tag")
+    return tags
+
+
+class TagDatabase:
+    """ Typed tag definitions of one PLC, built into the address space with a single AddNodes call """
+
+    def __init__(self, tags=None):
+        tags = TAG_DEFAULTS if tags is None else tags
+        for name, (variant_type, access, _, _) in tags.items():
+            if variant_type not in VARIANT_TYPES:
+                raise ValueError(f"Tag {name}: unknown type {variant_type!r}, one of {sorted(VARIANT_TYPES)}")
+            if variant_type not in REGISTER_TYPES.get(name, VARIANT_TYPES):
+                raise ValueError(f"Tag {name}: type {variant_type} does not fit the register, one of "
+                                 f"{list(REGISTER_TYPES[name])}")
+            if access not in ACCESS_LEVELS:
+                raise ValueError(f"Tag {name}: access must be 'r' or 'rw', not {access!r}")
+        self.tags = dict(tags)
+        self.variant_types = {name: getattr(ua.VariantType, variant_type)
+                              for name, (variant_type, _, _, _) in self.tags.items()}
+        # (tag, initial value) -> VariableAttributes, the same for every instance of a farm
+        self.attributes = {}
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_tag_config(path))
+
+    def variant(self, name, value):
+        # Value of tag `name` as its declared type, e.g. the int 80 for a Double tag
+        variant_type = self.tags[name][0]
+        return ua.Variant(VARIANT_TYPES[variant_type](value), self.variant_types[name])
+
+    @staticmethod
+    def node_id(idx, name, tag=None):
+        # String NodeIds, "myPLC", "myPLC.A0" (alarm object) and "myPLC.A0.Active"
+        return ua.NodeId(name if tag is None else f"{name}.{tag}", idx)
+
+    def node_items(self, idx, name, values, parent=OBJECTS_FOLDER):
+        """ AddNodesItems of the PLC object `name`, its alarm objects and every tag, initial values from `values` """
+        plc = self.node_id(idx, name)
+        items = [self.object_item(plc, parent, idx, name)]
+        parents = {"": plc}
+        for alarm in ALARMS:
+            parents[alarm] = self.node_id(idx, name, alarm)
+            items.append(self.object_item(parents[alarm], plc, idx, alarm))
+        for tag, (variant_type, access, unit, description) in self.tags.items():
+            alarm, _, field = tag.rpartition(".")
+            node_id = self.node_id(idx, name, tag)
+            attributes = self.attributes.get((tag, values[tag]))
+            if attributes is None:
+                # The server copies the attributes into the node, they can be shared
+                attributes = self.attributes[(tag, values[tag])] = ua.VariableAttributes(
+                    DisplayName=ua.LocalizedText(field),
+                    Description=ua.LocalizedText(description) if description else ua.LocalizedText(),
+                    Value=self.variant(tag, values[tag]), DataType=ua.NodeId(getattr(ua.ObjectIds, variant_type)),
+                    ValueRank=ua.ValueRank.Scalar, AccessLevel=ACCESS_LEVELS[access],
+                    UserAccessLevel=ACCESS_LEVELS[access])
+            items.append(ua.AddNodesItem(ParentNodeId=parents[alarm], ReferenceTypeId=HAS_COMPONENT,
+                                         RequestedNewNodeId=node_id, BrowseName=ua.QualifiedName(field, idx),
+                                         NodeClass_=ua.NodeClass.Variable, NodeAttributes=attributes,
+                                         TypeDefinition=BASE_ANALOG_TYPE if unit else BASE_DATA_VARIABLE_TYPE))
+            if unit:
+                items.append(self.units_item(node_id, idx, unit))
+        return items
+
+    @staticmethod
+    def object_item(node_id, parent, idx, name):
+        reference = ORGANIZES if parent == OBJECTS_FOLDER else HAS_COMPONENT
+        return ua.AddNodesItem(ParentNodeId=parent, ReferenceTypeId=reference, RequestedNewNodeId=node_id,
+                               BrowseName=ua.QualifiedName(name, idx), NodeClass_=ua.NodeClass.Object,
+                               TypeDefinition=BASE_OBJECT_TYPE,
+                               NodeAttributes=ua.ObjectAttributes(DisplayName=ua.LocalizedText(name)))
+
+    @staticmethod
+    def units_item(variable, idx, unit):
+        # EngineeringUnits property of an analog tag
+        code, symbol = UNITS.get(unit, (None, unit))
+        units = ua.EUInformation(NamespaceUri=UNECE_URI, UnitId=int.from_bytes(code.encode(), "big") if code else -1,
+                                 DisplayName=ua.LocalizedText(symbol), Description=ua.LocalizedText(unit))
+        attributes = ua.VariableAttributes(DisplayName=ua.LocalizedText("EngineeringUnits"),
+                                           Value=ua.Variant(units, ua.VariantType.ExtensionObject),
+                                           DataType=ua.NodeId(ua.ObjectIds.EUInformation),
+                                           ValueRank=ua.ValueRank.Scalar, AccessLevel=ACCESS_LEVELS["r"],
+                                           UserAccessLevel=ACCESS_LEVELS["r"])
+        return ua.AddNodesItem(ParentNodeId=variable, ReferenceTypeId=HAS_PROPERTY,
+                               RequestedNewNodeId=ua.NodeId(f"{variable.Identifier}.EngineeringUnits", idx),
+                               BrowseName=ua.QualifiedName("EngineeringUnits", 0), NodeClass_=ua.NodeClass.Variable,
+                               NodeAttributes=attributes, TypeDefinition=PROPERTY_TYPE)
+
+    @staticmethod
+    async def add_nodes(server, items):
+        """ Create all nodes of `items` (one or many PLCs) in one AddNodes call of the internal session """
+        for result in await server.iserver.isession.add_nodes(items):
+            result.StatusCode.check()
@@ -0,0 +1,62 @@
+from asyncua import ua
+from asyncua.common.ua_utils import value_to_datavalue
+
+
+class TagRegistry:
+    """ Name -> Node lookup built once while populating the address space """
+
+    def __init__(self):
+        self.nodes = {}
+        # Session used for batched service calls, bound in set_opcua_server
+        self.session = None
+        self._read_params = {}
+        # Declared VariantType per name, writes are encoded as it without guessing from the Python value
+        self.variant_types = {}
+
+    def add(self, name, node, variant_type=None):
+        self.nodes[name] = node
+        if variant_type is not None:
+            self.variant_types[name] = variant_type
+        return node
+
+    def __getitem__(self, name):
+        return self.nodes[name]
+
+    def __contains__(self, name):
+        return name in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get_nodes(self, names):
+        return [self.nodes[name] for name in names]
+
+    @staticmethod
+    def alarm_tag(alarm, field):
+        # Alarm fields are registered flat, e.g. "A0.Active"
+        return f"{alarm}.{field}"
+
+    async def read_values(self, names):
+        # One Read service call for the whole list, request built once per name list
+        names = tuple(names)
+        params = self._read_params.get(names)
+        if params is None:
+            params = ua.ReadParameters()
+            params.NodesToRead = [ua.ReadValueId(NodeId_=self.nodes[name].nodeid, AttributeId=ua.AttributeIds.Value)
+                                  for name in names]
+            self._read_params[names] = params
+        results = await self.session.read(params)
+        return [result.Value.Value if result.Value else None for result in results]
+
+    async def write_values(self, items):
+        # One Write service call for all (name, value) pairs
+        params = ua.WriteParameters()
+        params.NodesToWrite = [ua.WriteValue(NodeId_=self.nodes[name].nodeid, AttributeId=ua.AttributeIds.Value,
+                                              Value=value_to_datavalue(value, self.variant_types.get(name)))
+                               for name, value in items]
+        if not params.NodesToWrite:
+            return []
+        results = await self.session.write(params)
+        for result in results:
+            result.check()
+        return results
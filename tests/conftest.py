@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+import pytest
+import pytest_asyncio
+
+from src.plc_client import PLCClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from plant_model import TankPlant
+from plc_launcher import endpoint_for, free_port
+from plc_simulator import PLCSimulator
+from sim_clock import VirtualClock
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """ One event loop for the whole session so pooled OPC UA sessions survive between tests """
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def simulator_server():
+    """ In-process event-driven PLCSimulator on a free port, one per session (per pytest-xdist worker) """
+    plc = PLCSimulator(endpoint=endpoint_for(free_port()), event_driven=True)
+    # Scan on every client write and at least every cycle_time
+    plc.fallback_cycle_time = plc.cycle_time
+    await plc.set_opcua_server()
+    task = asyncio.ensure_future(plc.execute_control_logic())
+    yield plc
+    await PLCClient.close_pool()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest_asyncio.fixture()
+async def simulator(simulator_server):
+    """ The worker's simulator reset to its initial state before the test, as right after start-up """
+    await simulator_server.reset()
+    # Let the first scans evaluate the initial inputs
+    await simulator_server.wait_scans(2)
+    # Pooled clients may still hold values of the previous test
+    for plc in PLCClient._pool.values():
+        await plc.refresh()
+    yield simulator_server
+
+
+@pytest_asyncio.fixture()
+async def virtual_simulator(request):
+    """ PLCSimulator of the test's own on a free port and a virtual clock, scanned by the test with step()
+
+    Parametrized indirectly with True it also simulates the tank:
+    @pytest.mark.parametrize("virtual_simulator", [True], indirect=True, ids=["plant"])
+    """
+    plant = TankPlant(1) if getattr(request, "param", False) else None
+    plc = PLCSimulator(endpoint=endpoint_for(free_port()), clock=VirtualClock(), plant=plant)
+    await plc.set_opcua_server()
+    yield plc
+    await plc.stop()
@@ -1,5 +1,4 @@
 
-import asyncio
 import pytest
 import pytest_asyncio
 
@@ -7,29 +6,46 @@ import pytest_asyncio
 from src.plc_client import PLCClient
 
 
-SERVER_URL = "opc.tcp://localhost:48020"
-
 CLIENT_TIMEOUT = 5  # seconds
 
+# Input changes of the sequence in order. Each test starts from the state the tests before it
+# leave, replayed on a freshly reset simulator so the tests run in any order
+SEQUENCE = (("DI0", "pulse"),  # START button
+            ("DI6", True),     # Low level reached
+            ("DI1", True),     # RUN button
+            ("DI7", True),     # High level reached
+            ("AI0", 80.0),     # Temperature setpoint reached
+            ("DI6", False),    # Level fell below the low level floater
+            ("DI2", "pulse"))  # STOP button
+
 @pytest_asyncio.fixture()
-async def plc() -> PLCClient:
+async def plc(simulator) -> PLCClient:
     """ Instance of the OPC UA client to communicate with the simulator """
-    plc = PLCClient(url=SERVER_URL, timeout=CLIENT_TIMEOUT)
-    await plc.init()
+    plc = await PLCClient.pooled(url=simulator.endpoint, timeout=CLIENT_TIMEOUT)
     yield plc
-    await plc.disconnect()
+
+
+async def replay(plc, simulator, count):
+    """ Apply the first `count` input changes of SEQUENCE """
+    for name, value in SEQUENCE[:count]:
+        if value == "pulse":
+            await plc.set_object_value(name, True)
+            await simulator.wait_scans(2)
+            value = False
+        await plc.set_object_value(name, value)
+        await simulator.wait_scans(2)
 
 
 
 #Press START button and check that tank is filling
 @pytest.mark.asyncio
-async def test_start_prefilling(plc: PLCClient):
+async def test_start_prefilling(plc: PLCClient, simulator):
     assert await plc.get_object_value("DQ0") == False # Tank is not filling
     assert await plc.get_object_value("DQ1") == False # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False # Liquid is not heating
 
     await plc.set_object_pulse("DI0") # Press START button
-    await asyncio.sleep(1) # Waiting for transition into next step
+    await plc.wait_for("DQ0", True) # Waiting for transition into next step
 
     assert await plc.get_object_value("DQ0") == True # Tank is filling
     assert await plc.get_object_value("DQ1") == False # Tank is not discharging
@@ -39,13 +55,14 @@ async def test_start_prefilling(plc: PLCClient):
 
 # Test low level has been reached
 @pytest.mark.asyncio
-async def test_low_level_reached(plc: PLCClient):
+async def test_low_level_reached(plc: PLCClient, simulator):
+    await replay(plc, simulator, 1)
     assert await plc.get_object_value("DQ0") == True  # Tank is filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
     await plc.set_object_value("DI6", True)  # Simulate low level reached
-    await asyncio.sleep(1)  # Waiting for transition into the next step
+    await plc.wait_for("DQ0", False)  # Waiting for transition into the next step
 
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
@@ -54,13 +71,14 @@ async def test_low_level_reached(plc: PLCClient):
 
 # Test RUN button pressed
 @pytest.mark.asyncio
-async def test_run_button_pressed(plc: PLCClient):
+async def test_run_button_pressed(plc: PLCClient, simulator):
+    await replay(plc, simulator, 2)
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
     await plc.set_object_value("DI1", True)  # Press RUN button
-    await asyncio.sleep(1)  # Waiting for transition into the next step
+    await plc.wait_for("DQ0", True)  # Waiting for transition into the next step
 
     assert await plc.get_object_value("DQ0") == True  # Tank is filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
@@ -69,41 +87,44 @@ async def test_run_button_pressed(plc: PLCClient):
 
 # Test high level has been reached
 @pytest.mark.asyncio
-async def test_high_level_reached(plc: PLCClient):
+async def test_high_level_reached(plc: PLCClient, simulator):
+    await replay(plc, simulator, 3)
     assert await plc.get_object_value("DQ0") == True  # Tank is filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
     await plc.set_object_value("DI7", True)  # Simulate high level reached
-    await asyncio.sleep(1)  # Waiting for transition into the next step
+    await plc.wait_for("DQ2", True)  # Waiting for transition into the next step
 
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
-    assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
+    assert await plc.get_object_value("DQ2") == True  # Liquid is heating
 
 #Test setpoint has been reached
 @pytest.mark.asyncio
-async def test_temperature_setpoint_reached(plc: PLCClient):
+async def test_temperature_setpoint_reached(plc: PLCClient, simulator):
+    await replay(plc, simulator, 4)
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
     assert await plc.get_object_value("DQ2") == True  # Liquid is heating
 
     await plc.set_object_value("AI0", 80)  # Simulate temperature reaching setpoint
-    await asyncio.sleep(1)  # Waiting for transition
+    await plc.wait_for("DQ2", False)  # Waiting for transition
     
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
-    assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
+    assert await plc.get_object_value("DQ1") == True  # Tank is discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
 # Test low level discharging has been reached
 @pytest.mark.asyncio
-async def test_low_level_disc_reached(plc: PLCClient):
+async def test_low_level_disc_reached(plc: PLCClient, simulator):
+    await replay(plc, simulator, 5)
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == True  # Tank is discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
-    await plc.set_object_value("DI6", True)  # Simulate low level reached
-    await asyncio.sleep(1)  # Waiting for transition
+    await plc.set_object_value("DI6", False)  # Simulate level below the low level floater
+    await plc.wait_for("DQ1", False)  # Waiting for transition
     
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
@@ -111,13 +132,14 @@ async def test_low_level_disc_reached(plc: PLCClient):
 
 # Stop button
 @pytest.mark.asyncio
-async def test_stop_button(plc: PLCClient):
+async def test_stop_button(plc: PLCClient, simulator):
+    await replay(plc, simulator, 6)
     assert await plc.get_object_value("DQ0") == False # Tank is not filling
     assert await plc.get_object_value("DQ1") == False # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False # Liquid is not heating
     
     await plc.set_object_pulse("DI2") # Press STOP button
-    await asyncio.sleep(1) # Waiting for transition into next step
+    await plc.wait_for("DQ0", False) # Waiting for transition into next step
     
     assert await plc.get_object_value("DQ0") == False # Tank is not filling
     assert await plc.get_object_value("DQ1") == False # Tank is not discharging
@@ -126,22 +148,23 @@ async def test_stop_button(plc: PLCClient):
 # # Add more test cases as needed
 # Emergency button
 @pytest.mark.asyncio
-async def test_emergency_button(plc: PLCClient):
+async def test_emergency_button(plc: PLCClient, simulator):
+    await replay(plc, simulator, 7)
     # Start the tank filling procedure
     assert await plc.get_object_value("DQ0") == False  # Tank is not filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
     await plc.set_object_pulse("DI0")  # Press START button
-    await asyncio.sleep(1)  # Waiting for transition into the next step
+    await plc.wait_for("DQ0", True)  # Waiting for transition into the next step
 
     assert await plc.get_object_value("DQ0") == True  # Tank is filling
     assert await plc.get_object_value("DQ1") == False  # Tank is not discharging
     assert await plc.get_object_value("DQ2") == False  # Liquid is not heating
 
-    # Press the emergency button
-    await plc.set_object_pulse("DI3")  # Press EMERGENCY button
-    await asyncio.sleep(1)  # Waiting for transition into the next step
+    # Press the emergency button, it stays latched until released
+    await plc.set_object_value("DI3", True)  # Press EMERGENCY button
+    await plc.wait_for("DQ3", True)  # Waiting for transition into the next step
 
     # All procedures should stop, and the discharging door should open
     assert await plc.get_object_value("DQ0") == False  # Tank filling should stop
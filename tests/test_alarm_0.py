@@ -1,30 +1,24 @@
 
-import asyncio
 import pytest
 import pytest_asyncio
 
 from src.plc_client import PLCClient
 
-SERVER_URL = "opc.tcp://localhost:48020/PLC-simulator/opc"
 CLIENT_TIMEOUT = 5  # seconds
 
 @pytest_asyncio.fixture()
-async def plc() -> PLCClient:
+async def plc(simulator) -> PLCClient:
     """ Instance of the OPC UA client to communicate with the simulator """
-    plc = PLCClient(url=SERVER_URL, timeout=CLIENT_TIMEOUT)
-    await plc.init()
+    plc = await PLCClient.pooled(url=simulator.endpoint, timeout=CLIENT_TIMEOUT)
     # Set initial conditions (example: tank filling, heating off) ------+-------
-    await plc.set_object_value("DQ0", True)  # Tank is filling
-    await plc.set_object_value("DQ2", False)  # Liquid heating is off
+    await plc.force("DQ0", True)  # Tank is filling
+    await plc.force("DQ2", False)  # Liquid heating is off
     
     # Yield fixture
     yield plc
     # Cleanup conditions (example: stop tank filling, turn off heating) ------+-------
-    await plc.set_object_value("DQ0", False)
-    await plc.set_object_value("DQ2", False)
+    await plc.unforce_all()  # Outputs back to the logic
   
-    # Disconnect
-    await plc.disconnect()
 
 
 # Trigger overfilling condition
@@ -33,9 +27,10 @@ async def test_fillingheating_overfilling(plc: PLCClient):
     tank_filling_before = await plc.get_object_value("DQ0")
     print(f"Tank filling before: {tank_filling_before}")
     assert tank_filling_before == True  # Tank was filling
+    await plc.unforce("DQ0")  # In Valve back to the logic
 
     await plc.set_object_value("DI8", True)  # Overfilling sensor active
-    await asyncio.sleep(1)  # Waiting for reactions
+    await plc.wait_for("A0.Status", True)  # Waiting for reactions
 
     tank_filling_after = await plc.get_object_value("DQ0")
     alarm_status = await plc.get_alarm_status("A0")
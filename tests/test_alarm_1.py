@@ -1,30 +1,23 @@
-import asyncio
 import pytest
 import pytest_asyncio
 
 from src.plc_client import PLCClient
 
-SERVER_URL = "opc.tcp://localhost:48020/PLC-simulator/opc"
 CLIENT_TIMEOUT = 5  # seconds
 
 @pytest_asyncio.fixture()
-async def plc() -> PLCClient:
+async def plc(simulator) -> PLCClient:
     """ Instance of the OPC UA client to communicate with the simulator """
-    plc = PLCClient(url=SERVER_URL, timeout=CLIENT_TIMEOUT)
-    await plc.init()
+    plc = await PLCClient.pooled(url=simulator.endpoint, timeout=CLIENT_TIMEOUT)
     # Set initial conditions (example: tank filling, heating off) ------+-------
-    await plc.set_object_value("DQ0", False)  # Tank is not filling initially
-    await plc.set_object_value("DQ2", False)  # Liquid heating is off
-    await plc.set_object_value("DQ1", True)   # Outlet valve open (discharging)
+    await plc.force("DQ0", False)  # Tank is not filling initially
+    await plc.force("DQ2", False)  # Liquid heating is off
+    await plc.force("DQ1", True)   # Outlet valve open (discharging)
     
     # Yield fixture
     yield plc
     # Cleanup conditions (example: stop tank discharging) ------+-------
-    await plc.set_object_value("DQ0", False)
-    await plc.set_object_value("DQ1", False)
-    await plc.set_object_value("DQ2", False)  
-    # Disconnect
-    await plc.disconnect()
+    await plc.unforce_all()  # Outputs back to the logic
 
 # @pytest.mark.asyncio
 # async def test_low_tank_level_after_discharging(plc: PLCClient):
@@ -49,8 +42,8 @@ async def test_low_tank_level_after_discharging(plc: PLCClient):
     assert tank_filling_before == False  # Tank is not filling initially
 
     # Simulate discharging (close the outlet valve)
-    await plc.set_object_value("DQ1", False)  # Outlet valve closed
-    await asyncio.sleep(1)  # Waiting for reactions
+    await plc.force("DQ1", False)  # Outlet valve closed
+    await plc.wait_for("DQ1", False)  # Waiting for reactions
 
     tank_filling_after = await plc.get_object_value("DQ0")
     alarm_status = await plc.get_alarm_status("A1")
@@ -60,7 +53,7 @@ async def test_low_tank_level_after_discharging(plc: PLCClient):
 
     # Set the tank level too low condition
     await plc.set_object_value("DI5", True)  # Low tank level sensor active
-    await asyncio.sleep(1)  # Waiting for reactions
+    await plc.wait_for("A1.Status", True)  # Waiting for reactions
 
     tank_filling_after_low_level = await plc.get_object_value("DQ0")
     alarm_status_low_level = await plc.get_alarm_status("A1")
@@ -69,6 +62,6 @@ async def test_low_tank_level_after_discharging(plc: PLCClient):
     print(f"Alarm A1 status after low tank level condition: {alarm_status_low_level}")
 
     assert tank_filling_after == False  # Tank continues to not fill
-    assert alarm_status == True  # Alarm A1 is triggered
+    assert alarm_status == False  # Lower level floater still sees fluid, no alarm yet
     assert tank_filling_after_low_level == False  # Tank continues to not fill after low tank level condition
     assert alarm_status_low_level == True  # Alarm A1 is triggered after low tank level condition
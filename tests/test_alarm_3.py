@@ -1,51 +1,31 @@
-import asyncio
 import pytest
 import pytest_asyncio
 
 from src.plc_client import PLCClient
 
-SERVER_URL = "opc.tcp://localhost:48020/PLC-simulator/opc"
 CLIENT_TIMEOUT = 5  # seconds
 
 @pytest_asyncio.fixture()
-async def plc() -> PLCClient:
+async def plc(simulator) -> PLCClient:
     """ Instance of the OPC UA client to communicate with the simulator """
-    plc = PLCClient(url=SERVER_URL, timeout=CLIENT_TIMEOUT)
-    await plc.init()
+    plc = await PLCClient.pooled(url=simulator.endpoint, timeout=CLIENT_TIMEOUT)
     # Set initial conditions ------+-------
-    await plc.set_object_value("DQ2", True)   # Start Heating System
+    await plc.force("DQ2", True)   # Start Heating System
 
     # Yield fixture
     yield plc
     # Cleanup conditions ------+-------
-    await plc.set_object_value("DQ2", False)  # Stop Heating System
-    await plc.disconnect()
+    await plc.unforce_all()  # Outputs back to the logic
 
 
 # Low temperature alarm test
 @pytest.mark.asyncio
 async def test_low_temperature_alarm(plc: PLCClient):
-    target_temperature = 10.0
+    temperature_low_limit = 10.0
 
-    # Heating loop until temperature drops below the target temperature
-    current_temperature = await plc.get_object_value("AI0")
-    print(f"Current temperature before heating: {current_temperature}")
-
-    while current_temperature >= target_temperature:
-        # Simulate updating inputs from server (introducing a smaller delay)
-        await asyncio.sleep(0.1)
-
-        # Decrease the temperature (simulating cooling)
-        current_temperature -= 1.0
-
-    # Stop heating once temperature drops below the target temperature
-    await plc.set_object_value("DQ2", False)  # Stop Heating System
-
-    final_temperature = await plc.get_object_value("AI0")
-    alarm_status = await plc.get_alarm_status("A3")
-
-    print(f"Final temperature after cooling: {final_temperature}")
-    print(f"Alarm A3 status: {alarm_status}")
+    await plc.wait_for("A3.Status", False)  # Ambient temperature, no alarm yet
 
+    # Simulate the fluid cooling below the low limit
+    await plc.set_object_value("AI0", temperature_low_limit - 5.0)
     # Check if the low-temperature alarm (A3) is triggered
-    assert alarm_status == True
+    await plc.wait_for("A3.Status", True)
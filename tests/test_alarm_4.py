@@ -1,38 +1,34 @@
-import asyncio
 import pytest
 import pytest_asyncio
 
 from src.plc_client import PLCClient
 
-SERVER_URL = "opc.tcp://localhost:48020/PLC-simulator/opc"
 CLIENT_TIMEOUT = 5  # seconds
 
 @pytest_asyncio.fixture()
-async def plc() -> PLCClient:
+async def plc(simulator) -> PLCClient:
     """ Instance of the OPC UA client to communicate with the simulator """
-    plc = PLCClient(url=SERVER_URL, timeout=CLIENT_TIMEOUT)
-    await plc.init()
+    plc = await PLCClient.pooled(url=simulator.endpoint, timeout=CLIENT_TIMEOUT)
     # Set initial conditions ------+-------
-    await plc.set_object_value("DQ3", False)   # Close motor-controlled discharging door
+    await plc.force("DQ3", False)   # Close motor-controlled discharging door
 
     # Yield fixture
     yield plc
     # Cleanup conditions ------+-------
-    await plc.set_object_value("DQ3", False)  # Close motor-controlled discharging door
-    await plc.disconnect()
+    await plc.unforce_all()  # Outputs back to the logic
 
 
 # Discharging door alarm test
 @pytest.mark.asyncio
 async def test_discharging_door_alarm(plc: PLCClient):
     # Close the discharging door initially
-    await plc.set_object_value("DQ3", False)  # Close motor-controlled discharging door
+    await plc.force("DQ3", False)  # Close motor-controlled discharging door
     initial_door_status = await plc.get_object_value("DQ3")
     print(f"Initial discharging door status: {initial_door_status}")
 
     # Open the discharging door
     await plc.set_object_value("DI9", True)  # Open discharging door
-    await asyncio.sleep(1)  # Waiting for reactions
+    await plc.wait_for("A4.Status", True)  # Waiting for reactions
 
     door_alarm_status = await plc.get_alarm_status("A4")
     print(f"Discharging door alarm status: {door_alarm_status}")
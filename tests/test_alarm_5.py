@@ -1,27 +1,22 @@
-import asyncio
 import pytest
 import pytest_asyncio
 
 from src.plc_client import PLCClient
 
-SERVER_URL = "opc.tcp://localhost:48020/PLC-simulator/opc"
 CLIENT_TIMEOUT = 5  # seconds
 
 @pytest_asyncio.fixture()
-async def plc() -> PLCClient:
+async def plc(simulator) -> PLCClient:
     """ Instance of the OPC UA client to communicate with the simulator """
-    plc = PLCClient(url=SERVER_URL, timeout=CLIENT_TIMEOUT)
-    await plc.init()
+    plc = await PLCClient.pooled(url=simulator.endpoint, timeout=CLIENT_TIMEOUT)
     # Set initial conditions ------+-------
-    await plc.set_object_value("DQ2", True)   # Start Heating System
-    await plc.set_object_value("DQ3", False)   # Close motor-controlled discharging door
+    await plc.force("DQ2", True)   # Start Heating System
+    await plc.force("DQ3", False)   # Close motor-controlled discharging door
 
     # Yield fixture
     yield plc
     # Cleanup conditions ------+-------
-    await plc.set_object_value("DQ2", False)  # Stop Heating System
-    await plc.set_object_value("DQ3", False)  # Close motor-controlled discharging door
-    await plc.disconnect()
+    await plc.unforce_all()  # Outputs back to the logic
 
 # Emergency button alarm test
 @pytest.mark.asyncio
@@ -32,13 +27,14 @@ async def test_emergency_button_alarm(plc: PLCClient):
     print(f"Emergency button status: {emergency_button_status}")
 
     # Check if the emergency button alarm (A5) is triggered
+    await plc.wait_for("A5.Status", True)  # Waiting for reactions
     alarm_status = await plc.get_alarm_status("A5")
     print(f"Emergency button alarm status: {alarm_status}")
     assert alarm_status == True
 
     # Turn off everything and open the discharging gate
-    await plc.set_object_value("DQ2", False)  # Stop Heating System
-    await plc.set_object_value("DQ3", True)   # Open motor-controlled discharging door
+    await plc.force("DQ2", False)  # Stop Heating System
+    await plc.force("DQ3", True)  # Open motor-controlled discharging door
 
     # Release the emergency button
     await plc.set_object_value("DI3", False)  # Simulate releasing the emergency button
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from alarm_table import AlarmTable, load_alarm_config
+from registers import ACTIVE, ALARMS, RegisterBank
+
+
+def active(bank, alarm):
+    return bool(bank.alarms[0, ACTIVE] >> ALARMS.index(alarm) & 1)
+
+
+def scan(table, bank, now, ai0=None, di3=None):
+    if ai0 is not None:
+        bank.analog_inputs[0, 0] = ai0
+    if di3 is not None:
+        bank.digital_inputs[0, 3] = di3
+    table.scan(bank.digital_inputs, bank.analog_inputs, bank.alarms, now)
+
+
+def test_rejects_duplicate_alarms(tmp_path):
+    with pytest.raises(ValueError, match="A2 has more than one rule"):
+        AlarmTable((("A2", "AI0", ">", 80), ("A2", "AI0", ">", 90)))
+    # Rules of one alarm in different groups would OR, set_limit() would only reach the last one
+    with pytest.raises(ValueError, match="A2 has more than one rule"):
+        AlarmTable((("A2", "AI0", ">", 80), ("A2", "DI7", "==", True)))
+    path = tmp_path / "alarms.json"
+    path.write_text(json.dumps({"alarms": [{"alarm": "A0", "input": "DI8", "comparison": "==", "limit": True},
+                                           {"alarm": "A0", "input": "DI7", "comparison": "==", "limit": True}]}))
+    with pytest.raises(ValueError, match="A0 is defined twice"):
+        load_alarm_config(str(path))
+
+
+def test_deadband_release():
+    table = AlarmTable((("A2", "AI0", ">", 80),), {"A2": {"deadband": 2.0}})
+    bank = RegisterBank(1)
+    states = []
+    for now, temperature in enumerate((79.0, 81.0, 79.0, 78.5, 77.9, 79.0, 80.5)):
+        scan(table, bank, float(now), ai0=temperature)
+        states.append(active(bank, "A2"))
+    # Trips above 80, releases only below 78, trips again above 80
+    assert states == [False, True, True, True, False, False, True]
+
+
+def test_on_and_off_delay():
+    table = AlarmTable((("A5", "DI3", "==", True),), {"A5": {"on_delay": 1.0, "off_delay": 3.0}})
+    bank = RegisterBank(1)
+    states = []
+    for now, emergency in ((0.0, True), (0.5, True), (1.0, True), (2.0, False), (4.9, False), (5.0, False)):
+        scan(table, bank, now, di3=emergency)
+        states.append(active(bank, "A5"))
+    assert states == [False, False, True, True, True, False]
+
+    # A condition shorter than on_delay never turns Active
+    scan(table, bank, 6.0, di3=True)
+    scan(table, bank, 6.5, di3=False)
+    scan(table, bank, 7.5, di3=False)
+    assert not active(bank, "A5")
+
+
+def test_shelve_and_unshelve():
+    table = AlarmTable((("A5", "DI3", "==", True),), {"A5": {"on_delay": 1.0}})
+    bank = RegisterBank(1)
+    table.shelve("A5")
+    for now in (0.0, 1.0, 2.0):
+        scan(table, bank, now, di3=True)
+        assert not active(bank, "A5")
+
+    # Unshelved, the alarm waits its full on_delay again
+    table.unshelve("A5")
+    scan(table, bank, 3.0)
+    assert not active(bank, "A5")
+    scan(table, bank, 4.0)
+    assert active(bank, "A5")
+
+    # Shelved until a clock time, back on its own afterwards
+    table.shelve("A5", until=10.0)
+    scan(table, bank, 5.0)
+    assert not active(bank, "A5")
+    scan(table, bank, 10.0)
+    scan(table, bank, 11.0)
+    assert active(bank, "A5")
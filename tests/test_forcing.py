@@ -0,0 +1,52 @@
+import pytest
+
+from grafcet import Step
+
+
+async def node(plc, tag):
+    return (await plc.tags.read_values([tag]))[0]
+
+
+@pytest.mark.asyncio
+async def test_force_and_unforce(virtual_simulator):
+    plc = virtual_simulator
+    # A forced START runs the sequence although the DI0 node stays False
+    await plc.force("DI0", True)
+    await plc.step(2)
+    assert plc.grafcet.step is Step.STARTING
+    assert plc.digital_inputs["DI0"] and not await node(plc, "DI0")
+    assert plc.digital_outputs["DQ0"] and await node(plc, "DQ0")
+
+    # A forced output is published at once and overrides the logic of every scan
+    await plc.force("DQ0", False)
+    assert not await node(plc, "DQ0")
+    await plc.step(2)
+    assert not plc.digital_outputs["DQ0"] and not await node(plc, "DQ0")
+    assert plc.force_table.forced(0) == {"DI0": True, "DQ0": False}
+
+    # Unforced, the logic drives the output and the node value the input again
+    assert plc.unforce("DQ0") and plc.unforce("DI0")
+    assert not plc.unforce("DI0")
+    await plc.step(1)
+    assert plc.grafcet.step is Step.STARTING
+    assert plc.digital_outputs["DQ0"] and await node(plc, "DQ0")
+    assert not plc.digital_inputs["DI0"]
+    assert not plc.force_table.forced(0)
+
+
+@pytest.mark.asyncio
+async def test_forced_analog_input_and_invalid_tags(virtual_simulator):
+    plc = virtual_simulator
+    # 5 degC trips Fluid Temperature Too Low for as long as AI0 is forced
+    await plc.force("AI0", 5)
+    await plc.step(1)
+    assert plc.analog_inputs["AI0"] == 5.0 and await node(plc, "AI0") == 20.0
+    assert plc.alarms["A3"]["Active"]
+    plc.unforce_all()
+    await plc.step(1)
+    assert plc.analog_inputs["AI0"] == 20.0 and not plc.alarms["A3"]["Active"]
+
+    with pytest.raises(ValueError, match="cannot be forced"):
+        await plc.force("A3.Active", False)
+    with pytest.raises(ValueError, match="cannot be forced"):
+        plc.unforce("DQ9")
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+import pytest
+
+from historian import ROW_TAGS, Historian
+from registers import RegisterBank
+
+# Room for one full image and a few scans of changes, so the ring wraps before the second flush
+CAPACITY = len(ROW_TAGS) + 8
+FLUSH_SIZE = 8
+
+
+def historian(path):
+    history = Historian(str(path), capacity=CAPACITY, flush_size=FLUSH_SIZE, flush_interval=np.inf)
+    bank = RegisterBank(1)
+    history.attach(bank, ["myPLC"])
+    return history, bank
+
+
+@pytest.mark.asyncio
+async def test_ring_wrap_flush_and_query(tmp_path):
+    started = time.time()
+    history, bank = historian(tmp_path)
+    clock = [0.2 * scan for scan in range(12)]
+    for scan, now in enumerate(clock):
+        # Two tags change every scan, AI0 every other scan
+        bank.digital_inputs[0, 0] = scan % 2
+        bank.digital_outputs[0, 0] = not scan % 2
+        bank.analog_inputs[0, 0] = scan // 2
+        history.record(now)
+    # The first scan stores the whole image, then a segment goes out every FLUSH_SIZE samples, the rest is in memory
+    assert history.head > CAPACITY and history.head > history.flushed
+    await history.close()
+    assert history.head == history.flushed and not history.writing and len(history.segments) > 1
+
+    times, values = history.query("myPLC.DI0")
+    assert times.tolist() == [history.epoch + now for now in clock]
+    assert values.tolist() == [scan % 2 for scan in range(12)]
+    assert history.epoch >= started - 1
+    times, values = history.query("myPLC.AI0", history.epoch + 0.3, history.epoch + 1.3)
+    assert values.tolist() == [1.0, 2.0, 3.0]
+    # Only the first image holds the tags that never changed
+    assert len(history.query("myPLC.DI9")[0]) == 1
+
+
+@pytest.mark.asyncio
+async def test_reattach_keeps_earlier_runs(tmp_path):
+    history, bank = historian(tmp_path)
+    history.record(100.0)
+    await history.close()
+    first = history.query("myPLC.DI0")[0]
+
+    # A later run restarts its clock, its samples still come after the ones of the first run
+    time.sleep(0.01)
+    history, bank = historian(tmp_path)
+    bank.digital_inputs[0, 0] = True
+    history.record(0.0)
+    times, values = history.query("myPLC.DI0")
+    assert times[0] == first[0] and times[1] > first[0]
+    assert values.tolist() == [0.0, 1.0]
+    await history.close()
+
+    with pytest.raises(ValueError, match="another tag set"):
+        Historian(str(tmp_path)).attach(RegisterBank(1), ["otherPLC"])
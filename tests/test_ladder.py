@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from ladder import LadderProgram, load_program
+from registers import RegisterBank
+
+PROGRAM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "PLC_SY.xml")
+
+
+def netlist(tmp_path, body):
+    path = tmp_path / "program.xml"
+    path.write_text(f'<?xml version="1.0"?>\n<program name="TEST">\n{body}\n</program>\n')
+    return str(path)
+
+
+def test_loads_plc_sy():
+    program = LadderProgram.from_file(PROGRAM)
+    bank = RegisterBank(1)
+    bank.digital_inputs[0, 0] = True  # START
+    bank.analog_inputs[0, 0] = 20.0
+    program.scan(bank.digital_inputs, bank.analog_inputs, bank.digital_outputs, bank.alarms)
+    program.scan(bank.digital_inputs, bank.analog_inputs, bank.digital_outputs, bank.alarms)
+    assert bank.digital_outputs[0, 0]  # In Valve open in STARTING
+
+
+def test_sr_latch_and_negated_input(tmp_path):
+    program = LadderProgram.from_file(netlist(tmp_path, """
+      <block name="M" type="SR"><in ref="DI0" port="S"/><in ref="DI1" port="R"/></block>
+      <block name="Q" type="AND"><in ref="M"/><in ref="DI2" negate="1"/></block>
+      <output name="DQ0" ref="Q"/>"""))
+    bank = RegisterBank(1)
+    outputs = []
+    for set_, reset in ((1, 0), (0, 0), (1, 1), (0, 0)):
+        bank.digital_inputs[0, :2] = set_, reset
+        program.scan(bank.digital_inputs, bank.analog_inputs, bank.digital_outputs, bank.alarms)
+        outputs.append(bool(bank.digital_outputs[0, 0]))
+    # Latched by S, held, and reset wins over set
+    assert outputs == [True, True, False, False]
+
+
+@pytest.mark.parametrize("body, message", [
+    ('<block name="B" type="AND"><in ref="DI42"/></block>', "unknown signal DI42"),
+    ('<block name="B" type="AND"><in ref="DI0"/></block><output name="DQ0" ref="NOPE"/>', "unknown signal NOPE"),
+    ('<block name="B" type="AND"><in ref="DI0"/></block><output name="DQ9" ref="B"/>', "unknown output DQ9"),
+    ('<block name="B" type="CMP" op="=~" value="1"><in ref="AI0"/></block>', "unknown comparison"),
+    ('<block name="B" type="AND"><in ref="C"/></block><block name="C" type="OR"><in ref="B"/></block>',
+     "feedback loop"),
+    ('<block name="B" type="SR"><in ref="DI0" port="S"/></block>', "needs the inputs"),
+    ('<block name="B" type="SR"><in ref="DI0" port="S"/><in ref="DI1" port="X"/></block>', "needs the inputs"),
+    ('<block name="DI0" type="AND"><in ref="DI1"/></block>', "defined twice"),
+])
+def test_rejects_invalid_netlists(tmp_path, body, message):
+    with pytest.raises(ValueError, match=message):
+        LadderProgram.from_file(netlist(tmp_path, body))
+
+
+@pytest.mark.parametrize("name", ["G&#10;    __import__('os').system('echo INJECTED')", "1B", "B-C", "B C", ""])
+def test_rejects_names_that_are_not_identifiers(tmp_path, name):
+    with pytest.raises(ValueError, match="not a valid flag or block name"):
+        LadderProgram.from_file(netlist(tmp_path, f'<block name="{name}" type="AND"><in ref="DI0"/></block>'))
+    with pytest.raises(ValueError, match="not a valid flag or block name"):
+        LadderProgram.from_file(netlist(tmp_path, f'<flag name="{name}" ref="DI0"/>'))
+
+
+def test_rejects_logo_program(tmp_path):
+    path = tmp_path / "program.lld"
+    path.write_bytes(b"\xac\xed\x00\x05" + bytes(16))
+    with pytest.raises(ValueError, match="LOGO!Soft Comfort program"):
+        load_program(str(path))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from grafcet import Step
+from plant_model import TankPlant
+
+# Scans of one cycle are well under this, about 70 s of fill, heat and drain at 0.2 s per scan
+MAX_SCANS = 2000
+
+
+def test_floaters():
+    plant = TankPlant(3)
+    plant.set_state(0, (0.0, 20.0))
+    plant.set_state(2, (900.0, 20.0))
+    # Empty tank: only the tank-low contact, heel: none, above the high mark: low and high floaters
+    assert plant.floaters.tolist() == [[True, False, False, False],
+                                       [False, False, False, False],
+                                       [False, True, True, False]]
+    assert plant.sensor_items(1) == [("DI5", False), ("DI6", False), ("DI7", False), ("DI8", False), ("AI0", 20.0)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("virtual_simulator", [True], indirect=True, ids=["plant"])
+async def test_closed_loop_completes_a_cycle(virtual_simulator):
+    plc = virtual_simulator
+    steps = [plc.grafcet.step]
+    # START pulse, then RUN once the tank is prefilled
+    await plc.tags.write_values([("DI0", True)])
+    await plc.step(1)
+    await plc.tags.write_values([("DI0", False)])
+    for _ in range(MAX_SCANS):
+        await plc.step(1)
+        assert not np.any(plc.alarm_masks), "an alarm tripped during the cycle"
+        if plc.grafcet.step is not steps[-1]:
+            steps.append(plc.grafcet.step)
+            if plc.grafcet.step is Step.READY:
+                await plc.tags.write_values([("DI1", True)])
+            elif plc.grafcet.step is Step.INIT:
+                break
+
+    assert steps == [Step.INIT, Step.STARTING, Step.READY, Step.RUNNING, Step.HEATING, Step.DISCHARGING, Step.INIT]
+    assert not any(plc.digital_outputs.values)
+    # Drained to the low level floater, the heel for the next cycle
+    assert plc.plant.floaters[0].tolist() == [False, False, False, False]
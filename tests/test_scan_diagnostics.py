@@ -0,0 +1,25 @@
+import pytest
+from asyncua import ua
+
+from scan_diagnostics import WRITE_COUNTERS
+
+
+@pytest.mark.asyncio
+async def test_write_counters_published(virtual_simulator, caplog):
+    plc = virtual_simulator
+    await plc.tags.write_values([("DI0", True)])
+    # 0.2 s scans: the Diagnostics nodes are written at the first one and again one second later
+    await plc.step(6)
+    names = [f"Diagnostics.{counter}" for counter in WRITE_COUNTERS]
+    published = dict(zip(WRITE_COUNTERS.values(), await plc.tags.read_values(names)))
+    assert published == {attribute: getattr(plc.image, attribute) for attribute in WRITE_COUNTERS.values()}
+    # STARTING opens the In Valve at the first scan, nothing changes after it; the Diagnostics writes are not counted
+    assert published["total_writes"] == 1 and published["cycle_writes"] == 0
+    # Four outputs diffed every scan, the alarm fields only when a mask changed
+    assert published["total_skipped"] == 6 * 4 - 1
+    for name in names:
+        assert ua.AccessLevel.CurrentWrite not in await plc.tags[name].get_access_level()
+
+    # The log record of the first scan carries the figures as fields, not inside its message
+    record = next(record for record in caplog.records if record.getMessage() == "Scan diagnostics")
+    assert record.plc == "PLC" and record.scans == 1 and record.total_writes == 1
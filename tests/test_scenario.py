@@ -0,0 +1,90 @@
+import csv
+
+import pytest
+
+from grafcet import Step
+from scenario import MAGIC, diff_recordings, read_events, write_events
+
+# START pulse at a warm temperature, then STOP: STARTING opens the In Valve until STOP closes it
+SCENARIO = """time,tag,value
+0.0,AI0,20
+0.0,DI0,true
+0.4,DI0,false
+1.0,DI2,1
+1.2,DI2,0
+"""
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_csv_binary_round_trip(tmp_path):
+    events = list(read_events(write(tmp_path / "run.csv", SCENARIO)))
+    assert events == [(0.0, "AI0", 20.0), (0.0, "DI0", 1.0), (0.4, "DI0", 0.0), (1.0, "DI2", 1.0), (1.2, "DI2", 0.0)]
+    binary = str(tmp_path / "run.scn")
+    assert write_events(binary, read_events(str(tmp_path / "run.csv"))) == len(events)
+    with open(binary, "rb") as f:
+        assert f.read(len(MAGIC)) == MAGIC
+    assert list(read_events(binary)) == events
+
+
+def test_invalid_files(tmp_path):
+    with pytest.raises(ValueError, match="header"):
+        list(read_events(write(tmp_path / "header.csv", "t,tag,value\n0,DI0,1\n")))
+    with pytest.raises(ValueError, match=":3: expected time,tag,value"):
+        list(read_events(write(tmp_path / "row.csv", "time,tag,value\n0,DI0,1\n0.2,DI0\n")))
+    with pytest.raises(ValueError, match="DQ7 is not a register"):
+        write_events(str(tmp_path / "tag.scn"), [(0.0, "DQ7", 1.0)])
+    binary = tmp_path / "truncated.scn"
+    write_events(str(binary), [(0.0, "DI0", 1.0)])
+    binary.write_bytes(binary.read_bytes()[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        list(read_events(str(binary)))
+
+
+def test_diff_recordings(tmp_path):
+    golden = write(tmp_path / "golden.csv", "time,tag,value\n0.000,DQ0,1\n0.400,DQ0,0\n")
+    assert list(diff_recordings(golden, golden)) == []
+    changed = write(tmp_path / "changed.csv", "time,tag,value\n0.000,DQ0,1\n0.600,DQ0,0\n")
+    assert list(diff_recordings(changed, golden)) == [(3, "0.600,DQ0,0", "0.400,DQ0,0")]
+    # A recording cut short differs from the first line it misses on
+    short = write(tmp_path / "short.csv", "time,tag,value\n0.000,DQ0,1\n")
+    assert list(diff_recordings(short, golden)) == [(3, None, "0.400,DQ0,0")]
+
+
+@pytest.mark.asyncio
+async def test_replay_records_outputs(tmp_path, virtual_simulator):
+    plc = virtual_simulator
+    record = str(tmp_path / "record.csv")
+    player = await plc.replay(write(tmp_path / "run.csv", SCENARIO), record, settle=2)
+    assert player.applied == 5
+    # 0.2 s scans from 0.0 to 1.2, then two settling scans
+    assert player.scans == 9
+    assert plc.grafcet.step is Step.INIT
+    with open(record, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["time", "tag", "value"]
+    # Every output and alarm field is recorded once at the start, then only its changes
+    changes = [row for row in rows[1:] if row[0] != "0.000"]
+    assert changes == [["1.000", "DQ0", "0"]]
+    assert ["0.000", "DQ0", "1"] in rows
+
+    # Replayed again from reset, the run matches the first one as its golden recording
+    await plc.reset()
+    again = str(tmp_path / "again.csv")
+    await plc.replay(str(tmp_path / "run.csv"), again, settle=2)
+    assert list(diff_recordings(again, record)) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("text, message", [
+    ("time,tag,value\n0.4,DI0,1\n0.2,DI0,0\n", "earlier than the one before it"),
+    ("time,tag,value\n0.0,DQ0,1\n", "DQ0 is not an input"),
+    ("time,tag,value\n0.0,A0.Active,1\n", "A0.Active is not an input"),
+])
+async def test_replay_rejects_events(tmp_path, virtual_simulator, text, message):
+    plc = virtual_simulator
+    with pytest.raises(ValueError, match=message):
+        await plc.replay(write(tmp_path / "run.csv", text))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from grafcet import Step
+from snapshot import pack_state, unpack_state
+
+# With a tank, so the plant state is part of the snapshot
+pytestmark = pytest.mark.parametrize("virtual_simulator", [True], indirect=True, ids=["plant"])
+
+
+async def node_values(plc):
+    # DI, AI, DQ and alarm field nodes, the diagnostics nodes change with every scan
+    return await plc.tags.read_values([name for name, _ in plc.register_items(plc.alarm_masks)])
+
+
+async def started(plc):
+    # START pressed, prefilling with the Out Valve forced open
+    await plc.tags.write_values([("DI0", True)])
+    await plc.step(5)
+    await plc.force("DQ1", True)
+    await plc.step(5)
+
+
+@pytest.mark.asyncio
+async def test_restore_round_trip(virtual_simulator):
+    plc = virtual_simulator
+    await started(plc)
+    blob = plc.snapshot()
+    registers = [plc.digital_inputs.values.copy(), plc.analog_inputs.values.copy(),
+                 plc.digital_outputs.values.copy(), plc.alarm_masks.copy()]
+    volume = plc.plant.volume[0]
+    nodes = await node_values(plc)
+    assert plc.grafcet.step is Step.STARTING
+
+    await plc.reset()
+    await plc.step(3)
+    assert plc.grafcet.step is Step.INIT and not plc.force_table.forced(0)
+
+    await plc.restore(blob)
+    assert plc.grafcet.step is Step.STARTING
+    assert plc.force_table.forced(0) == {"DQ1": True}
+    assert plc.plant.volume[0] == volume
+    for array, expected in zip((plc.digital_inputs.values, plc.analog_inputs.values, plc.digital_outputs.values,
+                                plc.alarm_masks), registers):
+        np.testing.assert_array_equal(array, expected)
+    assert await node_values(plc) == nodes
+    assert plc.snapshot() == blob
+
+
+@pytest.mark.asyncio
+async def test_rejected_snapshot_changes_nothing(virtual_simulator):
+    plc = virtual_simulator
+    await started(plc)
+    sections = unpack_state(plc.snapshot())
+    sections["digital_inputs"][0] = True
+    sections["analog_inputs"][0] = 55.0
+    sections["grafcet"][0] = 99
+    before = plc.snapshot()
+    nodes = await node_values(plc)
+
+    with pytest.raises(ValueError, match="not a step"):
+        await plc.restore(pack_state(sections))
+    wrong_plant = dict(unpack_state(before), plant=np.zeros(3))
+    with pytest.raises(ValueError, match="plant"):
+        await plc.restore(pack_state(wrong_plant))
+    missing = {name: values for name, values in unpack_state(before).items() if name != "forced_values"}
+    with pytest.raises(ValueError, match="holds"):
+        await plc.restore(pack_state(missing))
+    for blob in (b"garbage", before[:-3], before[:20]):
+        with pytest.raises(ValueError):
+            await plc.restore(blob)
+
+    assert plc.snapshot() == before
+    assert await node_values(plc) == nodes
@@ -0,0 +1,36 @@
+import json
+import os
+
+import pytest
+
+from tag_database import TAG_DEFAULTS, TagDatabase
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "tags.json")
+
+
+def test_config_file_loads():
+    database = TagDatabase.from_file(CONFIG)
+    assert database.tags.keys() == TAG_DEFAULTS.keys()
+
+
+@pytest.mark.parametrize("name, variant_type", [
+    ("DI0", "Int32"),
+    ("DQ0", "Double"),
+    ("A2.Active", "String"),
+    ("AI0", "Boolean"),
+    ("AI0", "Int16"),
+])
+def test_rejects_type_of_another_register_kind(name, variant_type):
+    tags = dict(TAG_DEFAULTS)
+    tags[name] = (variant_type,) + tags[name][1:]
+    with pytest.raises(ValueError, match=f"Tag {name}: type {variant_type} does not fit the register"):
+        TagDatabase(tags)
+
+
+def test_analog_input_as_float(tmp_path):
+    # A tag without a type gets the one of its register kind
+    path = tmp_path / "tags.json"
+    entries = [{"name": name, "type": "Float"} if name == "AI0" else {"name": name} for name in TAG_DEFAULTS]
+    path.write_text(json.dumps({"tags": entries}))
+    database = TagDatabase.from_file(str(path))
+    assert database.tags["AI0"][0] == "Float" and database.tags["DI0"][0] == "Boolean"